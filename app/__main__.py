@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import argparse
+import sys
+
+# PT: Módulos próprios (modos sem interface gráfica)
+# EN: Local modules (headless modes)
+# FR: Modules locaux (modes sans interface graphique)
+from . import desempenho, gravacao, lote, planilha, servidor
+
+
+def main(argv=None):
+    # PT: Linha de comando: python -m app <subcomando>
+    # EN: Command line: python -m app <subcommand>
+    # FR: Ligne de commande : python -m app <sous-commande>
+    parser = argparse.ArgumentParser(prog='python -m app', description='Calculator Tk headless modes')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    lote.add_arguments(subparsers.add_parser('batch', help='evaluate one expression per line'))
+    servidor.add_arguments(subparsers.add_parser('serve', help='serve calculations as JSON lines over TCP'))
+    servidor.add_query_arguments(subparsers.add_parser('query', help='send expressions to a running server'))
+    desempenho.add_arguments(subparsers.add_parser('bench', help='run the benchmark suite'))
+    gravacao.add_arguments(subparsers.add_parser('replay', help='replay a key recording and report latencies'))
+    planilha.add_arguments(subparsers.add_parser('sheet', help='evaluate a worksheet of named lines'))
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
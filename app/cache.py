@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import sys
+import threading
+from collections import OrderedDict
+
+
+def _sizeof_pair(key, value):
+    # PT: Estimativa de memória de uma entrada (chave + valor)
+    # EN: Memory estimate of one entry (key + value)
+    # FR: Estimation mémoire d'une entrée (clé + valeur)
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+
+class LRUCache(object):
+    """Cache LRU limitado com contadores de acertos e falhas."""
+    # PT: Cache com descarte do item menos usado recentemente, limitado em itens e opcionalmente em bytes.
+    #     Seguro entre threads: cada operação segura um lock só durante a manipulação do OrderedDict
+    #     (o tamanho em bytes é medido uma vez por put, fora dele, e guardado para o descarte)
+    # EN: Cache that evicts the least recently used item, bounded in items and optionally in bytes.
+    #     Thread-safe: each operation holds a lock only while touching the OrderedDict
+    #     (the byte size is measured once per put, outside of it, and kept for eviction)
+    # FR: Cache qui évince l'élément le moins récemment utilisé, borné en éléments et optionnellement en octets.
+    #     Sûr entre threads : chaque opération tient un verrou seulement pendant la manipulation de
+    #     l'OrderedDict (la taille en octets est mesurée une fois par put, hors de lui, et gardée pour l'éviction)
+
+    def __init__(self, maxsize=1024, maxbytes=None, sizeof=_sizeof_pair):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self._sizeof = sizeof
+        self._bytes = 0
+        self._data = OrderedDict()
+        # PT: chave -> tamanho medido no put (só com maxbytes), para descontar sem medir de novo
+        # EN: key -> size measured in put (only with maxbytes), to subtract without measuring again
+        # FR: clé -> taille mesurée dans put (seulement avec maxbytes), pour la déduire sans remesurer
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        # PT: Retorna o valor e marca como usado recentemente
+        # EN: Return the value and mark it as recently used
+        # FR: Retourne la valeur et la marque comme récemment utilisée
+        # PT: acquire/release explícitos: é o caminho de todo acerto, e custa metade do "with"
+        # EN: Explicit acquire/release: this is the path of every hit, and it costs half of "with"
+        # FR: acquire/release explicites : c'est le chemin de chaque succès, et il coûte moitié moins que « with »
+        lock = self._lock
+        lock.acquire()
+        try:
+            value = self._data[key]
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+        except KeyError:
+            self.misses += 1
+            return default
+        finally:
+            lock.release()
+
+    def put(self, key, value):
+        # PT: Guarda o valor, descartando os mais antigos se necessário
+        # EN: Store the value, evicting the oldest entries if needed
+        # FR: Stocke la valeur en évinçant les plus anciennes si nécessaire
+        size = None
+        if self.maxbytes is not None:
+            size = self._sizeof(key, value)
+            if size > self.maxbytes:
+                return
+        evicted = []
+        with self._lock:
+            if size is not None:
+                self._bytes += size - self._sizes.get(key, 0)
+                self._sizes[key] = size
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize or (size is not None and self._bytes > self.maxbytes):
+                old_key, old_value = self._data.popitem(last=False)
+                if size is not None:
+                    self._bytes -= self._sizes.pop(old_key)
+                evicted.append(old_value)
+        # PT: Os valores descartados são liberados fora do lock (um programa grande demora a desalocar)
+        # EN: Evicted values are released outside the lock (a large program takes a while to free)
+        # FR: Les valeurs évincées sont libérées hors du verrou (un gros programme met du temps à se libérer)
+        del evicted
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        # PT: Estatísticas no mesmo formato de functools.lru_cache (mais o uso em bytes)
+        # EN: Statistics in the same shape as functools.lru_cache (plus byte usage)
+        # FR: Statistiques au même format que functools.lru_cache (plus l'usage en octets)
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'maxsize': self.maxsize, 'currsize': len(self._data),
+                    'maxbytes': self.maxbytes, 'currbytes': self._bytes}
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
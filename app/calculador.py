@@ -3,35 +3,347 @@
 # @autor: Matheus Felipe
 # @github: github.com/matheusfelipeog
 
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import time
+from decimal import Decimal
+
+# PT: Módulos próprios (compilador de expressões, motores numéricos e cache)
+# EN: Local modules (expression compiler, numeric engines and cache)
+# FR: Modules locaux (compilateur d'expressions, moteurs numériques et cache)
+from .cache import LRUCache
+from .compilador import build, compile_expression, lookup, operations
+from .custo import MAX_BITS, ExpressionTooExpensive, estimate
+from .formatacao import format_result
+from .numerico import ENGINES, exact_runner, needs_exact
+from .perfil import Observador, RegistroLento
+from . import vetorial
+
+
 class Calculador(object):
     # PT: Classe responsável por realizar todos os cálculos da calculadora
     # EN: Class responsible for performing all calculator computations
     # FR: Classe responsable d'effectuer tous les calculs de la calculatrice
+    # PT: Seguro entre threads: uma instância pode ser compartilhada e chamada de várias threads
+    #     ao mesmo tempo. Não há estado por chamada na instância; os caches (LRUCache) têm lock
+    #     próprio, curto, e compilar, executar e formatar rodam fora dele. Os campos preenchidos
+    #     sob demanda num Programa (custo, motor, closures por motor) podem ser calculados por
+    #     duas threads ao mesmo tempo, mas o resultado é o mesmo e a atribuição é atômica
+    # EN: Thread-safe: one instance can be shared and called from several threads at the same
+    #     time. There is no per-call state on the instance; the caches (LRUCache) have their own
+    #     short lock, and compiling, running and formatting happen outside it. The fields a
+    #     Programa fills on demand (cost, engine, per-engine closures) may be computed by two
+    #     threads at once, but the result is the same and the assignment is atomic
+    # FR: Sûr entre threads : une instance peut être partagée et appelée depuis plusieurs threads
+    #     en même temps. Il n'y a pas d'état par appel sur l'instance ; les caches (LRUCache) ont
+    #     leur propre verrou, court, et compiler, exécuter et formater se font hors de lui. Les champs
+    #     qu'un Programa remplit à la demande (coût, moteur, closures par moteur) peuvent être calculés
+    #     par deux threads à la fois, mais le résultat est le même et l'affectation est atomique
+
+    def __init__(self, cache_size=512, result_cache_size=4096, result_cache_bytes=1 << 20,
+                 engine='auto', precision=28, max_bits=MAX_BITS,
+                 profile=False, slow_log_size=100, slow_threshold_ms=5.0):
+        # PT: Motor numérico: 'float', 'decimal', 'fraction' ou 'auto' (float, e Decimal só quando preciso)
+        # EN: Numeric engine: 'float', 'decimal', 'fraction' or 'auto' (float, and Decimal only when needed)
+        # FR: Moteur numérique : 'float', 'decimal', 'fraction' ou 'auto' (float, et Decimal seulement si nécessaire)
+        if engine not in ENGINES:
+            raise ValueError('unknown numeric engine: %r' % (engine,))
+        self.engine = engine
+        self.precision = precision
+        # PT: Limite de bits de inteiros intermediários; acima disso a expressão é rejeitada sem executar
+        # EN: Bit limit of intermediate integers; above it the expression is rejected without running
+        # FR: Limite en bits des entiers intermédiaires ; au-delà l'expression est rejetée sans exécution
+        self.max_bits = max_bits
+        # PT: Programas compilados, indexados pelo texto da expressão
+        # EN: Compiled programs, keyed by the expression text
+        # FR: Programmes compilés, indexés par le texte de l'expression
+        self._programs = LRUCache(maxsize=cache_size)
+        # PT: Resultados formatados, indexados pela forma canônica (limitado em itens e bytes)
+        # EN: Formatted results, keyed by the canonical form (bounded in items and bytes)
+        # FR: Résultats formatés, indexés par la forme canonique (borné en éléments et en octets)
+        self._results = LRUCache(maxsize=result_cache_size, maxbytes=result_cache_bytes)
+        # PT: Kernels NumPy do modo de varredura, indexados por (expressão, variáveis)
+        # EN: NumPy kernels of the sweep mode, keyed by (expression, variables)
+        # FR: Noyaux NumPy du mode balayage, indexés par (expression, variables)
+        self._kernels = LRUCache(maxsize=64)
+        # PT: Perfil opcional de cada avaliação (tempos, operações, maior inteiro intermediário);
+        #     desligado, nada disso é criado e o caminho de cálculo é o mesmo de antes
+        # EN: Optional per-evaluation profile (times, operations, largest intermediate integer);
+        #     when off, none of this is created and the calculation path is the same as before
+        # FR: Profil optionnel de chaque évaluation (temps, opérations, plus grand entier intermédiaire) ;
+        #     désactivé, rien de cela n'est créé et le chemin de calcul est le même qu'avant
+        self.profile = profile
+        self._observer = Observador() if profile else None
+        self._metrics = LRUCache(maxsize=256) if profile else None
+        self.slow_log = RegistroLento(slow_log_size, slow_threshold_ms) if profile else None
 
     def calculation(self, calc):
         # PT: Responsável por receber o cálculo a ser realizado e retornar o resultado ou sentinel em erro
         # EN: Responsible for receiving the calculation and returning result or neutral error sentinel
         # FR: Responsable de recevoir le calcul et de retourner le résultat ou un sentinel d'erreur neutre
+        if self._observer is not None:
+            return self.__profiled_calculation(calc)
         return self.__calculation_validation(calc=calc)
 
+    def calculate_many(self, calcs):
+        # PT: Lista de resultados (como calculation()) na ordem de `calcs`, qualquer iterável de
+        #     textos. A primeira ocorrência de cada texto passa pelos caches como em calculation();
+        #     as repetições no lote reusam esse resultado sem consultar nem gravar os caches
+        # EN: List of results (as calculation()) in the order of `calcs`, any iterable of texts.
+        #     The first occurrence of each text goes through the caches as in calculation(); the
+        #     repeats within the batch reuse that result without looking up or storing in the caches
+        # FR: Liste de résultats (comme calculation()) dans l'ordre de `calcs`, tout itérable de
+        #     textes. La première occurrence de chaque texte passe par les caches comme dans
+        #     calculation() ; les répétitions du lot réutilisent ce résultat sans consulter ni écrire les caches
+        if self._observer is not None:
+            calculation = self.__profiled_calculation
+        else:
+            calculation = self.__calculation_validation
+        seen = {}
+        results = []
+        append = results.append
+        for calc in calcs:
+            result = seen.get(calc)
+            if result is None:
+                result = seen[calc] = calculation(calc)
+            append(result)
+        return results
+
+    def metrics(self, calc):
+        # PT: Métricas da última avaliação de `calc` com o perfil ligado, ou None
+        #     ({'parse_us', 'eval_us', 'format_us', 'operations', 'peak_bits', 'engine', 'cached'})
+        # EN: Metrics of the last evaluation of `calc` with profiling on, or None
+        #     ({'parse_us', 'eval_us', 'format_us', 'operations', 'peak_bits', 'engine', 'cached'})
+        # FR: Métriques de la dernière évaluation de `calc` avec le profilage actif, ou None
+        #     ({'parse_us', 'eval_us', 'format_us', 'operations', 'peak_bits', 'engine', 'cached'})
+        if self._metrics is None:
+            return None
+        return self._metrics.get(calc)
+
+    def compile(self, calc):
+        # PT: Retorna o programa compilado, reaproveitando o cache quando possível
+        # EN: Return the compiled program, reusing the cache when possible
+        # FR: Retourne le programme compilé en réutilisant le cache si possible
+        program = self._programs.get(calc)
+        if program is None:
+            try:
+                program = compile_expression(calc)
+            except (NameError, SyntaxError, ValueError) as error:
+                # PT: Erros também ficam em cache para não reanalisar entradas inválidas
+                # EN: Errors are cached too so invalid inputs are not parsed again
+                # FR: Les erreurs sont aussi mises en cache pour ne pas réanalyser les entrées invalides
+                program = error
+            self._programs.put(calc, program)
+        if isinstance(program, Exception):
+            raise program.with_traceback(None)
+        return program
+
+    def formula(self, calc, env):
+        # PT: Compila uma fórmula cujas variáveis leem `env` (dict nome -> valor nativo) a cada
+        #     execução; não passa pelos caches: quem chama guarda o programa (ex.: planilha)
+        # EN: Compile a formula whose variables read `env` (dict name -> native value) on every
+        #     run; it bypasses the caches: the caller keeps the program (e.g. a worksheet)
+        # FR: Compile une formule dont les variables lisent `env` (dict nom -> valeur native) à
+        #     chaque exécution ; sans passer par les caches : l'appelant garde le programme (ex. : feuille)
+        return compile_expression(calc, env)
+
+    def evaluate(self, program):
+        # PT: Valor nativo (int, float, Decimal ou Fraction) de um programa no motor configurado,
+        #     com o mesmo limite de custo de calculation(); levanta a exceção em caso de erro
+        # EN: Native value (int, float, Decimal or Fraction) of a program on the configured engine,
+        #     with the same cost limit as calculation(); raises the exception on error
+        # FR: Valeur native (int, float, Decimal ou Fraction) d'un programme sur le moteur configuré,
+        #     avec la même limite de coût que calculation() ; lève l'exception en cas d'erreur
+        value = self.__run(program)
+        if isinstance(value, complex):
+            raise ValueError('complex result')
+        return value
+
+    def sweep(self, calc, variables, chunk_size=65536, formatted=True):
+        # PT: Avalia uma expressão com variáveis (ex.: "x**2+3*x") sobre arrays NumPy ou ranges,
+        #     em blocos de `chunk_size` elementos. Gera um array de textos por bloco
+        #     ("__ERR__" onde houve divisão por zero ou erro de domínio)
+        # EN: Evaluate an expression with variables (e.g. "x**2+3*x") over NumPy arrays or ranges,
+        #     in chunks of `chunk_size` elements. Yields one text array per chunk
+        #     ("__ERR__" where division by zero or a domain error happened)
+        # FR: Évalue une expression à variables (ex. : « x**2+3*x ») sur des tableaux NumPy ou des ranges,
+        #     par blocs de `chunk_size` éléments. Génère un tableau de textes par bloc
+        #     (« __ERR__ » là où il y a eu division par zéro ou erreur de domaine)
+        names = tuple(sorted(variables))
+        kernel = self._kernels.get((calc, names))
+        if kernel is None:
+            kernel = vetorial.compile_kernel(calc, names)
+            self._kernels.put((calc, names), kernel)
+        return vetorial.sweep(kernel, variables, chunk_size=chunk_size, formatted=formatted)
+
+    def estimate(self, calc):
+        # PT: Custo estimado (bits do maior inteiro exato) sem executar a expressão
+        # EN: Estimated cost (bits of the largest exact integer) without running the expression
+        # FR: Coût estimé (bits du plus grand entier exact) sans exécuter l'expression
+        program = self.compile(calc)
+        if program.cost is None:
+            program.cost = estimate(program.tree, self.engine)
+        return program.cost
+
+    def cache_info(self):
+        # PT: Contadores de acertos/falhas do cache de programas compilados
+        # EN: Hit/miss counters of the compiled-program cache
+        # FR: Compteurs de succès/échecs du cache de programmes compilés
+        return self._programs.info()
+
+    def result_cache_info(self):
+        # PT: Contadores de acertos/falhas do cache de resultados
+        # EN: Hit/miss counters of the result cache
+        # FR: Compteurs de succès/échecs du cache de résultats
+        return self._results.info()
+
+    def warm(self, entries):
+        # PT: Pré-compila as expressões de entradas do histórico (dicts com 'expression'); só as
+        #     mais recentes que cabem no cache de programas. Os resultados gravados não entram no
+        #     cache de resultados: vieram do motor e do formatador de quando foram calculados
+        #     (ex.: "0.1+0.2 -> 0.30000000000000004" do motor float, onde o 'auto' dá 0.3)
+        # EN: Pre-compile the expressions of history entries (dicts with 'expression'); only the
+        #     most recent ones that fit in the program cache. The stored results do not go into the
+        #     result cache: they came from the engine and formatter of when they were computed
+        #     (e.g. "0.1+0.2 -> 0.30000000000000004" from the float engine, where 'auto' gives 0.3)
+        # FR: Précompile les expressions d'entrées d'historique (dicts avec 'expression') ; seulement
+        #     les plus récentes qui tiennent dans le cache de programmes. Les résultats enregistrés
+        #     n'entrent pas dans le cache de résultats : ils viennent du moteur et du formateur de
+        #     leur calcul (ex. : « 0.1+0.2 -> 0.30000000000000004 » du moteur float, où 'auto' donne 0.3)
+        try:
+            entries = entries[-self._programs.maxsize:]
+        except TypeError:
+            entries = list(entries)[-self._programs.maxsize:]
+        for entry in entries:
+            try:
+                expr = entry.get('expression')
+                if expr:
+                    self.compile(expr)
+            except (AttributeError, NameError, SyntaxError, ValueError, RecursionError):
+                continue
+
     def __calculation_validation(self, calc):
         # PT: Valida se o cálculo informado pode ser realizado; retorna "__ERR__" em caso de falha
         # EN: Validate whether the given calculation can be performed; returns "__ERR__" on failure
         # FR: Valide si le calcul donné peut être effectué ; renvoie "__ERR__" en cas d'échec
         try:
-            result = eval(calc)
-            return self.__format_result(result=result)
-        except (NameError, ZeroDivisionError, SyntaxError, ValueError):
+            program = self.compile(calc)
+        except (NameError, SyntaxError, ValueError, RecursionError):
+            return "__ERR__"
+        # PT: Expressões equivalentes (espaços, parênteses, ordem comutativa) compartilham o resultado
+        # EN: Equivalent expressions (whitespace, parentheses, commutative order) share the result
+        # FR: Les expressions équivalentes (espaces, parenthèses, ordre commutatif) partagent le résultat
+        result = self._results.get(program.key)
+        if result is not None:
+            return result
+        try:
+            result = self.__format_result(result=self.__run(program))
+        except (NameError, SyntaxError, ValueError, ArithmeticError, RecursionError):
             # PT: Retorna sentinel neutral em caso de erro (GUI fará a localização)
             # EN: Return neutral sentinel on error (GUI will localize)
             # FR: Retourne un sentinel neutre en cas d'erreur (l'interface localisera)
+            result = "__ERR__"
+        self._results.put(program.key, result)
+        return result
+
+    def __profiled_calculation(self, calc):
+        # PT: Mesmo fluxo de __calculation_validation, medindo cada etapa
+        # EN: Same flow as __calculation_validation, timing each stage
+        # FR: Même déroulement que __calculation_validation, en mesurant chaque étape
+        clock = time.perf_counter_ns
+        start = clock()
+        try:
+            program = self.compile(calc)
+        except (NameError, SyntaxError, ValueError, RecursionError):
             return "__ERR__"
+        parsed = clock()
+        metrics = {'parse_us': (parsed - start) / 1000.0, 'eval_us': 0.0, 'format_us': 0.0,
+                   'operations': operations(program.tree), 'peak_bits': 0, 'cached': False}
+        result = self._results.get(program.key)
+        if result is not None:
+            metrics['cached'] = True
+        else:
+            self._observer.peak = 0
+            evaluated = None
+            try:
+                value = self.__run(program)
+                evaluated = clock()
+                result = self.__format_result(result=value)
+            except (NameError, SyntaxError, ValueError, ArithmeticError, RecursionError):
+                result = "__ERR__"
+            finished = clock()
+            evaluated = evaluated or finished
+            metrics['eval_us'] = (evaluated - parsed) / 1000.0
+            metrics['format_us'] = (finished - evaluated) / 1000.0
+            metrics['peak_bits'] = self._observer.peak
+            self._results.put(program.key, result)
+        metrics['engine'] = program.engine or self.engine
+        self._metrics.put(calc, metrics)
+        self.slow_log.add(calc, metrics)
+        return result
+
+    def __runner(self, program, engine):
+        # PT: Closure do programa para o motor; com o perfil ligado, a versão observada
+        # EN: Program closure for the engine; with profiling on, the observed version
+        # FR: Closure du programme pour le moteur ; avec le profilage actif, la version observée
+        observe = self._observer
+        if observe is None:
+            if engine == 'float':
+                return program.run
+            key = engine
+        else:
+            key = ('observed', engine)
+        runner = program.runners.get(key)
+        if runner is None:
+            env = program.env
+            if engine == 'float':
+                runner = build(program.tree, observe=observe, names=lookup(env) if env is not None else None)
+            else:
+                runner = exact_runner(program.tree, engine, self.precision, observe, env)
+            program.runners[key] = runner
+        return runner
+
+    def __run(self, program):
+        # PT: Executa o programa no motor configurado. No modo "auto" a escolha fica guardada
+        #     no próprio programa: Decimal se algum literal não é exato em binário, ou se o
+        #     caminho float estourar; assim o caminho lento só é pago quando necessário
+        # EN: Run the program on the configured engine. In "auto" mode the choice is stored
+        #     on the program itself: Decimal if some literal is not exact in binary, or if the
+        #     float path overflows; so the slow path is only paid when needed
+        # FR: Exécute le programme sur le moteur configuré. En mode « auto » le choix est conservé
+        #     dans le programme : Decimal si un littéral n'est pas exact en binaire, ou si le
+        #     chemin float déborde ; le chemin lent n'est donc payé que si nécessaire.
+        # PT: Numa fórmula o custo depende dos valores atuais, e uma variável Decimal força o Decimal
+        # EN: In a formula the cost depends on the current values, and a Decimal variable forces Decimal
+        # FR: Dans une formule le coût dépend des valeurs actuelles, et une variable Decimal impose Decimal
+        env = program.env
+        if env is not None:
+            cost = estimate(program.tree, self.engine, env)
+        else:
+            if program.cost is None:
+                program.cost = estimate(program.tree, self.engine)
+            cost = program.cost
+        if cost > self.max_bits:
+            raise ExpressionTooExpensive('estimated %.3g bits, limit is %d' % (cost, self.max_bits))
+        engine = self.engine
+        if engine == 'auto':
+            if program.engine is None:
+                program.engine = 'decimal' if needs_exact(program.tree) else 'float'
+            engine = program.engine
+            if engine == 'float' and env is not None and any(type(env[name]) is Decimal for name in program.names):
+                engine = 'decimal'
+        if engine == 'float':
+            try:
+                return self.__runner(program, engine)()
+            except OverflowError:
+                if self.engine != 'auto':
+                    raise
+                program.engine = engine = 'decimal'
+        return self.__runner(program, engine)()
 
     def __format_result(self, result):
         # PT: Formata o resultado em notação científica se for muito grande e retorna string
         # EN: Format the result in scientific notation if too large and return as string
         # FR: Formate le résultat en notation scientifique s'il est trop grand et renvoie une chaîne
-        result = str(result)
-        if len(result) > 15:
-            result = '{:5.5E}'.format(float(result))
-        return result
+        return format_result(result)
@@ -7,8 +7,7 @@
 # EN: Builtins (standard imports)
 # FR: Noyaux (imports standard)
 import sys
-import os
-import platform
+import time
 
 # PT: GUI toolkit
 # EN: GUI toolkit
@@ -20,31 +19,57 @@ from tkinter import Menu, FALSE
 # EN: Utilities
 # FR: Utilitaires
 from functools import partial
-from json import load as json_load
-from json import dump as json_dump
-from datetime import datetime
-import csv
-
-from copy import deepcopy
 
 # PT: Módulos próprios (lógica e traduções)
 # EN: Local modules (logic and translations)
 # FR: Modules locaux (logique et traductions)
-from .calculador import Calculador
+# PT: Executor, histórico, exportação e janela de histórico são importados sob demanda
+#     (multiprocessing, concurrent.futures, csv e gzip não pesam na abertura)
+# EN: Executor, history, export and history window are imported on demand
+#     (multiprocessing, concurrent.futures, csv and gzip do not weigh on startup)
+# FR: Exécuteur, historique, export et fenêtre d'historique sont importés à la demande
+#     (multiprocessing, concurrent.futures, csv et gzip ne pèsent pas au démarrage)
+from .contexto import ContextoDaAplicacao
+from .entrada import MAX_LENGTH, ModeloEntrada
 from .i18n import translations
 
 
+# PT: Altura (px) da linha de prévia do resultado
+# EN: Height (px) of the result preview line
+# FR: Hauteur (px) de la ligne d'aperçu du résultat
+PREVIEW_HEIGHT = 22
+
+
 class Calculadora(object):
     """Classe para criação do layout da calculadora e funcionalidades."""
     # PT: Classe para criação do layout da calculadora e funcionalidades
     # EN: Class to create the calculator layout and functionality
     # FR: Classe pour créer la mise en page et les fonctionnalités de la calculatrice
 
-    def __init__(self, master):
+    def __init__(self, master, started=None, context=None):
         self.master = master
-        self.calc = Calculador()
+        # PT: Configurações, motor, executor e histórico vêm do contexto compartilhado; várias
+        #     janelas (ex.: Toplevels no mesmo Tk) podem usar o mesmo contexto
+        # EN: Settings, engine, executor and history come from the shared context; several
+        #     windows (e.g. Toplevels on the same Tk) can use the same context
+        # FR: Paramètres, moteur, exécuteur et historique viennent du contexte partagé ; plusieurs
+        #     fenêtres (ex. : des Toplevels sur le même Tk) peuvent utiliser le même contexte
+        self.context = context if context is not None else ContextoDaAplicacao()
+        self.context.attach(self)
+        # PT: Marcos de abertura (ms), medidos a partir de `started` (perf_counter do início do processo)
+        # EN: Startup milestones (ms), measured from `started` (perf_counter at process start)
+        # FR: Jalons du démarrage (ms), mesurés depuis `started` (perf_counter au début du processus)
+        self._started = time.perf_counter() if started is None else started
+        self.startup_times = {}
 
         self.settings = self._load_settings()
+        # PT: Motor numérico configurável ('auto', 'float', 'decimal' ou 'fraction'), um só por processo
+        # EN: Configurable numeric engine ('auto', 'float', 'decimal' or 'fraction'), one per process
+        # FR: Moteur numérique configurable ('auto', 'float', 'decimal' ou 'fraction'), un seul par processus
+        self.calc = self.context.calc
+        self._pending = None
+        self._pending_started = 0
+        self._busy = False
         # PT: Código do idioma atual: 'en', 'pt', 'fr'
         # EN: Current language code: 'en', 'pt', 'fr'
         # FR: Code de langue actuel : 'en', 'pt', 'fr'
@@ -54,20 +79,31 @@ class Calculadora(object):
         # PT: Seleção de tema
         # EN: Theme selection
         # FR: Sélection du thème
-        if platform.system() == 'Darwin':
-            self.theme = self._get_theme('Default Theme For MacOS')
-        else:
-            self.theme = self._get_theme(self.settings.get('current_theme', 'Dark'))
-
-        # Historique des calculs (history restored before UI shown)
-        self._history = self._load_history()
+        self.theme = self._select_theme()
+
+        self._history_window = None
+        self._worksheet_window = None
+        self._export = None
+        self._menu = None
+        # PT: Instrumentação opcional (None quando desligada); precisa vir antes de criar botões
+        #     e menu, que capturam os métodos já embrulhados
+        # EN: Optional instrumentation (None when off); must come before creating buttons and
+        #     menu, which capture the already wrapped methods
+        # FR: Instrumentation optionnelle (None si désactivée) ; doit précéder la création des
+        #     boutons et du menu, qui capturent les méthodes déjà enveloppées
+        self._instruments = self._load_instruments()
+        self._recorder = self._load_recorder()
 
         # PT: Janela principal (usa título traduzido)
         # EN: Main window (uses translated title)
         # FR: Fenêtre principale (utilise le titre traduit)
         self.master.title(self._t.get('title', 'Calculator Tk'))
-        self.master.maxsize(width=335, height=415)
-        self.master.minsize(width=335, height=415)
+        # PT: A linha de prévia (opcional) aumenta a janela
+        # EN: The (optional) preview line makes the window taller
+        # FR: La ligne d'aperçu (optionnelle) agrandit la fenêtre
+        height = 415 + (PREVIEW_HEIGHT if self.settings.get('live_preview', True) else 0)
+        self.master.maxsize(width=335, height=height)
+        self.master.minsize(width=335, height=height)
         self.master.geometry('-150+100')
         self.master['bg'] = self.theme['master_bg']
 
@@ -89,35 +125,154 @@ class Calculadora(object):
         self._create_input(self._frame_input)
         self._create_buttons(self._frame_buttons)
         self._create_menu(self.master)
-
-    @staticmethod
-    def _load_settings():
-        # PT: Carrega configurações do arquivo JSON
-        # EN: Load settings from JSON file
-        # FR: Charger les paramètres depuis le fichier JSON
-        with open('./app/settings/settings.json', mode='r', encoding='utf-8') as f:
-            return json_load(f)
+        self._map_binding = self.master.bind('<Map>', self._on_map, add='+')
+        if isinstance(self.master, tk.Toplevel):
+            # PT: Fechar uma janela extra não encerra as outras
+            # EN: Closing an extra window does not end the others
+            # FR: Fermer une fenêtre supplémentaire ne termine pas les autres
+            self.master.protocol('WM_DELETE_WINDOW', self._close_window)
+        self.startup_times['window_built'] = self._elapsed_ms()
+
+    def _elapsed_ms(self):
+        return (time.perf_counter() - self._started) * 1000
+
+    def _on_map(self, event):
+        # PT: A janela foi mapeada; o desenho acontece no próximo ciclo ocioso do Tk
+        # EN: The window was mapped; drawing happens on Tk's next idle cycle
+        # FR: La fenêtre a été affichée ; le dessin a lieu au prochain cycle oisif de Tk
+        if event.widget is not self.master:
+            return
+        self.master.unbind('<Map>', self._map_binding)
+        self.master.after_idle(self._on_first_frame)
+
+    def _on_first_frame(self):
+        # PT: Primeiro quadro desenhado: agora carrega executor e histórico
+        # EN: First frame drawn: now load the executor and the history
+        # FR: Première image dessinée : charge maintenant l'exécuteur et l'historique
+        self.startup_times['first_frame'] = self._elapsed_ms()
+        self._ensure_history()
+        self.startup_times['services_ready'] = self._elapsed_ms()
+        if self.settings.get('report_startup_time', False):
+            print('startup: ' + ', '.join('%s %.1f ms' % item for item in self.startup_times.items()),
+                  file=sys.stderr)
+
+    @property
+    def _evaluator(self):
+        return self._ensure_evaluator()
+
+    @property
+    def _history(self):
+        return self._ensure_history()
+
+    def _ensure_evaluator(self):
+        # PT: Executor único do contexto (criado no primeiro uso)
+        # EN: The context's single executor (created on first use)
+        # FR: L'exécuteur unique du contexte (créé au premier usage)
+        return self.context.evaluator
+
+    def _ensure_history(self):
+        # PT: Histórico único do contexto: todas as janelas escrevem pelo mesmo diário
+        # EN: The context's single history: every window writes through the same journal
+        # FR: L'historique unique du contexte : toutes les fenêtres écrivent dans le même journal
+        return self._load_history()
+
+    def _load_instruments(self):
+        # PT: Liga via variável CALC_INSTRUMENTATION ou "instrumentation": true no settings;
+        #     desligada, o módulo nem é importado
+        # EN: Turned on through the CALC_INSTRUMENTATION variable or "instrumentation": true in
+        #     settings; when off, the module is not even imported
+        # FR: Activée via la variable CALC_INSTRUMENTATION ou "instrumentation": true dans les
+        #     paramètres ; désactivée, le module n'est même pas importé
+        instruments = self.context.instruments()
+        if instruments is None:
+            return None
+        # PT: Comandos dos botões (com o tempo até o redesenho) e do menu, cálculo e histórico
+        # EN: Button commands (with the time until the redraw) and menu ones, evaluation and history
+        # FR: Commandes des boutons (avec le temps jusqu'au redessin) et du menu, calcul et historique
+        for name in ('_set_values_in_input', '_set_operator_in_input', '_set_dot_in_input',
+                     '_set_open_parent', '_set_close_parent', '_del_last_value_in_input',
+                     '_clear_input', '_evaluate_and_display', '_set_function_in_input',
+                     '_set_constant_in_input'):
+            setattr(self, name, instruments.wrap('button' + name, getattr(self, name), self.master))
+        for name in ('_change_theme_to', '_change_language', '_show_history', '_clear_history',
+                     '_export_history'):
+            setattr(self, name, instruments.wrap('menu' + name, getattr(self, name), self.master))
+        self._append_history = instruments.wrap('history_append_history', self._append_history)
+        self.master.bind('<Control-F12>', lambda event: instruments.dump(), add='+')
+        return instruments
+
+    def _load_recorder(self):
+        # PT: Gravação opcional das teclas (ver gravacao.py e "python -m app replay")
+        # EN: Optional key recording (see gravacao.py and "python -m app replay")
+        # FR: Enregistrement optionnel des touches (voir gravacao.py et « python -m app replay »)
+        recorder = self.context.recorder()
+        if recorder is None:
+            return None
+        from .gravacao import COMMANDS
+        for name, key in COMMANDS.items():
+            setattr(self, name, recorder.wrap(key, getattr(self, name)))
+        return recorder
+
+    def _load_settings(self):
+        # PT: Catálogo compilado (em cache) com as preferências do usuário por cima
+        # EN: Compiled catalog (cached) with the user preferences on top
+        # FR: Catalogue compilé (en cache) avec les préférences de l'utilisateur par-dessus
+        self._config = self.context.config
+        return self.context.settings
+
+    def _save_settings(self):
+        # PT: Só as preferências (tema e idioma) são gravadas; o catálogo não muda
+        # EN: Only the preferences (theme and language) are written; the catalog does not change
+        # FR: Seules les préférences (thème et langue) sont écrites ; le catalogue ne change pas
+        self.context.save_preferences()
+
+    def _select_theme(self):
+        # PT: No macOS o tema padrão do sistema é sempre usado
+        # EN: On macOS the system default theme is always used
+        # FR: Sur macOS le thème système par défaut est toujours utilisé
+        if sys.platform == 'darwin':
+            return self._get_theme('Default Theme For MacOS')
+        return self._get_theme(self.settings.get('current_theme', 'Dark'))
 
     def _get_theme(self, name='Dark'):
         # PT: Retorna configuração de estilo para o tema especificado
         # EN: Return style configuration for the specified theme
         # FR: Retourne la configuration de style pour le thème spécifié
-        list_of_themes = self.settings.get('themes', [])
-        found_theme = None
-        for t in list_of_themes:
-            if name == t.get('name'):
-                found_theme = deepcopy(t)
-                break
-        return found_theme or {}
+        # PT: Já vem com o estilo global mesclado nos botões (pré-compilado no cache)
+        # EN: Already comes with the global style merged into the buttons (pre-compiled in the cache)
+        # FR: Arrive déjà avec le style global fusionné dans les boutons (pré-compilé dans le cache)
+        return self.context.theme(name)
 
     def _create_input(self, master):
         # PT: Entrada usada como display
         # EN: Entry used as display
         # FR: Entrée utilisée comme affichage
-        self._entrada = tk.Entry(master, cnf=self.theme.get('INPUT', {}))
-        self._entrada.insert(0, 0)
+        # PT: O texto vem do ModeloEntrada; o Entry só o exibe via StringVar
+        # EN: The text comes from ModeloEntrada; the Entry only shows it through a StringVar
+        # FR: Le texte vient de ModeloEntrada ; l'Entry ne fait que l'afficher via une StringVar
+        self._input = ModeloEntrada('0')
+        self._rendering = False
+        self._display = tk.StringVar(master, value=self._input.text)
+        self._display.trace_add('write', self._on_display_written)
+        # PT: Prévia do resultado, logo abaixo da entrada
+        # EN: Result preview, right below the input
+        # FR: Aperçu du résultat, juste sous l'entrée
+        self._preview_label = None
+        self._preview_job = None
+        self._preview_future = None
+        if self.settings.get('live_preview', True):
+            self._preview_label = tk.Label(master, anchor='e', padx=8, cnf=self._preview_style())
+            self._preview_label.pack(side='bottom', fill='x')
+        self._entrada = tk.Entry(master, cnf=self.theme.get('INPUT', {}), textvariable=self._display)
         self._entrada.pack(side='right', padx=4)
 
+    def _preview_style(self):
+        # PT: Mesmas cores da entrada, fonte menor
+        # EN: Same colors as the input, smaller font
+        # FR: Mêmes couleurs que l'entrée, police plus petite
+        style = self.theme.get('INPUT', {})
+        return {'bg': style.get('bg', ''), 'fg': style.get('fg', ''), 'font': 'Arial 12'}
+
     def _create_menu(self, master):
         # PT: Menu superior: Configuração -> Idioma, Tema, Sair
         # EN: Top menu: Configuration -> Language, Theme, Exit
@@ -125,6 +280,15 @@ class Calculadora(object):
         self.master.option_add('*tearOff', FALSE)
         calc_menu = Menu(self.master)
         self.master.config(menu=calc_menu)
+        # PT: Ao trocar de idioma ou tema o menu é refeito; o anterior é destruído depois que o
+        #     comando que disparou a troca (um item dele mesmo) termina
+        # EN: On a language or theme change the menu is rebuilt; the previous one is destroyed once
+        #     the command that triggered the switch (one of its own items) returns
+        # FR: Lors d'un changement de langue ou de thème le menu est reconstruit ; l'ancien est détruit
+        #     une fois terminée la commande qui a déclenché le changement (un de ses propres éléments)
+        if self._menu is not None:
+            self.master.after_idle(self._menu.destroy)
+        self._menu = calc_menu
 
         config = Menu(calc_menu)
         # PT: Submenu Idioma (acima de Tema)
@@ -152,9 +316,8 @@ class Calculadora(object):
         theme = Menu(config)
         theme_incompatible = ['Default Theme For MacOS']
         current_theme_name = self.settings.get('current_theme', 'Dark')
-        for t in self.settings.get('themes', []):
-            name = t.get('name')
-            if not name or name in theme_incompatible:
+        for name in self._config.theme_names:
+            if name in theme_incompatible:
                 continue
             if name == current_theme_name:
                 # disable the current theme option
@@ -169,6 +332,8 @@ class Calculadora(object):
         config.add_cascade(label=self._t.get('menu_language', 'Language'), menu=lang_menu)
         config.add_cascade(label=self._t.get('menu_theme', 'Theme'), menu=theme)
 
+        config.add_command(label=self._t.get('menu_new_window', 'New window'), command=self._new_window)
+        config.add_command(label=self._t.get('menu_worksheet', 'Worksheet...'), command=self._show_worksheet)
         config.add_separator()
         config.add_command(label=self._t.get('menu_exit', 'Exit'), command=self._exit)
 
@@ -177,26 +342,46 @@ class Calculadora(object):
         calc_menu.add_cascade(label=self._t.get('menu_history', 'History'), menu=history)
         history.add_command(label=self._t.get('history_show', 'Show...'), command=self._show_history)
         history.add_command(label=self._t.get('history_clear', 'Clear'), command=self._clear_history)
-        history.add_command(label=self._t.get('history_export_csv', 'Export CSV'), command=self._export_history_csv)
+        history.add_command(label=self._t.get('history_export', 'Export...'), command=self._export_history)
 
     def _change_theme_to(self, name='Dark'):
-        # PT: Altera o tema nas configurações e reinicia o app
-        # EN: Change theme in settings and reload the app
-        # FR: Change le thème dans les paramètres et recharge l'application
+        # PT: Altera o tema nas configurações e reaplica o estilo nos widgets existentes
+        # EN: Change theme in settings and restyle the existing widgets
+        # FR: Change le thème dans les paramètres et réapplique le style aux widgets existants
         self.settings['current_theme'] = name
-        with open('./app/settings/settings.json', 'w', encoding='utf-8') as outfile:
-            json_dump(self.settings, outfile, indent=4, ensure_ascii=False)
-        self._reload_app()
+        self._save_settings()
+        self.context.notify('_on_theme_changed')
+
+    def _on_theme_changed(self):
+        # PT: Chamado em todas as janelas do contexto quando qualquer uma troca o tema
+        # EN: Called on every window of the context when any of them switches the theme
+        # FR: Appelé sur toutes les fenêtres du contexte quand l'une d'elles change de thème
+        self.theme = self._select_theme()
+        self._apply_theme()
+        self._create_menu(self.master)
+
+    def _apply_theme(self):
+        # PT: Mesmas opções usadas na criação, agora via configure(); a entrada mantém o texto
+        # EN: Same options used at creation, now through configure(); the input keeps its text
+        # FR: Mêmes options qu'à la création, maintenant via configure() ; l'entrée garde son texte
+        self.master['bg'] = self.theme['master_bg']
+        self._frame_input['bg'] = self.theme['frame_bg']
+        self._frame_buttons['bg'] = self.theme['frame_bg']
+        self._entrada.configure(cnf=self.theme.get('INPUT', {}))
+        if self._preview_label is not None:
+            self._preview_label.configure(cnf=self._preview_style())
+        for style, buttons in self._buttons_by_style.items():
+            for button in buttons:
+                button.configure(cnf=self.theme[style])
+        if self._history_window is not None:
+            self._history_window.apply(self.theme, self._t)
+        if self._worksheet_window is not None:
+            self._worksheet_window.apply(self.theme, self._t)
 
     def _create_buttons(self, master):
         # PT: Cria botões (visuais e bindings) - mesma lógica original
         # EN: Create buttons (visual & bindings) - same original logic
         # FR: Crée les boutons (visuel & liaisons) - même logique originale
-        self.theme.setdefault('BTN_NUMERICO', {}).update(self.settings.get('global', {}))
-        self.theme.setdefault('BTN_OPERADOR', {}).update(self.settings.get('global', {}))
-        self.theme.setdefault('BTN_DEFAULT', {}).update(self.settings.get('global', {}))
-        self.theme.setdefault('BTN_CLEAR', {}).update(self.settings.get('global', {}))
-
         # PT: Botões numéricos
         # EN: Numeric buttons
         # FR: Boutons numériques
@@ -231,11 +416,23 @@ class Calculadora(object):
         self._BTN_RESULT = tk.Button(master, text='=', cnf=self.theme['BTN_OPERADOR'])
         self._BTN_DOT = tk.Button(master, text='.', cnf=self.theme['BTN_DEFAULT'])
 
-        # PT: Botões vazios (futuro)
-        # EN: Empty buttons (future)
-        # FR: Boutons vides (futur)
-        self._BTN_VAZIO1 = tk.Button(master, text='', cnf=self.theme['BTN_OPERADOR'])
-        self._BTN_VAZIO2 = tk.Button(master, text='', cnf=self.theme['BTN_OPERADOR'])
+        # PT: Botões científicos: "2nd" troca a camada de funções; o outro é π (ou e na 2ª camada)
+        # EN: Scientific buttons: "2nd" switches the function layer; the other is π (or e on the 2nd layer)
+        # FR: Boutons scientifiques : « 2nd » change la couche de fonctions ; l'autre est π (ou e en 2e couche)
+        self._BTN_VAZIO1 = tk.Button(master, text='2nd', cnf=self.theme['BTN_OPERADOR'])
+        self._BTN_VAZIO2 = tk.Button(master, text='π', cnf=self.theme['BTN_OPERADOR'])
+
+        # PT: Botões por grupo de estilo (usado para trocar de tema sem recriá-los)
+        # EN: Buttons by style group (used to switch themes without recreating them)
+        # FR: Boutons par groupe de style (utilisé pour changer de thème sans les recréer)
+        self._buttons_by_style = {
+            'BTN_NUMERICO': [self._BTN_NUM_0, self._BTN_NUM_1, self._BTN_NUM_2, self._BTN_NUM_3, self._BTN_NUM_4,
+                             self._BTN_NUM_5, self._BTN_NUM_6, self._BTN_NUM_7, self._BTN_NUM_8, self._BTN_NUM_9],
+            'BTN_OPERADOR': [self._BTN_SOMA, self._BTN_SUB, self._BTN_DIV, self._BTN_MULT, self._BTN_EXP,
+                             self._BTN_RAIZ, self._BTN_RESULT, self._BTN_VAZIO1, self._BTN_VAZIO2],
+            'BTN_DEFAULT': [self._BTN_ABRE_PARENTESE, self._BTN_FECHA_PARENTESE, self._BTN_CLEAR, self._BTN_DOT],
+            'BTN_CLEAR': [self._BTN_DEL],
+        }
 
         # PT: Posicionamento em grid
         # EN: Grid placement
@@ -296,7 +493,52 @@ class Calculadora(object):
         self._BTN_FECHA_PARENTESE['command'] = self._set_close_parent
         self._BTN_DEL['command'] = self._del_last_value_in_input
         self._BTN_CLEAR['command'] = self._clear_input
-        self._BTN_RESULT['command'] = self._evaluate_and_display
+        # PT: "=" e "×" (cancelar) registrados no Tcl uma vez só; _set_busy só troca o nome do comando
+        # EN: "=" and "×" (cancel) registered in Tcl only once; _set_busy only swaps the command name
+        # FR: « = » et « × » (annuler) enregistrés dans Tcl une seule fois ; _set_busy ne change que le nom de la commande
+        self._result_commands = {False: self._BTN_RESULT.register(self._evaluate_and_display),
+                                 True: self._BTN_RESULT.register(self._cancel_evaluation)}
+        self._BTN_RESULT['command'] = self._result_commands[False]
+        self._BTN_VAZIO1['command'] = self._toggle_second_layer
+        self._BTN_VAZIO2['command'] = partial(self._set_constant_in_input, 'pi')
+
+        # PT: 2ª camada: (botão, rótulo, comando); a 1ª camada é lida dos botões antes da troca
+        # EN: 2nd layer: (button, label, command); the 1st layer is read from the buttons before switching
+        # FR: 2e couche : (bouton, libellé, commande) ; la 1re couche est lue sur les boutons avant le changement
+        self._second_layer_on = False
+        self._second_layer = [
+            (self._BTN_NUM_7, 'sin', partial(self._set_function_in_input, 'sin(')),
+            (self._BTN_NUM_8, 'cos', partial(self._set_function_in_input, 'cos(')),
+            (self._BTN_NUM_9, 'tan', partial(self._set_function_in_input, 'tan(')),
+            (self._BTN_NUM_4, 'sin⁻¹', partial(self._set_function_in_input, 'asin(')),
+            (self._BTN_NUM_5, 'cos⁻¹', partial(self._set_function_in_input, 'acos(')),
+            (self._BTN_NUM_6, 'tan⁻¹', partial(self._set_function_in_input, 'atan(')),
+            (self._BTN_NUM_1, 'ln', partial(self._set_function_in_input, 'ln(')),
+            (self._BTN_NUM_2, 'log', partial(self._set_function_in_input, 'log(')),
+            (self._BTN_NUM_3, 'eˣ', partial(self._set_function_in_input, 'exp(')),
+            (self._BTN_NUM_0, 'n!', partial(self._set_function_in_input, 'factorial(')),
+            (self._BTN_DOT, '|x|', partial(self._set_function_in_input, 'abs(')),
+            (self._BTN_VAZIO2, 'e', partial(self._set_constant_in_input, 'e')),
+        ]
+        # PT: Comandos registrados no Tcl uma vez só (configure com um callable registraria um novo a cada troca)
+        # EN: Commands registered in Tcl only once (configure with a callable would register a new one on each switch)
+        # FR: Commandes enregistrées dans Tcl une seule fois (configure avec un callable en enregistrerait une à chaque changement)
+        self._second_layer = [(button, text, button.register(command)) for button, text, command in self._second_layer]
+        self._first_layer = [(button, button['text'], button['command']) for button, _, _ in self._second_layer]
+
+    def _toggle_second_layer(self):
+        self._show_second_layer(not self._second_layer_on)
+
+    def _show_second_layer(self, on):
+        # PT: Troca rótulos e comandos dos botões da 2ª camada; "2nd" fica afundado enquanto ativa
+        # EN: Swap labels and commands of the 2nd layer buttons; "2nd" stays sunken while active
+        # FR: Échange libellés et commandes des boutons de la 2e couche ; « 2nd » reste enfoncé tant qu'elle est active
+        if on == self._second_layer_on:
+            return
+        self._second_layer_on = on
+        for button, text, command in (self._second_layer if on else self._first_layer):
+            button.configure(text=text, command=command)
+        self._BTN_VAZIO1['relief'] = 'sunken' if on else 'raised'
 
     def _localized_error(self):
         # PT: Retorna o texto de erro localizado para o idioma atual
@@ -305,23 +547,93 @@ class Calculadora(object):
         return translations.get(self.current_language, translations.get('en', {})).get('error', 'Error')
 
     def _is_entry_error(self):
-        # PT: Verifica se o conteúdo do campo é a mensagem de erro localizada
-        # EN: Check whether the entry content is the localized error message
-        # FR: Vérifie si le contenu de l'entrée est le message d'erreur localisé
-        return self._entrada.get() == self._localized_error()
+        # PT: Verifica se o campo está mostrando a mensagem de erro localizada
+        # EN: Check whether the entry is showing the localized error message
+        # FR: Vérifie si l'entrée affiche le message d'erreur localisé
+        return self._input.error
+
+    def _is_input_locked(self):
+        # PT: Entrada bloqueada: mensagem de erro exibida ou cálculo em andamento
+        # EN: Input locked: error message shown or calculation in progress
+        # FR: Entrée verrouillée : message d'erreur affiché ou calcul en cours
+        return self._pending is not None or self._input.error
+
+    def _render_input(self, changed=True, preview=True):
+        # PT: Única escrita no widget por tecla, e só se o modelo mudou
+        # EN: Single widget write per key, and only if the model changed
+        # FR: Une seule écriture dans le widget par touche, et seulement si le modèle a changé
+        if changed:
+            self._rendering = True
+            self._display.set(self._input.text)
+            self._rendering = False
+            if preview:
+                self._schedule_preview()
+
+    # ---------- Live preview ----------
+    def _schedule_preview(self):
+        # PT: Debounce: só a última tecla de uma sequência rápida dispara a prévia
+        # EN: Debounce: only the last key of a quick burst triggers the preview
+        # FR: Anti-rebond : seule la dernière touche d'une rafale déclenche l'aperçu
+        if self._preview_label is None:
+            return
+        if self._preview_job is not None:
+            self.master.after_cancel(self._preview_job)
+        self._preview_job = self.master.after(self.settings.get('preview_delay_ms', 120), self._start_preview)
+
+    def _start_preview(self):
+        self._preview_job = None
+        if self._is_input_locked():
+            return
+        self._preview_future = future = self._evaluator.preview(self._input.text, owner=id(self))
+        if future is None:
+            # PT: Thread de cálculo presa por uma tarefa vencida: avisa em vez da prévia
+            # EN: Calculation thread held by a timed-out task: say so instead of the preview
+            # FR: Thread de calcul occupé par une tâche expirée : le signale au lieu de l'aperçu
+            self._show_preview(self._t.get('worker_busy', 'Previous calculation still running'))
+            return
+        self.master.after(5, self._poll_preview, future)
+
+    def _poll_preview(self, future):
+        # PT: Uma prévia substituída por outra (ou por um resultado) é ignorada
+        # EN: A preview replaced by another one (or by a result) is ignored
+        # FR: Un aperçu remplacé par un autre (ou par un résultat) est ignoré
+        if future is not self._preview_future:
+            return
+        if not future.done():
+            self.master.after(20, self._poll_preview, future)
+            return
+        self._preview_future = None
+        result = future.result()
+        self._show_preview('' if result is None or result == self._input.text else '= ' + result)
+
+    def _clear_preview(self):
+        if self._preview_label is None:
+            return
+        if self._preview_job is not None:
+            self.master.after_cancel(self._preview_job)
+            self._preview_job = None
+        self._preview_future = None
+        self._show_preview('')
+
+    def _show_preview(self, text):
+        if self._preview_label['text'] != text:
+            self._preview_label['text'] = text
+
+    def _on_display_written(self, *args):
+        # PT: Texto digitado ou colado direto no Entry: o modelo é ressincronizado
+        # EN: Text typed or pasted straight into the Entry: the model is resynchronized
+        # FR: Texte tapé ou collé directement dans l'Entry : le modèle est resynchronisé
+        if not self._rendering:
+            self._input.set_text(self._display.get())
+            self._schedule_preview()
 
     def _insert_value_safe(self, value):
         # PT: Helper para inserir valores numéricos (interno)
         # EN: Helper to insert numeric values (internal)
         # FR: Fonction d'aide pour insérer des valeurs numériques (interne)
-        if self._is_entry_error():
-            self._entrada.delete(0, len(self._entrada.get()))
-
-        if self._entrada.get() == '0':
-            self._entrada.delete(0)
-            self._entrada.insert(0, value)
-        elif self._lenght_max(self._entrada.get()):
-            self._entrada.insert(len(self._entrada.get()), value)
+        if self._pending is not None:
+            return
+        self._render_input(self._input.insert_value(value))
 
     def _set_values_in_input(self, value):
         # PT: Wrapper mantido para compatibilidade de nomes
@@ -333,79 +645,126 @@ class Calculadora(object):
         # PT: Inserir separador decimal
         # EN: Insert decimal separator
         # FR: Insérer le séparateur décimal
-        if self._is_entry_error():
-            return
-        if self._entrada.get() and self._entrada.get()[-1] not in '.+-/*' and self._lenght_max(self._entrada.get()):
-            self._entrada.insert(len(self._entrada.get()), dot)
+        if self._pending is None:
+            self._render_input(self._input.insert_dot(dot))
 
     def _set_open_parent(self):
         # PT: Inserir parêntese de abertura no input
         # EN: Insert opening parenthesis into input
         # FR: Insérer une parenthèse ouvrante dans l'entrée
-        if self._is_entry_error():
-            return
-        if self._entrada.get() == '0':
-            self._entrada.delete(0)
-            self._entrada.insert(len(self._entrada.get()), '(')
-        elif self._entrada.get() and self._entrada.get()[-1] in '+-/*' and self._lenght_max(self._entrada.get()):
-            self._entrada.insert(len(self._entrada.get()), '(')
+        if self._pending is None:
+            self._render_input(self._input.open_paren())
 
     def _set_close_parent(self):
         # PT: Inserir parêntese de fechamento no input
         # EN: Insert closing parenthesis into input
         # FR: Insérer une parenthèse fermante dans l'entrée
-        if self._is_entry_error():
-            return
-        if self._entrada.get().count('(') <= self._entrada.get().count(')'):
-            return
-        if self._entrada.get() and self._entrada.get()[-1] not in '+-/*(' and self._lenght_max(self._entrada.get()):
-            self._entrada.insert(len(self._entrada.get()), ')')
+        if self._pending is None:
+            self._render_input(self._input.close_paren())
 
     def _clear_input(self):
-        # PT: Limpa o input e insere '0'
-        # EN: Clear the input and insert '0'
-        # FR: Efface l'entrée et insère '0'
-        self._entrada.delete(0, len(self._entrada.get()))
-        self._entrada.insert(0, 0)
+        # PT: Limpa o input e insere '0' (cancela um cálculo em andamento)
+        # EN: Clear the input and insert '0' (cancels a calculation in progress)
+        # FR: Efface l'entrée et insère '0' (annule un calcul en cours)
+        self._cancel_evaluation()
+        self._render_input(self._input.clear())
 
     def _del_last_value_in_input(self):
         # PT: Apaga o último caractere do input
         # EN: Delete the last character from the input
         # FR: Supprime le dernier caractère de l'entrée
-        if self._is_entry_error():
-            return
-        if len(self._entrada.get()) == 1:
-            self._entrada.delete(0)
-            self._entrada.insert(0, 0)
-        else:
-            self._entrada.delete(len(self._entrada.get()) - 1)
+        if self._pending is None:
+            self._render_input(self._input.delete_last())
+
+    def _set_function_in_input(self, function):
+        # PT: Inserir função científica com o parêntese aberto ('sin('); volta à 1ª camada
+        # EN: Insert a scientific function with its opening parenthesis ('sin('); back to the 1st layer
+        # FR: Insère une fonction scientifique avec sa parenthèse ouvrante ('sin(') ; retour à la 1re couche
+        self._show_second_layer(False)
+        if self._pending is None:
+            self._render_input(self._input.insert_function(function[:-1]))
+
+    def _set_constant_in_input(self, constant):
+        # PT: Inserir constante ('pi' ou 'e'); volta à 1ª camada
+        # EN: Insert a constant ('pi' or 'e'); back to the 1st layer
+        # FR: Insère une constante ('pi' ou 'e') ; retour à la 1re couche
+        self._show_second_layer(False)
+        if self._pending is None:
+            self._render_input(self._input.insert_constant(constant))
 
     def _set_operator_in_input(self, operator):
         # PT: Inserir operador matemático no input (evita repetições)
         # EN: Insert math operator into input (prevents repeats)
         # FR: Insère un opérateur mathématique dans l'entrée (évite les répétitions)
-        if self._is_entry_error():
-            return
-        if self._entrada.get() == '':
-            return
-        if self._entrada.get()[-1] not in '+-*/' and self._lenght_max(self._entrada.get()):
-            self._entrada.insert(len(self._entrada.get()), operator)
+        if self._pending is None:
+            self._render_input(self._input.insert_operator(operator))
 
     def _evaluate_and_display(self):
         # PT: Avalia expressão e exibe resultado; localiza mensagens de erro
         # EN: Evaluate expression and display result; localize error messages
         # FR: Évaluer l'expression et afficher le résultat ; localiser les messages d'erreur
-        if self._is_entry_error():
+        if self._is_input_locked():
+            return
+        # PT: O cálculo roda no executor; o resultado volta por _poll_evaluation via master.after
+        # EN: The calculation runs on the executor; the result comes back through _poll_evaluation via master.after
+        # FR: Le calcul s'exécute sur l'exécuteur ; le résultat revient par _poll_evaluation via master.after
+        self._pending = self._evaluator.submit(self._input.text)
+        self._pending_started = time.perf_counter_ns()
+        self.master.after(1, self._poll_evaluation)
+
+    def _poll_evaluation(self, polls=0):
+        # PT: Consulta a tarefa sem bloquear; só mostra o estado "ocupado" se ela não terminar logo
+        # EN: Poll the task without blocking; only show the busy state if it does not finish quickly
+        # FR: Interroge la tâche sans bloquer ; n'affiche l'état occupé que si elle ne finit pas vite
+        task = self._pending
+        if task is None:
+            return
+        if not task.done():
+            if polls >= 5:
+                self._set_busy(True)
+            self.master.after(1 if polls < 5 else 50, self._poll_evaluation, polls + 1)
             return
-        expr = self._entrada.get()
-        result = self.calc.calculation(expr)
+        self._pending = None
+        self._set_busy(False)
+        if not task.cancelled():
+            self._display_result(task.expr, task.result())
+            if self._instruments is not None:
+                # PT: Do clique em "=" até o resultado no visor
+                # EN: From the "=" click to the result on the display
+                # FR: Du clic sur « = » jusqu'au résultat à l'écran
+                self._instruments.record('evaluation.result', time.perf_counter_ns() - self._pending_started)
+
+    def _cancel_evaluation(self):
+        # PT: Ação de cancelar do estado "ocupado"
+        # EN: Cancel action of the busy state
+        # FR: Action d'annulation de l'état occupé
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+            self._set_busy(False)
+
+    def _set_busy(self, busy):
+        # PT: Enquanto calcula, o botão "=" vira "×" (cancelar) e o cursor fica de espera
+        # EN: While computing, the "=" button becomes "×" (cancel) and the cursor shows a wait state
+        # FR: Pendant le calcul, le bouton « = » devient « × » (annuler) et le curseur indique l'attente
+        if busy == self._busy:
+            return
+        self._busy = busy
+        if busy:
+            self._BTN_RESULT.config(text='×', command=self._result_commands[True])
+            self.master.config(cursor='watch')
+        else:
+            self._BTN_RESULT.config(text='=', command=self._result_commands[False])
+            self.master.config(cursor='')
+
+    def _display_result(self, expr, result):
         # PT: Se o core retornou sentinel neutral, exibe mensagem de erro localizada
         # EN: If core returned neutral sentinel, display localized error message
         # FR: Si le core a renvoyé un sentinel neutre, afficher le message d'erreur localisé
         if result == "__ERR__":
-            self._set_result_in_input(result=self._localized_error())
+            self._set_result_in_input(result=self._localized_error(), error=True)
         else:
-            self._set_result_in_input(result=result)
+            self._set_result_in_input(result=result, error=False)
             # append to history only if valid result
             try:
                 if result is not None and result != "__ERR__":
@@ -413,79 +772,94 @@ class Calculadora(object):
             except Exception:
                 pass
 
-    def _set_result_in_input(self, result=0):
+    def _set_result_in_input(self, result=0, error=None):
         # PT: Define o texto no input (inclui mensagens de erro localizadas)
         # EN: Set the text in the input (includes localized error messages)
         # FR: Définit le texte dans l'entrée (inclut les messages d'erreur localisés)
-        self._entrada.delete(0, len(self._entrada.get()))
-        self._entrada.insert(0, result)
+        if error is None:
+            error = str(result) == self._localized_error()
+        self._clear_preview()
+        self._render_input(self._input.set_text(result, error=error), preview=False)
 
     def _lenght_max(self, data_in_input):
         # PT: Verifica se o input atingiu o número máximo de caracteres
         # EN: Check whether the input reached the maximum number of characters
         # FR: Vérifie si l'entrée a atteint le nombre maximal de caractères
-        if len(str(data_in_input)) >= 15:
-            return False
-        return True
+        return len(str(data_in_input)) < MAX_LENGTH
 
     # ---------- History utilities ----------
     def _history_file_path(self):
-        return './app/settings/history.json'
+        return './app/settings/history.jsonl'
 
     def _load_history(self):
-        try:
-            with open(self._history_file_path(), mode='r', encoding='utf-8') as f:
-                import json as _json
-                data = _json.load(f)
-                if isinstance(data, list):
-                    return data
-                return []
-        except FileNotFoundError:
-            return []
-        except Exception:
-            return []
-
-    def _save_history(self):
-        try:
-            with open(self._history_file_path(), mode='w', encoding='utf-8') as f:
-                import json as _json
-                _json.dump(self._history, f, indent=2, ensure_ascii=False)
-        except Exception:
-            pass
+        # PT: Diário append-only; o history.json antigo é importado na primeira execução
+        # EN: Append-only journal; the old history.json is imported on the first run
+        # FR: Journal en ajout seul ; l'ancien history.json est importé à la première exécution
+        return self.context.history(self._history_file_path())
 
     def _append_history(self, expr, result):
         try:
             entry = {
-                'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'time': time.strftime('%Y-%m-%d %H:%M:%S'),
                 'expression': str(expr),
                 'result': str(result),
             }
+            # PT: Com o perfil do motor ligado, as métricas vão junto (campo extra da entrada)
+            # EN: With engine profiling on, the metrics go along (extra field of the entry)
+            # FR: Avec le profilage du moteur actif, les métriques suivent (champ extra de l'entrée)
+            metrics = self.calc.metrics(expr)
+            if metrics is not None:
+                entry['metrics'] = metrics
             self._history.append(entry)
-            if len(self._history) > 200:
-                self._history = self._history[-200:]
-            self._save_history()
         except Exception:
             pass
 
     def _clear_history(self):
-        self._history = []
-        self._save_history()
-
-    def _export_history_csv(self):
-        try:
-            path = './app/settings/history.csv'
-            with open(path, mode='w', newline='', encoding='utf-8') as f:
-                w = csv.writer(f)
-                w.writerow([self._t.get('history_col_time', 'time'),
-                            self._t.get('history_col_expression', 'expression'),
-                            self._t.get('history_col_result', 'result')])
-                for e in self._history:
-                    w.writerow([e.get('time', ''), e.get('expression', ''), e.get('result', '')])
+        self._history.clear()
+
+    def _export_history(self):
+        # PT: Exporta em segundo plano para o destino escolhido (CSV ou JSON-lines, .gz opcional)
+        # EN: Export in the background to the chosen destination (CSV or JSON-lines, optional .gz)
+        # FR: Exporte en arrière-plan vers la destination choisie (CSV ou JSON-lines, .gz optionnel)
+        if self._export is not None and not self._export.done():
+            self._export_window.lift()
+            return
+        from tkinter import filedialog
+        from .exportacao import Exportacao
+        path = filedialog.asksaveasfilename(
+            parent=self.master,
+            title=self._t.get('history_export', 'Export...'),
+            initialfile='history.csv',
+            defaultextension='.csv',
+            filetypes=[('CSV', '*.csv'), ('CSV (gzip)', '*.csv.gz'),
+                       ('JSON-lines', '*.jsonl'), ('JSON-lines (gzip)', '*.jsonl.gz')])
+        if not path:
+            return
+        header = (self._t.get('history_col_time', 'time'),
+                  self._t.get('history_col_expression', 'expression'),
+                  self._t.get('history_col_result', 'result'))
+        self._export = Exportacao(self._history, path, header=header)
+        self._export_window = top = tk.Toplevel(self.master)
+        top.title(self._t.get('history_export', 'Export...'))
+        top.resizable(False, False)
+        self._export_label = tk.Label(top, text='0%', padx=12, pady=8, width=28)
+        self._export_label.pack()
+        tk.Button(top, text=self._t.get('cancel', 'Cancel'), command=self._export.cancel).pack(pady=6)
+        top.protocol('WM_DELETE_WINDOW', self._export.cancel)
+        self.master.after(100, self._poll_export)
+
+    def _poll_export(self):
+        export = self._export
+        if not export.done():
+            self._export_label['text'] = '%d%%  (%d / %d)' % (export.fraction() * 100, export.exported, export.total)
+            self.master.after(100, self._poll_export)
+            return
+        self._export_window.destroy()
+        if export.error is not None:
+            self._flash_info(self._t.get('export_error_title', 'Export error'), str(export.error))
+        elif not export.cancelled():
             self._flash_info(self._t.get('export_success_title', 'Export successful'),
-                             self._t.get('export_success_msg', f'Exported to {path}'))
-        except Exception as e:
-            self._flash_info(self._t.get('export_error_title', 'Export error'),
-                             str(e))
+                             self._t.get('export_success_msg', 'Exported to {path}').format(path=export.path))
 
     def _flash_info(self, title, message):
         try:
@@ -498,30 +872,30 @@ class Calculadora(object):
             pass
 
     def _show_history(self):
-        win = tk.Toplevel(self.master)
-        win.title(self._t.get('history_window_title', 'History'))
-        win.geometry('360x420')
-        frame = tk.Frame(win, bg=self.theme.get('frame_bg', '#ffffff'))
-        frame.pack(fill='both', expand=True)
-        listbox = tk.Listbox(frame)
-        listbox.pack(fill='both', expand=True, padx=8, pady=8)
-        for e in self._history:
-            listbox.insert('end', f"{e.get('time','')}  |  {e.get('expression','')} = {e.get('result','')}")
-        def copy_selected_to_input(event=None):
-            try:
-                sel = listbox.get(listbox.curselection())
-                if '|' in sel and '=' in sel:
-                    expr = sel.split('|',1)[1].split('=',1)[0].strip()
-                    self._entrada.delete(0, len(self._entrada.get()))
-                    self._entrada.insert(0, expr)
-            except Exception:
-                pass
-        listbox.bind('<Double-Button-1>', copy_selected_to_input)
-        btns = tk.Frame(win)
-        btns.pack(fill='x', padx=8, pady=8)
-        tk.Button(btns, text=self._t.get('history_copy_btn', 'Copy to input'), command=copy_selected_to_input).pack(side='left')
-        tk.Button(btns, text=self._t.get('close', 'Close'), command=win.destroy).pack(side='right')
-        win.resizable(False, False)
+        # PT: A janela é criada uma vez (com o índice de busca) e reaproveitada
+        # EN: The window is created once (with the search index) and reused
+        # FR: La fenêtre est créée une fois (avec l'index de recherche) et réutilisée
+        if self._history_window is None:
+            from .janela_historico import JanelaHistorico
+            self._history_window = JanelaHistorico(self.master, self._history, self.theme, self._t,
+                                                   self._copy_history_entry, index=self.context.history_index)
+        self._history_window.show()
+
+    def _show_worksheet(self):
+        # PT: Planilha de linhas nomeadas ("a = 3*7", "b = a**2") com o Calculador compartilhado
+        # EN: Worksheet of named lines ("a = 3*7", "b = a**2") with the shared Calculador
+        # FR: Feuille de lignes nommées (« a = 3*7 », « b = a**2 ») avec le Calculador partagé
+        if self._worksheet_window is None:
+            from .janela_planilha import JanelaPlanilha
+            self._worksheet_window = JanelaPlanilha(self.master, self.calc, self.theme, self._t,
+                                                    self._copy_history_entry)
+        self._worksheet_window.show()
+
+    def _copy_history_entry(self, entry):
+        if self._pending is not None:
+            return
+        self._set_result_in_input(entry.get('expression', ''), error=False)
+        self._schedule_preview()
 
     # ---------- End history utilities ----------
 
@@ -532,30 +906,59 @@ class Calculadora(object):
         print(self._t.get('start_message', 'Calculator started...'))
         self.master.mainloop()
 
-    def _reload_app(self):
-        # PT: Reinicia o aplicativo executando o mesmo processo Python
-        # EN: Reload the app by exec'ing the Python process
-        # FR: Recharge l'application en exécutant à nouveau le processus Python
-        python = sys.executable
-        os.execl(python, python, * sys.argv)
-
-    def _realod_app(self):
-        # PT: Nome legado mantido (chama o reload real)
-        # EN: Legacy name kept (calls the real reload)
-        # FR: Nom hérité conservé (appelle le vrai rechargement)
-        self._reload_app()
+    def _new_window(self):
+        # PT: Outra calculadora no mesmo Tk e no mesmo contexto (só os widgets são novos)
+        # EN: Another calculator on the same Tk and the same context (only the widgets are new)
+        # FR: Une autre calculatrice sur le même Tk et le même contexte (seuls les widgets sont nouveaux)
+        return Calculadora(tk.Toplevel(self.master.nametowidget('.')), context=self.context)
+
+    def _close_window(self):
+        # PT: Solta a janela do contexto; callbacks pendentes (after) encontram _pending e a
+        #     prévia vazios e não tocam mais nos widgets
+        # EN: Detach the window from the context; pending (after) callbacks find _pending and the
+        #     preview empty and no longer touch the widgets
+        # FR: Détache la fenêtre du contexte ; les callbacks en attente (after) trouvent _pending et
+        #     l'aperçu vides et ne touchent plus aux widgets
+        self._cancel_evaluation()
+        self._clear_preview()
+        if self._export is not None and not self._export.done():
+            self._export.cancel()
+        if self._history_window is not None:
+            self._history_window.destroy()
+            self._history_window = None
+        if self._worksheet_window is not None:
+            self._worksheet_window.destroy()
+            self._worksheet_window = None
+        self.context.detach(self)
+        self.master.destroy()
 
     def _exit(self):
-        # PT: Sai da aplicação
-        # EN: Exit the application
-        # FR: Quitter l'application
+        # PT: Sai da aplicação (o histórico pendente é gravado e compactado via atexit)
+        # EN: Exit the application (pending history is written and compacted through atexit)
+        # FR: Quitter l'application (l'historique en attente est écrit et compacté via atexit)
         exit()
 
     def _change_language(self, lang_code):
-        # PT: Escreve a escolha no settings e reinicia para aplicar o novo idioma
-        # EN: Write choice to settings and restart to apply the new language
-        # FR: Écrit le choix dans les paramètres et redémarre pour appliquer la nouvelle langue
+        # PT: Escreve a escolha no settings e troca os textos da janela e do menu na hora
+        # EN: Write choice to settings and switch the window and menu texts right away
+        # FR: Écrit le choix dans les paramètres et change les textes de la fenêtre et du menu aussitôt
         self.settings['current_language'] = lang_code
-        with open('./app/settings/settings.json', 'w', encoding='utf-8') as outfile:
-            json_dump(self.settings, outfile, indent=4, ensure_ascii=False)
-        self._reload_app()
+        self._save_settings()
+        self.context.notify('_on_language_changed')
+
+    def _on_language_changed(self):
+        # PT: Chamado em todas as janelas do contexto quando qualquer uma troca o idioma
+        # EN: Called on every window of the context when any of them switches the language
+        # FR: Appelé sur toutes les fenêtres du contexte quand l'une d'elles change de langue
+        lang_code = self.settings.get('current_language', 'en')
+        showing_error = self._is_entry_error()
+        self.current_language = lang_code
+        self._t = translations.get(lang_code, translations.get('en', {}))
+        self.master.title(self._t.get('title', 'Calculator Tk'))
+        if showing_error:
+            self._set_result_in_input(result=self._localized_error(), error=True)
+        self._create_menu(self.master)
+        if self._history_window is not None:
+            self._history_window.apply(self.theme, self._t)
+        if self._worksheet_window is not None:
+            self._worksheet_window.apply(self.theme, self._t)
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from functools import lru_cache
+
+
+# PT: Tipos de resultado: float, inteiro (exato em um double) ou texto internado
+# EN: Result kinds: float, integer (exact in a double) or interned text
+# FR: Types de résultat : float, entier (exact dans un double) ou texte interné
+_FLOAT, _INT, _TEXT = 0, 1, 2
+
+# PT: Maior inteiro representado exatamente em um double
+# EN: Largest integer exactly representable in a double
+# FR: Plus grand entier représentable exactement dans un double
+_EXACT_INT = 1 << 53
+
+_NO_TIME = -(1 << 63)
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_MAGIC = b'CALCHIST'
+_VERSION = 1
+# PT: magic, versão, linhas, entradas, textos, deslocamento no diário, verificação do diário, tamanho dos extras
+# EN: magic, version, lines, entries, strings, journal offset, journal check, extras size
+# FR: magic, version, lignes, entrées, textes, décalage du journal, vérification du journal, taille des extras
+_HEADER = struct.Struct('<8sIIqqqqqq')
+
+
+@lru_cache(maxsize=1024)
+def _hour_start(prefix):
+    # PT: Época do início da hora 'AAAA-MM-DD HH' (mudanças de horário de verão caem em horas cheias)
+    # EN: Epoch of the start of hour 'YYYY-MM-DD HH' (DST changes fall on whole hours)
+    # FR: Époque du début de l'heure 'AAAA-MM-JJ HH' (les changements d'heure tombent sur des heures pleines)
+    return int(time.mktime(time.strptime(prefix, '%Y-%m-%d %H')))
+
+
+def parse_time(text):
+    # PT: 'AAAA-MM-DD HH:MM:SS' (hora local) -> segundos desde a época
+    # EN: 'YYYY-MM-DD HH:MM:SS' (local time) -> seconds since the epoch
+    # FR: 'AAAA-MM-JJ HH:MM:SS' (heure locale) -> secondes depuis l'époque
+    try:
+        if len(text) != 19 or text[13] != ':' or text[16] != ':':
+            raise ValueError(text)
+        minutes, seconds = int(text[14:16]), int(text[17:19])
+        if not (0 <= minutes < 60 and 0 <= seconds < 60):
+            raise ValueError(text)
+        return _hour_start(text[:13]) + minutes * 60 + seconds
+    except (TypeError, ValueError, OverflowError):
+        return _NO_TIME
+
+
+def format_time(seconds):
+    if seconds == _NO_TIME:
+        return ''
+    return time.strftime(_TIME_FORMAT, time.localtime(seconds))
+
+
+class HistoryColumns(object):
+    """Histórico em colunas (array) com textos internados; API de lista de dicts."""
+    # PT: Cada entrada ocupa ~25 bytes: horário int64, ID da expressão, tipo do resultado
+    #     e o resultado em um double (número nativo ou ID de texto). Expressões e resultados
+    #     textuais são guardados uma vez só, com contagem de uso. Descartes pelo limite só
+    #     avançam o início; o espaço é recuperado quando o lixo passa do tamanho vivo
+    # EN: Each entry takes ~25 bytes: int64 time, expression ID, result kind and the
+    #     result in a double (native number or text ID). Expressions and textual results
+    #     are stored once, with a use count. Drops by the limit only move the start; the
+    #     space is reclaimed once the garbage outgrows the live size
+    # FR: Chaque entrée occupe ~25 octets : heure int64, ID de l'expression, type du résultat
+    #     et le résultat dans un double (nombre natif ou ID de texte). Les expressions et les
+    #     résultats textuels sont stockés une seule fois, avec un compteur d'utilisation. Les
+    #     retraits par la limite ne font qu'avancer le début ; l'espace est récupéré quand les
+    #     déchets dépassent la taille vivante
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self._times = array('q')
+        self._expressions = array('q')
+        self._kinds = array('b')
+        self._values = array('d')
+        self._strings = []
+        self._string_ids = {}
+        self._hits = array('q')
+        # PT: Campos além de time/expression/result, por posição absoluta (raros)
+        # EN: Fields beyond time/expression/result, by absolute position (rare)
+        # FR: Champs au-delà de time/expression/result, par position absolue (rares)
+        self._extra = {}
+        self._start = 0
+        self._base = 0
+
+    # ---------- Strings ----------
+    def _intern(self, text):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self._strings)
+            self._strings.append(text)
+            self._hits.append(0)
+        self._hits[string_id] += 1
+        return string_id
+
+    def hits(self, expression):
+        # PT: Quantas entradas vivas usam esta expressão
+        # EN: How many live entries use this expression
+        # FR: Combien d'entrées vivantes utilisent cette expression
+        string_id = self._string_ids.get(expression)
+        return 0 if string_id is None else self._hits[string_id]
+
+    def most_common(self, n=10):
+        # PT: Textos mais usados (expressões e resultados textuais)
+        # EN: Most used texts (expressions and textual results)
+        # FR: Textes les plus utilisés (expressions et résultats textuels)
+        ranked = sorted(range(len(self._strings)), key=self._hits.__getitem__, reverse=True)
+        return [(self._strings[i], self._hits[i]) for i in ranked[:n] if self._hits[i]]
+
+    # ---------- Encoding ----------
+    def _encode_result(self, text):
+        # PT: Só vira número se voltar exatamente ao mesmo texto
+        # EN: Only becomes a number if it turns back into exactly the same text
+        # FR: Ne devient un nombre que s'il redonne exactement le même texte
+        try:
+            number = float(text)
+        except (TypeError, ValueError):
+            number = None
+        if number is not None:
+            if repr(number) == text:
+                return _FLOAT, number
+            if number.is_integer() and abs(number) < _EXACT_INT and str(int(number)) == text:
+                return _INT, number
+        return _TEXT, float(self._intern(str(text)))
+
+    def _decode_result(self, kind, value):
+        if kind == _FLOAT:
+            return repr(value)
+        if kind == _INT:
+            return str(int(value))
+        return self._strings[int(value)]
+
+    # ---------- List-like API ----------
+    def append(self, entry):
+        seconds = entry.get('timestamp')
+        if seconds is None:
+            seconds = parse_time(entry.get('time'))
+        kind, value = self._encode_result(entry.get('result', ''))
+        self._times.append(int(seconds))
+        self._expressions.append(self._intern(str(entry.get('expression', ''))))
+        self._kinds.append(kind)
+        self._values.append(value)
+        extra = {k: v for k, v in entry.items() if k not in ('time', 'timestamp', 'expression', 'result')}
+        if seconds == _NO_TIME and entry.get('time'):
+            # PT: Horário fora do formato: guardado como texto, sem perda
+            # EN: Time in an unexpected format: kept as text, nothing lost
+            # FR: Heure dans un format inattendu : conservée en texte, sans perte
+            extra['time'] = entry['time']
+        if extra:
+            self._extra[self._base + len(self._times) - 1] = extra
+        if self.limit is not None and len(self) > self.limit:
+            self._drop(len(self) - self.limit)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def clear(self):
+        self.__init__(self.limit)
+
+    def __len__(self):
+        return len(self._times) - self._start
+
+    def __iter__(self):
+        for i in range(self._start, len(self._times)):
+            yield self._entry(i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._entry(self._start + i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('history index out of range')
+        return self._entry(self._start + index)
+
+    def _entry(self, i):
+        entry = {
+            'time': format_time(self._times[i]),
+            'expression': self._strings[self._expressions[i]],
+            'result': self._decode_result(self._kinds[i], self._values[i]),
+        }
+        extra = self._extra.get(self._base + i)
+        if extra:
+            entry.update(extra)
+        return entry
+
+    # ---------- Limit ----------
+    def _drop(self, count):
+        for i in range(self._start, self._start + count):
+            self._hits[self._expressions[i]] -= 1
+            if self._kinds[i] == _TEXT:
+                self._hits[int(self._values[i])] -= 1
+            if self._extra:
+                self._extra.pop(self._base + i, None)
+        self._start += count
+        if self._start > max(len(self), 1024):
+            self._reclaim()
+
+    def _reclaim(self):
+        # PT: Corta o lixo do início das colunas e remove textos sem uso, renumerando os IDs
+        # EN: Cut the garbage off the start of the columns and remove unused texts, renumbering IDs
+        # FR: Coupe les déchets du début des colonnes et retire les textes inutilisés, en renumérotant les ID
+        start = self._start
+        del self._times[:start]
+        del self._expressions[:start]
+        del self._kinds[:start]
+        del self._values[:start]
+        self._base += start
+        self._start = 0
+        remap = {}
+        strings, hits = [], array('q')
+        for old_id, text in enumerate(self._strings):
+            if self._hits[old_id] > 0:
+                remap[old_id] = len(strings)
+                strings.append(text)
+                hits.append(self._hits[old_id])
+        self._strings, self._hits = strings, hits
+        self._string_ids = {text: i for i, text in enumerate(strings)}
+        self._expressions = array('q', [remap[i] for i in self._expressions])
+        for i, kind in enumerate(self._kinds):
+            if kind == _TEXT:
+                self._values[i] = float(remap[int(self._values[i])])
+
+    # ---------- Binary snapshot ----------
+    def save(self, path, lines=0, journal_offset=0, journal_check=0):
+        # PT: Grava um instantâneo binário (colunas contíguas) de forma atômica
+        # EN: Atomically write a binary snapshot (contiguous columns)
+        # FR: Écrit de façon atomique un instantané binaire (colonnes contiguës)
+        if self._start:
+            self._reclaim()
+        blobs = [text.encode('utf-8') for text in self._strings]
+        offsets = array('q', [0])
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        extra = json.dumps({str(k - self._base): v for k, v in self._extra.items()},
+                           ensure_ascii=False).encode('utf-8')
+        kinds = self._kinds.tobytes()
+        tmp = path + '.tmp'
+        with open(tmp, mode='wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, 0, lines, len(self._times), len(blobs),
+                                 journal_offset, journal_check, len(extra)))
+            f.write(self._times.tobytes())
+            f.write(self._expressions.tobytes())
+            f.write(self._values.tobytes())
+            f.write(self._hits.tobytes())
+            f.write(offsets.tobytes())
+            f.write(kinds + b'\0' * (-len(kinds) % 8))
+            f.write(b''.join(blobs))
+            f.write(extra)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, limit=None):
+        # PT: Lê o instantâneo via mmap: as colunas são copiadas em bloco, sem interpretar JSON.
+        #     Devolve (colunas, linhas, deslocamento no diário, verificação do diário)
+        # EN: Read the snapshot through mmap: columns are block-copied, no JSON is parsed.
+        #     Returns (columns, lines, journal offset, journal check)
+        # FR: Lit l'instantané via mmap : les colonnes sont copiées en bloc, sans analyser de JSON.
+        #     Renvoie (colonnes, lignes, décalage du journal, vérification du journal)
+        with open(path, mode='rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                header = _HEADER.unpack_from(mm, 0)
+                magic, version, _, lines, count, nstrings, offset, check, extra_size = header
+                if magic != _MAGIC or version != _VERSION:
+                    raise ValueError('not a history snapshot')
+                columns = cls(limit)
+                pos = _HEADER.size
+
+                def column(typecode, n, width):
+                    nonlocal pos
+                    data = array(typecode)
+                    data.frombytes(mm[pos:pos + n * width])
+                    pos += n * width
+                    return data
+
+                columns._times = column('q', count, 8)
+                columns._expressions = column('q', count, 8)
+                columns._values = column('d', count, 8)
+                columns._hits = column('q', nstrings, 8)
+                offsets = column('q', nstrings + 1, 8)
+                columns._kinds = column('b', count + (-count % 8), 1)[:count]
+                blob = mm[pos:pos + offsets[-1]]
+                pos += offsets[-1]
+                if pos + extra_size > len(mm):
+                    raise ValueError('truncated history snapshot')
+                columns._strings = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(nstrings)]
+                columns._string_ids = {text: i for i, text in enumerate(columns._strings)}
+                if extra_size:
+                    columns._extra = {int(k): v for k, v in json.loads(mm[pos:pos + extra_size]).items()}
+        if limit is not None and len(columns) > limit:
+            columns._drop(len(columns) - limit)
+        return columns, lines, offset, check
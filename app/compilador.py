@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import ast
+import operator
+
+# PT: Módulo próprio (funções científicas e constantes)
+# EN: Local module (scientific functions and constants)
+# FR: Module local (fonctions scientifiques et constantes)
+from . import funcoes
+
+
+class InvalidExpression(ValueError):
+    """Expressão com construções fora da gramática da calculadora."""
+    # PT: Levantada quando a expressão usa algo além de números, + - * / **, parênteses e as
+    #     funções e constantes de funcoes.py
+    # EN: Raised when the expression uses anything beyond numbers, + - * / **, parentheses and
+    #     the functions and constants of funcoes.py
+    # FR: Levée quand l'expression utilise autre chose que des nombres, + - * / **, parenthèses et
+    #     les fonctions et constantes de funcoes.py
+
+
+# PT: Operadores permitidos, resolvidos uma única vez na compilação
+# EN: Allowed operators, resolved once at compile time
+# FR: Opérateurs autorisés, résolus une seule fois à la compilation
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+# PT: Funções e constantes do motor float (padrão de build)
+# EN: Functions and constants of the float engine (build's default)
+# FR: Fonctions et constantes du moteur float (par défaut pour build)
+FLOAT_LIBRARY = funcoes.library('float')
+
+# PT: factorial só é dobrado na compilação até este argumento (o resto fica com o limite de custo)
+# EN: factorial is only folded at compile time up to this argument (the rest goes through the cost limit)
+# FR: factorial n'est plié à la compilation que jusqu'à cet argument (le reste passe par la limite de coût)
+_FOLD_FACTORIAL = 1000
+
+
+class Programa(object):
+    """Expressão já analisada e compilada em closures."""
+    # PT: Guarda o texto original, a árvore validada e a função executável
+    # EN: Holds the source text, the validated tree and the runnable function
+    # FR: Conserve le texte source, l'arbre validé et la fonction exécutable
+    __slots__ = ('source', 'tree', 'run', 'key', 'engine', 'runners', 'cost', 'env', 'names')
+
+    def __init__(self, source, tree, run):
+        self.source = source
+        self.tree = tree
+        self.run = run
+        # PT: Forma canônica, usada como chave do cache de resultados
+        # EN: Canonical form, used as the result cache key
+        # FR: Forme canonique, utilisée comme clé du cache de résultats
+        self.key = canonical(tree)
+        # PT: Motor numérico escolhido para esta expressão (modo "auto") e closures exatas já montadas
+        # EN: Numeric engine chosen for this expression ("auto" mode) and exact closures already built
+        # FR: Moteur numérique choisi pour cette expression (mode « auto ») et closures exactes déjà construites
+        self.engine = None
+        self.runners = {}
+        # PT: Custo estimado em bits (ver custo.estimate), calculado na primeira execução
+        # EN: Estimated cost in bits (see custo.estimate), computed on the first run
+        # FR: Coût estimé en bits (voir custo.estimate), calculé à la première exécution
+        self.cost = None
+        # PT: Só em fórmulas (ver compile_expression): dict nome -> valor lido pelas variáveis
+        #     a cada execução, e os nomes usados pela expressão
+        # EN: Formulas only (see compile_expression): dict name -> value read by the variables
+        #     on every run, and the names used by the expression
+        # FR: Formules seulement (voir compile_expression) : dict nom -> valeur lu par les variables
+        #     à chaque exécution, et les noms utilisés par l'expression
+        self.env = None
+        self.names = ()
+
+
+def parse(source, names=()):
+    # PT: Analisa o texto e valida a árvore contra a gramática restrita;
+    #     `names` lista as variáveis permitidas (vazio no modo normal, None aceita qualquer nome)
+    # EN: Parse the text and validate the tree against the restricted grammar;
+    #     `names` lists the allowed variables (empty in normal mode, None accepts any name)
+    # FR: Analyse le texte et valide l'arbre selon la grammaire restreinte ;
+    #     `names` liste les variables autorisées (vide en mode normal, None accepte tout nom)
+    tree = ast.parse(source.strip(), mode='eval').body
+    _validate(tree, names)
+    return tree
+
+
+def _validate(node, names=()):
+    if isinstance(node, ast.BinOp):
+        if type(node.op) not in BINARY_OPERATORS:
+            raise InvalidExpression(type(node.op).__name__)
+        _validate(node.left, names)
+        _validate(node.right, names)
+    elif isinstance(node, ast.UnaryOp):
+        if type(node.op) not in UNARY_OPERATORS:
+            raise InvalidExpression(type(node.op).__name__)
+        _validate(node.operand, names)
+    elif isinstance(node, ast.Constant):
+        if type(node.value) not in (int, float):
+            raise InvalidExpression(repr(node.value))
+    elif isinstance(node, ast.Call):
+        # PT: Só funções da biblioteca, pelo nome, com um argumento posicional
+        # EN: Only library functions, by name, with one positional argument
+        # FR: Seulement des fonctions de la bibliothèque, par nom, avec un argument positionnel
+        if not isinstance(node.func, ast.Name) or node.func.id not in funcoes.FUNCTIONS:
+            raise InvalidExpression(ast.dump(node.func))
+        if node.keywords or len(node.args) != 1:
+            raise InvalidExpression('%s() takes exactly one argument' % node.func.id)
+        _validate(node.args[0], names)
+    elif isinstance(node, ast.Name) and (names is None or node.id in names):
+        return
+    elif isinstance(node, ast.Name) and node.id in funcoes.CONSTANTS['float']:
+        return
+    elif isinstance(node, ast.Name):
+        # PT: Mesmo erro que eval() daria para um nome desconhecido
+        # EN: Same error eval() would give for an unknown name
+        # FR: Même erreur qu'eval() pour un nom inconnu
+        raise NameError("name '%s' is not defined" % node.id)
+    else:
+        raise InvalidExpression(type(node).__name__)
+
+
+# PT: Operadores comutativos e símbolos usados na forma canônica
+# EN: Commutative operators and symbols used in the canonical form
+# FR: Opérateurs commutatifs et symboles utilisés dans la forme canonique
+_COMMUTATIVE = (ast.Add, ast.Mult)
+_SYMBOLS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.Pow: '**',
+            ast.UAdd: '+', ast.USub: '-'}
+
+
+def _is_integer_only(node):
+    # PT: Verdadeiro se a subárvore só envolve inteiros e + - * (aritmética exata)
+    # EN: True if the subtree only involves integers and + - * (exact arithmetic)
+    # FR: Vrai si le sous-arbre n'implique que des entiers et + - * (arithmétique exacte)
+    if isinstance(node, ast.Constant):
+        return type(node.value) is int
+    if isinstance(node, ast.UnaryOp):
+        return _is_integer_only(node.operand)
+    if isinstance(node, ast.BinOp):
+        return (isinstance(node.op, (ast.Add, ast.Sub, ast.Mult))
+                and _is_integer_only(node.left) and _is_integer_only(node.right))
+    return False
+
+
+def _flatten(node, op_type, out):
+    # PT: Achata uma cadeia do mesmo operador (a+b+c) em uma lista de termos
+    # EN: Flatten a chain of the same operator (a+b+c) into a list of terms
+    # FR: Aplatit une chaîne du même opérateur (a+b+c) en une liste de termes
+    if isinstance(node, ast.BinOp) and type(node.op) is op_type:
+        _flatten(node.left, op_type, out)
+        _flatten(node.right, op_type, out)
+    else:
+        out.append(node)
+    return out
+
+
+def canonical(node):
+    # PT: Texto canônico: sem espaços nem parênteses redundantes, operandos comutativos ordenados.
+    #     Cadeias só são reordenadas por completo quando são inteiras (associatividade exata);
+    #     com floats só os dois operandos de cada + ou * são trocados, o que é exato em IEEE 754.
+    # EN: Canonical text: no whitespace or redundant parentheses, commutative operands sorted.
+    #     Whole chains are only reordered when they are integer-only (exact associativity);
+    #     with floats only the two operands of each + or * are swapped, which is exact in IEEE 754.
+    # FR: Texte canonique : sans espaces ni parenthèses redondantes, opérandes commutatifs triés.
+    #     Les chaînes ne sont réordonnées entièrement que si elles sont entières (associativité exacte) ;
+    #     avec des flottants seuls les deux opérandes de chaque + ou * sont échangés, ce qui est exact en IEEE 754.
+    if isinstance(node, ast.Constant):
+        return repr(node.value)
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Call):
+        return '%s(%s)' % (node.func.id, canonical(node.args[0]))
+    if isinstance(node, ast.UnaryOp):
+        return '(%s%s)' % (_SYMBOLS[type(node.op)], canonical(node.operand))
+    op_type = type(node.op)
+    symbol = _SYMBOLS[op_type]
+    if op_type in _COMMUTATIVE:
+        if _is_integer_only(node):
+            terms = _flatten(node, op_type, [])
+        else:
+            terms = [node.left, node.right]
+        return '(%s)' % symbol.join(sorted(canonical(t) for t in terms))
+    return '(%s%s%s)' % (canonical(node.left), symbol, canonical(node.right))
+
+
+def operations(tree):
+    # PT: Contagem de operações por símbolo ou função ({'+': 2, '**': 1, 'sin': 1}); sem laços
+    #     na gramática, é também o número de operações executadas
+    # EN: Operation count by symbol or function ({'+': 2, '**': 1, 'sin': 1}); with no loops in
+    #     the grammar, it is also the number of operations executed
+    # FR: Nombre d'opérations par symbole ou fonction ({'+': 2, '**': 1, 'sin': 1}) ; sans boucles
+    #     dans la grammaire, c'est aussi le nombre d'opérations exécutées
+    counts = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            symbol = node.func.id
+        elif isinstance(node, ast.UnaryOp):
+            symbol = 'neg' if isinstance(node.op, ast.USub) else 'pos'
+        elif isinstance(node, ast.BinOp):
+            symbol = _SYMBOLS[type(node.op)]
+        else:
+            continue
+        counts[symbol] = counts.get(symbol, 0) + 1
+    return counts
+
+
+def variables(tree):
+    # PT: Variáveis usadas pela expressão (sem funções nem constantes), em ordem alfabética
+    # EN: Variables used by the expression (no functions or constants), in alphabetical order
+    # FR: Variables utilisées par l'expression (sans fonctions ni constantes), par ordre alphabétique
+    constants = funcoes.CONSTANTS['float']
+    found = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.BinOp):
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, ast.UnaryOp):
+            stack.append(node.operand)
+        elif isinstance(node, ast.Call):
+            stack.append(node.args[0])
+        elif isinstance(node, ast.Name) and node.id not in constants:
+            found.add(node.id)
+    return tuple(sorted(found))
+
+
+def lookup(env, convert=None):
+    # PT: Resolvedor de nomes para build(): cada variável vira uma closure que lê `env[nome]`
+    #     na execução (convertido por `convert`, ex.: float -> Decimal)
+    # EN: Name resolver for build(): each variable becomes a closure reading `env[name]`
+    #     at run time (converted by `convert`, e.g. float -> Decimal)
+    # FR: Résolveur de noms pour build() : chaque variable devient une closure qui lit `env[nom]`
+    #     à l'exécution (converti par `convert`, ex. : float -> Decimal)
+    if convert is None:
+        return lambda name: lambda: env[name]
+    return lambda name: lambda: convert(env[name])
+
+
+def _foldable(node):
+    # PT: Verdadeiro se o nó só tem literais, constantes e chamadas sobre eles (sem operadores
+    #     binários: uma potência nunca é calculada na compilação, antes do limite de custo)
+    # EN: True if the node only has literals, constants and calls on them (no binary operators:
+    #     a power is never computed at compile time, before the cost limit)
+    # FR: Vrai si le nœud n'a que des littéraux, des constantes et des appels sur eux (sans
+    #     opérateurs binaires : une puissance n'est jamais calculée à la compilation, avant la limite de coût)
+    if isinstance(node, ast.Constant):
+        return True
+    if isinstance(node, ast.Name):
+        return node.id in funcoes.CONSTANTS['float']
+    if isinstance(node, ast.UnaryOp):
+        return _foldable(node.operand)
+    if isinstance(node, ast.Call):
+        return _foldable(node.args[0])
+    return False
+
+
+def build(node, literal=None, observe=None, names=None, library=None):
+    # PT: Converte cada nó em uma closure sem argumentos; `literal` converte as constantes
+    #     (ex.: para Decimal ou Fraction) uma única vez, na compilação. `observe`, se dado,
+    #     recebe (e devolve) o resultado de cada operação (perfil de valores intermediários).
+    #     `names` (ver lookup) liga cada variável à sua closure, também na compilação.
+    #     `library` é o par (funções, constantes) do motor (ver funcoes.library): cada chamada
+    #     fica ligada direto ao callable, e chamadas sobre constantes viram o próprio valor
+    # EN: Turn each node into a closure taking no arguments; `literal` converts the constants
+    #     (e.g. to Decimal or Fraction) once, at compile time. `observe`, if given, receives
+    #     (and returns) the result of each operation (profiling of intermediate values).
+    #     `names` (see lookup) binds each variable to its closure, also at compile time.
+    #     `library` is the engine's (functions, constants) pair (see funcoes.library): each call
+    #     is bound straight to the callable, and calls on constants become the value itself
+    # FR: Transforme chaque nœud en une closure sans argument ; `literal` convertit les constantes
+    #     (ex. : en Decimal ou Fraction) une seule fois, à la compilation. `observe`, si donné,
+    #     reçoit (et renvoie) le résultat de chaque opération (profilage des valeurs intermédiaires).
+    #     `names` (voir lookup) lie chaque variable à sa closure, aussi à la compilation.
+    #     `library` est la paire (fonctions, constantes) du moteur (voir funcoes.library) : chaque
+    #     appel est lié directement au callable, et les appels sur des constantes deviennent la valeur
+    functions, constants = library or FLOAT_LIBRARY
+    if isinstance(node, ast.Constant):
+        value = node.value if literal is None else literal(node.value)
+        return lambda: value
+    if isinstance(node, ast.Name):
+        if node.id in constants:
+            value = constants[node.id]
+            return lambda: value
+        return names(node.id)
+    if isinstance(node, ast.Call):
+        function = functions[node.func.id]
+        argument = build(node.args[0], literal, observe, names, library)
+        if observe is None and _foldable(node.args[0]):
+            try:
+                value = argument()
+                if funcoes.FUNCTIONS[node.func.id].kind != 'factorial' or abs(value) <= _FOLD_FACTORIAL:
+                    value = function(value)
+                    return lambda: value
+            except (ValueError, ArithmeticError):
+                # PT: O erro (ex.: ln(0)) aparece na execução, como nos outros casos
+                # EN: The error (e.g. ln(0)) shows up at run time, as in the other cases
+                # FR: L'erreur (ex. : ln(0)) apparaît à l'exécution, comme dans les autres cas
+                pass
+        if observe is not None:
+            return lambda: observe(function(argument()))
+        return lambda: function(argument())
+    if isinstance(node, ast.UnaryOp):
+        op = UNARY_OPERATORS[type(node.op)]
+        operand = build(node.operand, literal, observe, names, library)
+        if observe is not None:
+            return lambda: observe(op(operand()))
+        return lambda: op(operand())
+    op = BINARY_OPERATORS[type(node.op)]
+    left = build(node.left, literal, observe, names, library)
+    right = build(node.right, literal, observe, names, library)
+    if observe is not None:
+        return lambda: observe(op(left(), right()))
+    return lambda: op(left(), right())
+
+
+def compile_expression(source, env=None):
+    # PT: Analisa e compila a expressão; o resultado pode ser executado várias vezes.
+    #     Com `env` (dict nome -> valor) é uma fórmula: aceita qualquer nome e lê o valor
+    #     atual de cada variável em `env` a cada execução
+    # EN: Parse and compile the expression; the result can be run many times.
+    #     With `env` (dict name -> value) it is a formula: it accepts any name and reads the
+    #     current value of each variable from `env` on every run
+    # FR: Analyse et compile l'expression ; le résultat peut être exécuté plusieurs fois.
+    #     Avec `env` (dict nom -> valeur) c'est une formule : elle accepte tout nom et lit la
+    #     valeur actuelle de chaque variable dans `env` à chaque exécution
+    if env is None:
+        tree = parse(source)
+        return Programa(source, tree, build(tree))
+    tree = parse(source, None)
+    program = Programa(source, tree, build(tree, names=lookup(env)))
+    program.env = env
+    program.names = variables(tree)
+    return program
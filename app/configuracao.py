@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import hashlib
+import json
+import marshal
+import os
+
+
+# PT: Chaves que o usuário altera pela interface; ficam no arquivo de preferências
+# EN: Keys the user changes through the interface; they live in the preferences file
+# FR: Clés modifiées par l'utilisateur via l'interface ; elles vivent dans le fichier de préférences
+PREFERENCE_KEYS = ('current_theme', 'current_language')
+
+# PT: Grupos de botões que recebem o bloco 'global' do catálogo
+# EN: Button groups that receive the catalog's 'global' block
+# FR: Groupes de boutons qui reçoivent le bloc 'global' du catalogue
+BUTTON_STYLES = ('BTN_NUMERICO', 'BTN_OPERADOR', 'BTN_DEFAULT', 'BTN_CLEAR')
+
+_CACHE_VERSION = 1
+
+
+def _atomic_write(path, data):
+    # PT: Escrita atômica: arquivo temporário + os.replace
+    # EN: Atomic write: temporary file + os.replace
+    # FR: Écriture atomique : fichier temporaire + os.replace
+    tmp = path + '.tmp'
+    with open(tmp, mode='wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def compile_catalog(catalog):
+    # PT: Pré-processa o catálogo: temas por nome com o bloco 'global' já mesclado nos botões
+    # EN: Pre-process the catalog: themes by name with the 'global' block already merged into buttons
+    # FR: Pré-traite le catalogue : thèmes par nom avec le bloc 'global' déjà fusionné dans les boutons
+    global_style = catalog.get('global', {})
+    themes = {}
+    names = []
+    for theme in catalog.get('themes', []):
+        name = theme.get('name')
+        if not name:
+            continue
+        merged = {key: dict(value) if isinstance(value, dict) else value for key, value in theme.items()}
+        for style in BUTTON_STYLES:
+            merged.setdefault(style, {}).update(global_style)
+        themes[name] = merged
+        names.append(name)
+    defaults = {key: value for key, value in catalog.items() if key not in ('themes', 'global')}
+    return {'defaults': defaults, 'themes': themes, 'theme_names': names}
+
+
+class Configuracao(object):
+    """Catálogo de temas somente leitura + preferências do usuário, com instantâneo em cache."""
+    # PT: O settings.json (catálogo) não é mais reescrito. O catálogo compilado fica em cache
+    #     (marshal) com mtime, tamanho e SHA-256 do arquivo: com o mesmo mtime nada é lido;
+    #     com outro mtime mas o mesmo hash só a chave é atualizada. As preferências ficam em
+    #     um arquivo pequeno gravado atomicamente
+    # EN: settings.json (the catalog) is no longer rewritten. The compiled catalog is cached
+    #     (marshal) with the file's mtime, size and SHA-256: with the same mtime nothing is read;
+    #     with another mtime but the same hash only the key is updated. Preferences live in a
+    #     small file written atomically
+    # FR: settings.json (le catalogue) n'est plus réécrit. Le catalogue compilé est mis en cache
+    #     (marshal) avec le mtime, la taille et le SHA-256 du fichier : avec le même mtime rien n'est
+    #     lu ; avec un autre mtime mais le même hash seule la clé est mise à jour. Les préférences
+    #     vivent dans un petit fichier écrit de façon atomique
+
+    def __init__(self, catalog_path='./app/settings/settings.json',
+                 preferences_path='./app/settings/preferences.json',
+                 cache_path='./app/settings/settings.cache'):
+        self.catalog_path = catalog_path
+        self.preferences_path = preferences_path
+        self.cache_path = cache_path
+        self._snapshot = self._load_snapshot()
+        self.preferences = self._load_preferences()
+
+    # ---------- Public API ----------
+    @property
+    def theme_names(self):
+        return list(self._snapshot['theme_names'])
+
+    def theme(self, name):
+        # PT: Cópia do tema compilado (estilos por widget prontos), ou {} se não existir
+        # EN: Copy of the compiled theme (per-widget styles ready), or {} if missing
+        # FR: Copie du thème compilé (styles par widget prêts), ou {} s'il n'existe pas
+        theme = self._snapshot['themes'].get(name) or {}
+        return {key: dict(value) if isinstance(value, dict) else value for key, value in theme.items()}
+
+    def settings(self):
+        # PT: Valores do catálogo com as preferências por cima (dict novo a cada chamada)
+        # EN: Catalog values with the preferences on top (new dict on every call)
+        # FR: Valeurs du catalogue avec les préférences par-dessus (nouveau dict à chaque appel)
+        merged = dict(self._snapshot['defaults'])
+        merged.update(self.preferences)
+        return merged
+
+    def save_preferences(self, values):
+        # PT: Grava só as chaves de preferência que mudaram (alguns bytes)
+        # EN: Write only the preference keys that changed (a few bytes)
+        # FR: N'écrit que les clés de préférence qui ont changé (quelques octets)
+        changed = {key: values[key] for key in PREFERENCE_KEYS
+                   if key in values and self.preferences.get(key) != values[key]}
+        if not changed:
+            return
+        self.preferences.update(changed)
+        _atomic_write(self.preferences_path, json.dumps(self.preferences, ensure_ascii=False).encode('utf-8'))
+
+    # ---------- Loading ----------
+    def _load_preferences(self):
+        try:
+            with open(self.preferences_path, mode='r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return {key: data[key] for key in PREFERENCE_KEYS if key in data}
+
+    def _load_snapshot(self):
+        stat = os.stat(self.catalog_path)
+        cached = self._read_cache()
+        if cached is not None and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+            return cached['snapshot']
+        with open(self.catalog_path, mode='rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if cached is not None and cached['sha256'] == digest:
+            snapshot = cached['snapshot']
+        else:
+            snapshot = compile_catalog(json.loads(raw.decode('utf-8')))
+        self._write_cache(stat, digest, snapshot)
+        return snapshot
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, mode='rb') as f:
+                cached = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(cached, dict) or cached.get('version') != _CACHE_VERSION:
+            return None
+        return cached
+
+    def _write_cache(self, stat, digest, snapshot):
+        cached = {'version': _CACHE_VERSION, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                  'sha256': digest, 'snapshot': snapshot}
+        try:
+            _atomic_write(self.cache_path, marshal.dumps(cached))
+        except (OSError, ValueError):
+            pass
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import os
+
+# PT: Módulos próprios (configuração e motor de cálculo)
+# EN: Local modules (configuration and calculation engine)
+# FR: Modules locaux (configuration et moteur de calcul)
+# PT: Executor, histórico e instrumentação continuam sendo importados sob demanda
+# EN: Executor, history and instrumentation are still imported on demand
+# FR: Exécuteur, historique et instrumentation sont toujours importés à la demande
+from .calculador import Calculador
+from .configuracao import Configuracao
+
+
+class ContextoDaAplicacao(object):
+    """Estado compartilhado por todas as janelas da calculadora no processo."""
+    # PT: Uma única cópia de configurações, temas compilados, Calculador (com seus caches),
+    #     executor, histórico (um só escritor: nada de janelas sobrescrevendo o arquivo umas
+    #     das outras) e índice de busca. Cada Calculadora fica só com os widgets e a entrada
+    # EN: A single copy of settings, compiled themes, Calculador (with its caches), executor,
+    #     history (a single writer: no windows overwriting each other's file) and search index.
+    #     Each Calculadora keeps only its widgets and its input
+    # FR: Une seule copie des paramètres, des thèmes compilés, du Calculador (avec ses caches), de
+    #     l'exécuteur, de l'historique (un seul écrivain : aucune fenêtre n'écrase le fichier d'une
+    #     autre) et de l'index de recherche. Chaque Calculadora ne garde que ses widgets et sa saisie
+
+    def __init__(self, config=None):
+        self.config = config or Configuracao()
+        # PT: Um único dict: mudar o tema ou idioma em uma janela muda para todas
+        # EN: A single dict: changing the theme or language in one window changes it for all
+        # FR: Un seul dict : changer le thème ou la langue dans une fenêtre le change pour toutes
+        self.settings = self.config.settings()
+        self.calc = Calculador(engine=self.settings.get('numeric_engine', 'auto'),
+                               precision=self.settings.get('decimal_precision', 28),
+                               profile=self.settings.get('engine_profiling', False),
+                               slow_log_size=self.settings.get('slow_log_size', 100),
+                               slow_threshold_ms=self.settings.get('slow_threshold_ms', 5.0))
+        if self.calc.profile:
+            # PT: As expressões mais lentas da sessão ficam em um JSON-lines ao sair
+            # EN: The session's slowest expressions are written to a JSON-lines file on exit
+            # FR: Les expressions les plus lentes de la session sont écrites en JSON-lines à la sortie
+            import atexit
+            atexit.register(self.calc.slow_log.dump,
+                            self.settings.get('slow_log_path', './app/settings/slow_expressions.jsonl'))
+        self.windows = []
+        self._themes = {}
+        self._evaluator = None
+        self._history = None
+        self._history_index = None
+        self._instruments = None
+        self._instruments_checked = False
+        self._recorder = None
+
+    # ---------- Windows ----------
+    def attach(self, window):
+        self.windows.append(window)
+
+    def detach(self, window):
+        if window in self.windows:
+            self.windows.remove(window)
+
+    def notify(self, handler):
+        # PT: Chama `handler` (nome de método, ex.: '_on_theme_changed') em todas as janelas
+        # EN: Call `handler` (a method name, e.g. '_on_theme_changed') on every window
+        # FR: Appelle `handler` (nom de méthode, ex. : '_on_theme_changed') sur toutes les fenêtres
+        for window in list(self.windows):
+            getattr(window, handler)()
+
+    # ---------- Settings ----------
+    def save_preferences(self):
+        self.config.save_preferences(self.settings)
+
+    def theme(self, name):
+        # PT: Tema compilado compartilhado (somente leitura: os widgets só leem os estilos)
+        # EN: Shared compiled theme (read-only: widgets only read the styles)
+        # FR: Thème compilé partagé (lecture seule : les widgets ne font que lire les styles)
+        theme = self._themes.get(name)
+        if theme is None:
+            theme = self._themes[name] = self.config.theme(name)
+        return theme
+
+    # ---------- Services ----------
+    @property
+    def evaluator(self):
+        # PT: Avaliação fora da thread do Tk, com prazo (s) e limite de memória (MB)
+        # EN: Evaluation off the Tk thread, with a deadline (s) and a memory limit (MB)
+        # FR: Évaluation hors du thread Tk, avec un délai (s) et une limite mémoire (Mo)
+        if self._evaluator is None:
+            from .executor import ExecutorDeCalculo
+            self._evaluator = ExecutorDeCalculo(
+                self.calc,
+                timeout=self.settings.get('evaluation_timeout', 10.0),
+                memory_limit=self.settings.get('evaluation_memory_mb', 512) * 1024 * 1024)
+        return self._evaluator
+
+    @property
+    def history_loaded(self):
+        return self._history is not None
+
+    def history(self, path='./app/settings/history.jsonl'):
+        # PT: Histórico carregado no primeiro uso; as expressões já calculadas são pré-compiladas
+        #     na thread do executor (os resultados são sempre refeitos com o motor atual)
+        # EN: History loaded on first use; the expressions already calculated are pre-compiled
+        #     on the executor thread (results are always recomputed with the current engine)
+        # FR: Historique chargé au premier usage ; les expressions déjà calculées sont précompilées
+        #     sur le thread de l'exécuteur (les résultats sont toujours recalculés avec le moteur actuel)
+        if self._history is None:
+            from .historico import HistoryStore
+            # PT: A gravação acontece na thread de escrita; com a instrumentação, mede cada lote
+            # EN: Saving happens on the writer thread; with instrumentation, time each batch
+            # FR: L'écriture se fait sur le thread d'écriture ; avec l'instrumentation, mesure chaque lot
+            instruments = self.instruments()
+            on_write = None
+            if instruments is not None:
+                on_write = lambda lines, ns: instruments.record('history_write', ns)
+            self._history = HistoryStore(path=path, legacy_path='./app/settings/history.json',
+                                         limit=self.settings.get('history_limit', 10000),
+                                         on_write=on_write)
+            self.evaluator.warm(self._history)
+        return self._history
+
+    @property
+    def history_index(self):
+        if self._history_index is None:
+            from .indice import HistoryIndex
+            self._history_index = HistoryIndex(self.history())
+        return self._history_index
+
+    def instruments(self):
+        # PT: Instrumentos compartilhados (um só conjunto de histogramas e um só arquivo), ou None
+        #     se desligados; desligados, o módulo nem é importado
+        # EN: Shared instruments (a single set of histograms and a single file), or None when off;
+        #     when off, the module is not even imported
+        # FR: Instruments partagés (un seul jeu d'histogrammes et un seul fichier), ou None s'ils
+        #     sont désactivés ; désactivés, le module n'est même pas importé
+        if self._instruments_checked:
+            return self._instruments
+        self._instruments_checked = True
+        if not (os.environ.get('CALC_INSTRUMENTATION') or self.settings.get('instrumentation', False)):
+            return None
+        from . import instrumentacao
+        if not instrumentacao.enabled(self.settings):
+            return None
+        self._instruments = instrumentacao.Instrumentos(
+            self.settings.get('instrumentation_path', './app/settings/instrumentation.json'))
+        self._instruments.install_signals()
+        return self._instruments
+
+    def recorder(self):
+        # PT: Gravador de teclas compartilhado (um arquivo para todas as janelas), ou None.
+        #     Liga com CALC_RECORD_KEYS=<arquivo> ou "record_keys_path" no settings
+        # EN: Shared key recorder (one file for every window), or None.
+        #     Turned on with CALC_RECORD_KEYS=<file> or "record_keys_path" in settings
+        # FR: Enregistreur de touches partagé (un fichier pour toutes les fenêtres), ou None.
+        #     Activé avec CALC_RECORD_KEYS=<fichier> ou "record_keys_path" dans les paramètres
+        if self._recorder is None:
+            path = os.environ.get('CALC_RECORD_KEYS') or self.settings.get('record_keys_path')
+            if not path:
+                return None
+            import atexit
+            from .gravacao import Gravador
+            self._recorder = Gravador(path)
+            atexit.register(self._recorder.close)
+        return self._recorder
+
+    def close(self):
+        # PT: Grava o histórico pendente e encerra os serviços (ao sair, histórico e gravador já fecham via atexit)
+        # EN: Write the pending history and stop the services (on exit, history and recorder already close through atexit)
+        # FR: Écrit l'historique en attente et arrête les services (à la sortie, historique et enregistreur se ferment déjà via atexit)
+        if self._history is not None:
+            self._history.close()
+        if self._recorder is not None:
+            self._recorder.close()
+        if self._evaluator is not None:
+            self._evaluator.shutdown()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import ast
+import math
+import operator
+from fractions import Fraction
+
+# PT: Módulo próprio (funções científicas: tipo de resultado e custo do fatorial)
+# EN: Local module (scientific functions: result kind and factorial cost)
+# FR: Module local (fonctions scientifiques : type de résultat et coût de la factorielle)
+from .funcoes import CONSTANTS, FUNCTIONS, factorial_bits
+
+
+# PT: Limite padrão de bits de um inteiro intermediário (~1,26 milhão de dígitos decimais)
+# EN: Default limit on the bits of an intermediate integer (~1.26 million decimal digits)
+# FR: Limite par défaut des bits d'un entier intermédiaire (~1,26 million de chiffres décimaux)
+MAX_BITS = 1 << 22
+
+# PT: Um float nunca passa de 2**1024: acima disso Python levanta OverflowError de imediato
+# EN: A float never exceeds 2**1024: above that Python raises OverflowError right away
+# FR: Un float ne dépasse jamais 2**1024 : au-delà Python lève OverflowError immédiatement
+_FLOAT_BITS = 1024.0
+
+
+class ExpressionTooExpensive(ArithmeticError):
+    """Expressão cujo custo estimado passa do limite (ex.: 9**9**9)."""
+    # PT: Rejeitada antes de executar, em tempo proporcional ao tamanho da árvore
+    # EN: Rejected before running, in time proportional to the tree size
+    # FR: Rejetée avant exécution, en temps proportionnel à la taille de l'arbre
+
+
+def _log2(value):
+    # PT: log2|x| (0 para |x| <= 1); math.log2 aceita inteiros de qualquer tamanho
+    # EN: log2|x| (0 for |x| <= 1); math.log2 accepts integers of any size
+    # FR: log2|x| (0 pour |x| <= 1) ; math.log2 accepte des entiers de toute taille
+    value = abs(value)
+    return math.log2(value) if value > 1 else 0.0
+
+
+# PT: Subexpressões inteiras menores que isto são calculadas de verdade na estimativa,
+#     o que torna o limite de expoentes como 2**20 exato em vez de pessimista
+# EN: Integer subexpressions smaller than this are actually computed during estimation,
+#     which makes the bound of exponents such as 2**20 exact instead of pessimistic
+# FR: Les sous-expressions entières plus petites que ceci sont réellement calculées pendant
+#     l'estimation, ce qui rend la borne d'exposants comme 2**20 exacte au lieu de pessimiste
+_KNOWN_BITS = 64.0
+
+_INTEGER_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub,
+                      ast.Mult: operator.mul, ast.Pow: operator.pow}
+
+
+def estimate(tree, engine='auto', env=None):
+    # PT: Limite superior, em bits, do maior valor exato (int ou Fraction) que a expressão
+    #     pode produzir. Floats e Decimal têm tamanho limitado e não contam: no máximo
+    #     estouram, o que é barato. Só executa subexpressões inteiras pequenas
+    # EN: Upper bound, in bits, of the largest exact value (int or Fraction) the expression
+    #     can produce. Floats and Decimal have bounded size and do not count: at worst
+    #     they overflow, which is cheap. Only runs small integer subexpressions
+    # FR: Borne supérieure, en bits, de la plus grande valeur exacte (int ou Fraction) que
+    #     l'expression peut produire. Les floats et Decimal ont une taille bornée et ne comptent
+    #     pas : au pire ils débordent, ce qui est peu coûteux. N'exécute que de petites sous-expressions entières.
+    # PT: Variáveis com valor em `env` (fórmulas) contam como literais desse valor
+    # EN: Variables with a value in `env` (formulas) count as literals of that value
+    # FR: Les variables ayant une valeur dans `env` (formules) comptent comme des littéraux de cette valeur
+    if engine == 'decimal':
+        return 0.0
+    fraction = engine == 'fraction'
+    constants = CONSTANTS['float']
+    peak = [0.0]
+
+    def leaf(value):
+        known = value if type(value) is int and _log2(value) <= _KNOWN_BITS else None
+        if fraction:
+            value = Fraction(repr(value)) if isinstance(value, float) else Fraction(value)
+            return True, _log2(value.numerator) + _log2(value.denominator), known
+        if isinstance(value, int):
+            return True, _log2(value), known
+        return False, min(_log2(value), _FLOAT_BITS), known
+
+    def call(name, exact, bits, known):
+        kind = FUNCTIONS[name].kind
+        if kind == 'same':
+            return exact, bits, abs(known) if known is not None else None
+        if kind == 'integer':
+            # PT: floor/ceil devolvem um int do tamanho do argumento
+            # EN: floor/ceil return an int the size of the argument
+            # FR: floor/ceil renvoient un int de la taille de l'argument
+            return True, bits, known
+        if kind == 'factorial':
+            # PT: log2(n!) <= n*log2(n), com n <= 2**bits quando n não é conhecido
+            # EN: log2(n!) <= n*log2(n), with n <= 2**bits when n is not known
+            # FR: log2(n!) <= n*log2(n), avec n <= 2**bits quand n n'est pas connu
+            if known is not None:
+                bits = factorial_bits(known)
+                known = math.factorial(known) if 0 <= known and bits <= _KNOWN_BITS else None
+            else:
+                bits = bits * 2.0 ** bits if bits < 64 else math.inf
+            return True, bits, known
+        # PT: Resultado aproximado (float); no motor Fraction vira a fração exata desse float
+        # EN: Approximate (float) result; on the Fraction engine it becomes that float's exact fraction
+        # FR: Résultat approché (float) ; sur le moteur Fraction il devient la fraction exacte de ce float
+        if fraction:
+            return True, 2 * _FLOAT_BITS + 64, None
+        return False, _FLOAT_BITS, None
+
+    def walk(node):
+        # PT: Retorna (é exato?, limite de log2|valor|, valor inteiro se conhecido);
+        #     para Fraction o limite soma numerador e denominador
+        # EN: Return (is exact?, bound of log2|value|, integer value if known);
+        #     for Fraction the bound adds numerator and denominator
+        # FR: Retourne (est exact ?, borne de log2|valeur|, valeur entière si connue) ;
+        #     pour Fraction la borne additionne numérateur et dénominateur
+        if isinstance(node, ast.Constant):
+            return leaf(node.value)
+        if isinstance(node, ast.Name):
+            if env is not None and node.id in env:
+                return leaf(env[node.id])
+            if node.id in constants:
+                return leaf(constants[node.id])
+            return False, _FLOAT_BITS, None
+        if isinstance(node, ast.Call):
+            exact, bits, known = call(node.func.id, *walk(node.args[0]))
+            if exact:
+                peak[0] = max(peak[0], bits)
+            else:
+                bits = min(bits, _FLOAT_BITS)
+            return exact, bits, known
+        if isinstance(node, ast.UnaryOp):
+            exact, bits, known = walk(node.operand)
+            if known is not None and isinstance(node.op, ast.USub):
+                known = -known
+            return exact, bits, known
+        left_exact, left, left_known = walk(node.left)
+        right_exact, right, right_known = walk(node.right)
+        exact = left_exact and right_exact
+        op = node.op
+        if isinstance(op, (ast.Add, ast.Sub)):
+            bits = (left + right + 1) if fraction else (max(left, right) + 1)
+        elif isinstance(op, ast.Mult):
+            bits = left + right
+        elif isinstance(op, ast.Div):
+            # PT: int/int vira float; só Fraction continua exata
+            # EN: int/int becomes a float; only Fraction stays exact
+            # FR: int/int devient un float ; seule Fraction reste exacte
+            exact = fraction
+            bits = left + right
+        elif right_known is not None:
+            # PT: |a**b| = 2**(log2|a| * b) com b conhecido; int elevado a negativo vira float
+            # EN: |a**b| = 2**(log2|a| * b) with b known; int to a negative power becomes a float
+            # FR: |a**b| = 2**(log2|a| * b) avec b connu ; un int à une puissance négative devient un float
+            bits = left * abs(right_known)
+            if right_known < 0 and not fraction:
+                exact = False
+        else:
+            # PT: |a**b| <= 2**(log2|a| * |b|), com |b| <= 2**right
+            # EN: |a**b| <= 2**(log2|a| * |b|), with |b| <= 2**right
+            # FR: |a**b| <= 2**(log2|a| * |b|), avec |b| <= 2**right
+            bits = (left * 2.0 ** right if right < _FLOAT_BITS else math.inf) if left else 0.0
+        known = None
+        if exact and left_known is not None and right_known is not None and bits <= _KNOWN_BITS \
+                and not isinstance(op, ast.Div) and not (isinstance(op, ast.Pow) and right_known < 0):
+            known = _INTEGER_OPERATORS[type(op)](left_known, right_known)
+            bits = _log2(known)
+        if exact:
+            peak[0] = max(peak[0], bits)
+        else:
+            bits = min(bits, _FLOAT_BITS)
+        return exact, bits, known
+
+    walk(tree)
+    return peak[0]
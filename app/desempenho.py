@@ -0,0 +1,621 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import fnmatch
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from fractions import Fraction
+
+# PT: Módulos próprios (motor de cálculo, formatação, histórico e planilha)
+# EN: Local modules (calculation engine, formatting, history and worksheet)
+# FR: Modules locaux (moteur de calcul, formatage, historique et feuille)
+from .calculador import Calculador
+from .formatacao import format_result
+from .historico import HistoryStore
+from .planilha import Planilha
+
+
+# PT: Versão do formato do arquivo de resultados
+# EN: Version of the results file format
+# FR: Version du format du fichier de résultats
+FORMAT_VERSION = 1
+
+CATEGORIES = ('short', 'nested', 'huge', 'error', 'function')
+
+PERCENTILES = (50, 90, 99)
+
+_OPERATORS = '+-*/'
+_FUNCTIONS = ('sin', 'cos', 'tan', 'atan', 'sqrt', 'ln', 'log', 'exp', 'abs', 'floor')
+
+
+class Pulado(Exception):
+    """Cenário que não pode rodar neste ambiente (ex.: sem display X)."""
+
+
+# ---------- Corpus ----------
+def _number(rng):
+    if rng.random() < 0.3:
+        return '%d.%d' % (rng.randint(0, 999), rng.randint(0, 99))
+    return str(rng.randint(1, 9999))
+
+
+def _short(rng):
+    terms = [_number(rng) for _ in range(rng.randint(2, 4))]
+    return ''.join(term + rng.choice(_OPERATORS) for term in terms[:-1]) + terms[-1]
+
+
+def _nested(rng):
+    expr = _number(rng)
+    for _ in range(rng.randint(8, 40)):
+        expr = '(%s%s%s)' % (expr, rng.choice(_OPERATORS), _number(rng))
+    return expr
+
+
+def _huge(rng):
+    kind = rng.randint(0, 2)
+    if kind == 0:
+        return '%d**%d' % (rng.randint(2, 99), rng.randint(1000, 60000))
+    if kind == 1:
+        return '%d**%d*%d**%d' % (rng.randint(2, 9), rng.randint(500, 5000),
+                                  rng.randint(2, 9), rng.randint(500, 5000))
+    return '(%d**%d)/%d' % (rng.randint(2, 99), rng.randint(500, 8000), rng.randint(3, 97))
+
+
+def _error(rng):
+    kind = rng.randint(0, 5)
+    number = _number(rng)
+    if kind == 0:
+        return '%s/0' % number
+    if kind == 1:
+        return '%s%s' % (number, rng.choice(_OPERATORS))
+    if kind == 2:
+        return '(' * rng.randint(1, 5) + number
+    if kind == 3:
+        return '%s**%d**%d' % (rng.randint(10, 99), rng.randint(10, 99), rng.randint(10, 99))
+    if kind == 4:
+        return 'x%s' % number
+    return '0**-%s' % rng.randint(1, 9)
+
+
+def _function(rng):
+    # PT: Mesma forma de _short, com termos dentro de funções científicas (e π, e)
+    # EN: Same shape as _short, with terms inside scientific functions (and π, e)
+    # FR: Même forme que _short, avec des termes dans des fonctions scientifiques (et π, e)
+    terms = []
+    for _ in range(rng.randint(2, 4)):
+        kind = rng.randint(0, 3)
+        if kind == 0:
+            terms.append('%s(%s)' % (rng.choice(_FUNCTIONS), _number(rng)))
+        elif kind == 1:
+            terms.append('factorial(%d)' % rng.randint(0, 300))
+        elif kind == 2:
+            terms.append('%s(%s*%s)' % (rng.choice(_FUNCTIONS), rng.choice(('pi', 'e')), _number(rng)))
+        else:
+            terms.append(_number(rng))
+    return ''.join(term + rng.choice(_OPERATORS) for term in terms[:-1]) + terms[-1]
+
+
+_GENERATORS = {'short': _short, 'nested': _nested, 'huge': _huge, 'error': _error, 'function': _function}
+
+
+def generate_corpus(size=500, seed=0):
+    # PT: Corpus reprodutível: `size` expressões por categoria, sempre as mesmas para a mesma semente
+    # EN: Reproducible corpus: `size` expressions per category, always the same for the same seed
+    # FR: Corpus reproductible : `size` expressions par catégorie, toujours les mêmes pour la même graine
+    rng = random.Random(seed)
+    return {category: [_GENERATORS[category](rng) for _ in range(size)] for category in CATEGORIES}
+
+
+def load_corpus(path):
+    # PT: Expressões reais: uma por linha, ou JSON-lines com 'expression' (ex.: o registro de
+    #     expressões lentas do perfil do motor, ou o history.jsonl)
+    # EN: Real expressions: one per line, or JSON lines with 'expression' (e.g. the engine
+    #     profiling slow-expression log, or history.jsonl)
+    # FR: Expressions réelles : une par ligne, ou JSON-lines avec 'expression' (ex. : le journal
+    #     des expressions lentes du profilage du moteur, ou history.jsonl)
+    expressions = []
+    with open(path, mode='r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('{'):
+                try:
+                    line = json.loads(line).get('expression', '')
+                except (ValueError, AttributeError):
+                    continue
+            if line:
+                expressions.append(line)
+    return expressions
+
+
+# ---------- Measurement ----------
+def percentile(ordered, p):
+    # PT: Percentil por posição mais próxima sobre uma lista já ordenada
+    # EN: Nearest-rank percentile over an already sorted list
+    # FR: Percentile au rang le plus proche sur une liste déjà triée
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies, elapsed):
+    # PT: Latências em nanossegundos -> vazão (op/s) e percentis em microssegundos
+    # EN: Latencies in nanoseconds -> throughput (ops/s) and percentiles in microseconds
+    # FR: Latences en nanosecondes -> débit (op/s) et percentiles en microsecondes
+    ordered = sorted(latencies)
+    summary = {'ops': len(ordered), 'seconds': round(elapsed, 6),
+               'throughput': round(len(ordered) / elapsed, 1) if elapsed else 0.0}
+    for p in PERCENTILES:
+        summary['p%d_us' % p] = round(percentile(ordered, p) / 1000.0, 3)
+    summary['max_us'] = round(ordered[-1] / 1000.0, 3) if ordered else 0.0
+    return summary
+
+
+def measure(operation, items, rounds=3, setup=None):
+    # PT: Chama operation(estado, item) para cada item, `rounds` vezes; setup() cria o estado
+    #     de cada rodada fora da medição
+    # EN: Call operation(state, item) for each item, `rounds` times; setup() creates each
+    #     round's state outside the measurement
+    # FR: Appelle operation(état, item) pour chaque item, `rounds` fois ; setup() crée l'état
+    #     de chaque tour hors mesure
+    clock = time.perf_counter_ns
+    latencies = []
+    for _ in range(rounds):
+        state = setup() if setup is not None else None
+        for item in items:
+            start = clock()
+            operation(state, item)
+            latencies.append(clock() - start)
+    return summarize(latencies, sum(latencies) / 1e9)
+
+
+# ---------- Scenarios ----------
+def _evaluate(calc, expr):
+    calc.calculation(expr)
+
+
+def _eval_scenario(category):
+    def scenario(corpus, rounds, workdir):
+        # PT: Calculador novo a cada rodada: caches frios
+        # EN: New Calculador every round: cold caches
+        # FR: Nouveau Calculador à chaque tour : caches froids
+        return measure(_evaluate, corpus[category], rounds, setup=Calculador)
+    return scenario
+
+
+def _eval_recorded(corpus, rounds, workdir):
+    if not corpus.get('recorded'):
+        raise Pulado('no --corpus file given')
+    return measure(_evaluate, corpus['recorded'], rounds, setup=Calculador)
+
+
+def _eval_cached(corpus, rounds, workdir):
+    calc = Calculador()
+    items = corpus['short'] + corpus['nested']
+    for expr in items:
+        calc.calculation(expr)
+    return measure(_evaluate, items, rounds, setup=lambda: calc)
+
+
+def gil_enabled():
+    # PT: sys._is_gil_enabled existe a partir do 3.13; antes disso o GIL sempre está ligado
+    # EN: sys._is_gil_enabled exists from 3.13 on; before that the GIL is always on
+    # FR: sys._is_gil_enabled existe à partir de 3.13 ; avant, le GIL est toujours actif
+    check = getattr(sys, '_is_gil_enabled', None)
+    return True if check is None else check()
+
+
+def _eval_threads(threads):
+    def scenario(corpus, rounds, workdir):
+        # PT: Um Calculador compartilhado (caches frios a cada rodada) e o corpus repartido entre
+        #     `threads` threads; a vazão é a do conjunto (operações / tempo de parede). Com o GIL
+        #     as threads se revezam e a vazão fica próxima da de uma thread; num CPython sem GIL
+        #     (3.13t) ela deve crescer com o número de threads, até o número de CPUs
+        # EN: One shared Calculador (cold caches every round) and the corpus split across
+        #     `threads` threads; the throughput is the aggregate one (operations / wall time). With
+        #     the GIL the threads take turns and the throughput stays close to a single thread's;
+        #     on a free-threaded CPython (3.13t) it should grow with the thread count, up to the CPU count
+        # FR: Un Calculador partagé (caches froids à chaque tour) et le corpus réparti entre
+        #     `threads` threads ; le débit est celui de l'ensemble (opérations / temps réel). Avec le
+        #     GIL les threads se relaient et le débit reste proche de celui d'un seul thread ; sur un
+        #     CPython sans GIL (3.13t) il doit croître avec le nombre de threads, jusqu'au nombre de CPU
+        items = corpus['short'] + corpus['nested'] + corpus['function']
+        parts = [items[i::threads] for i in range(threads)]
+        latencies = [[] for _ in range(threads)]
+        elapsed = 0.0
+        clock = time.perf_counter_ns
+
+        def work(calc, barrier, part, out):
+            barrier.wait()
+            for expr in part:
+                start = clock()
+                calc.calculation(expr)
+                out.append(clock() - start)
+
+        for _ in range(rounds):
+            calc = Calculador()
+            barrier = threading.Barrier(threads + 1)
+            workers = [threading.Thread(target=work, args=(calc, barrier, parts[i], latencies[i]))
+                       for i in range(threads)]
+            for worker in workers:
+                worker.start()
+            barrier.wait()
+            started = time.perf_counter()
+            for worker in workers:
+                worker.join()
+            elapsed += time.perf_counter() - started
+        summary = summarize([latency for part in latencies for latency in part], elapsed)
+        summary['threads'] = threads
+        return summary
+    return scenario
+
+
+def _format_values(corpus, rounds, workdir):
+    rng = random.Random(len(corpus['short']))
+    values = []
+    for _ in range(len(corpus['short'])):
+        values.append(rng.uniform(-1e6, 1e6))
+        values.append(rng.randint(1, 10 ** 12))
+        values.append(rng.randint(2, 9) ** rng.randint(100, 3000))
+        values.append(Decimal(rng.randint(1, 10 ** 9)) / Decimal(7))
+        values.append(Fraction(rng.randint(1, 999), rng.randint(1, 999)))
+    return measure(lambda state, value: format_result(value), values, rounds)
+
+
+def _sheet_edit(corpus, rounds, workdir):
+    # PT: Planilha com as expressões curtas (linhas independentes) e cadeias de 10 linhas;
+    #     cada operação edita uma linha, então o custo deve seguir as dependentes dela
+    #     (1 ou 10 linhas), não o tamanho da planilha
+    # EN: Worksheet with the short expressions (independent lines) and 10-line chains;
+    #     each operation edits one line, so the cost should follow its dependents
+    #     (1 or 10 lines), not the size of the worksheet
+    # FR: Feuille avec les expressions courtes (lignes indépendantes) et des chaînes de 10 lignes ;
+    #     chaque opération modifie une ligne, le coût doit donc suivre ses dépendantes
+    #     (1 ou 10 lignes), pas la taille de la feuille
+    short = corpus['short']
+    texts = ['k%d = %s' % (i, expr) for i, expr in enumerate(short)]
+    texts += ['c%d = %s' % (i, 'c%d + 1' % (i - 1) if i % 10 else '1') for i in range(len(short))]
+    sheet = Planilha()
+    sheet.update(texts)
+    rng = random.Random(len(texts))
+    edits = []
+    for _ in range(len(short)):
+        if rng.random() < 0.5:
+            position = rng.randrange(len(short))
+            edits.append((position, 'k%d = %s' % (position, rng.choice(short))))
+        else:
+            chain = rng.randrange(len(short) // 10 or 1) * 10
+            edits.append((len(short) + chain, 'c%d = %d' % (chain, rng.randint(1, 10 ** 6))))
+    return measure(lambda state, edit: sheet.set(*edit), edits, rounds)
+
+
+def _history_entries(corpus):
+    entries = []
+    for i, expr in enumerate(corpus['short'] * 4):
+        entries.append({'time': '2024-01-01 %02d:%02d:%02d' % (i // 3600 % 24, i // 60 % 60, i % 60),
+                        'expression': expr, 'result': str(i)})
+    return entries
+
+
+def _store(path, limit):
+    # PT: Loja isolada no diretório temporário, sem importar um history.json antigo
+    # EN: Store isolated in the temporary directory, without importing an old history.json
+    # FR: Stockage isolé dans le répertoire temporaire, sans importer d'ancien history.json
+    return HistoryStore(path=path, legacy_path=path + '.legacy', limit=limit)
+
+
+def _history_append(corpus, rounds, workdir):
+    entries = _history_entries(corpus)
+    path = os.path.join(workdir, 'append.jsonl')
+    stores = []
+
+    def setup():
+        for name in ('append.jsonl', 'append.bin'):
+            if os.path.exists(os.path.join(workdir, name)):
+                os.remove(os.path.join(workdir, name))
+        store = _store(path, len(entries))
+        stores.append(store)
+        return store
+
+    try:
+        return measure(lambda store, entry: store.append(entry), entries, rounds, setup=setup)
+    finally:
+        for store in stores:
+            store.close()
+
+
+def _write_journal(workdir, name, entries):
+    path = os.path.join(workdir, name)
+    with open(path, mode='w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return path
+
+
+def _history_save(corpus, rounds, workdir):
+    # PT: Append + flush(wait=True): o custo completo até o dado estar no disco
+    # EN: Append + flush(wait=True): the full cost until the data is on disk
+    # FR: Append + flush(wait=True) : le coût complet jusqu'à ce que la donnée soit sur disque
+    entries = _history_entries(corpus)[:200]
+    path = os.path.join(workdir, 'save.jsonl')
+    store = _store(path, len(entries) * rounds)
+
+    def save(store, entry):
+        store.append(entry)
+        store.flush(wait=True)
+    try:
+        return measure(save, entries, rounds, setup=lambda: store)
+    finally:
+        store.close()
+
+
+def _history_load(snapshot):
+    def scenario(corpus, rounds, workdir):
+        entries = _history_entries(corpus) * 10
+        path = _write_journal(workdir, 'load.jsonl', entries)
+        binary = os.path.join(workdir, 'load.bin')
+        if snapshot:
+            _store(path, len(entries)).close()
+
+        def load(state, _):
+            if not snapshot and os.path.exists(binary):
+                os.remove(binary)
+            store = _store(path, len(entries))
+            state.append(store)
+        stores = []
+        try:
+            result = measure(load, [None] * 5, rounds, setup=lambda: stores)
+        finally:
+            for store in stores:
+                store.close()
+        result['entries'] = len(entries)
+        return result
+    return scenario
+
+
+def _gui_root():
+    try:
+        import tkinter as tk
+        return tk.Tk()
+    except Exception as e:
+        raise Pulado('no display: %s' % e)
+
+
+def _gui_startup(corpus, rounds, workdir):
+    from .calculadora import Calculadora
+
+    def build(state, _):
+        master = _gui_root()
+        try:
+            Calculadora(master)
+            master.update_idletasks()
+        finally:
+            master.destroy()
+    return measure(build, [None] * 5, rounds)
+
+
+def _gui_keys(corpus, rounds, workdir):
+    # PT: Comandos dos botões, como um clique os chamaria, até o widget estar atualizado
+    # EN: Button commands, as a click would call them, until the widget is updated
+    # FR: Commandes des boutons, comme un clic les appellerait, jusqu'à la mise à jour du widget
+    from .calculadora import Calculadora
+    master = _gui_root()
+    try:
+        calculadora = Calculadora(master)
+        commands = {'C': calculadora._clear_input, '<': calculadora._del_last_value_in_input,
+                    '(': calculadora._set_open_parent, ')': calculadora._set_close_parent,
+                    '.': lambda: calculadora._set_dot_in_input('.')}
+        keys = []
+        for expr in corpus['short']:
+            keys.append('C')
+            keys.extend(expr)
+
+        def press(state, key):
+            if key in commands:
+                commands[key]()
+            elif key.isdigit():
+                calculadora._set_values_in_input(key)
+            else:
+                calculadora._set_operator_in_input(key)
+            master.update_idletasks()
+        return measure(press, keys, rounds)
+    finally:
+        master.destroy()
+
+
+# PT: Cenários por nome; os de GUI precisam de um display X
+# EN: Scenarios by name; the GUI ones need an X display
+# FR: Scénarios par nom ; ceux de la GUI ont besoin d'un affichage X
+SCENARIOS = {
+    'eval.short': _eval_scenario('short'),
+    'eval.nested': _eval_scenario('nested'),
+    'eval.huge': _eval_scenario('huge'),
+    'eval.error': _eval_scenario('error'),
+    'eval.function': _eval_scenario('function'),
+    'eval.recorded': _eval_recorded,
+    'eval.cached': _eval_cached,
+    'eval.threads.1': _eval_threads(1),
+    'eval.threads.2': _eval_threads(2),
+    'eval.threads.4': _eval_threads(4),
+    'eval.threads.8': _eval_threads(8),
+    'format': _format_values,
+    'sheet.edit': _sheet_edit,
+    'history.append': _history_append,
+    'history.save': _history_save,
+    'history.load.journal': _history_load(snapshot=False),
+    'history.load.snapshot': _history_load(snapshot=True),
+    'gui.startup': _gui_startup,
+    'gui.keys': _gui_keys,
+}
+
+GUI_SCENARIOS = ('gui.startup', 'gui.keys')
+
+
+class DisplayVirtual(object):
+    """Usa o $DISPLAY existente ou sobe um Xvfb temporário; sem nenhum dos dois, available é False."""
+
+    def __init__(self):
+        self.available = False
+        self.reason = None
+        self._process = None
+        self._previous = None
+
+    def __enter__(self):
+        if os.environ.get('DISPLAY'):
+            self.available = True
+            return self
+        xvfb = shutil.which('Xvfb')
+        if xvfb is None:
+            self.reason = 'no $DISPLAY and Xvfb is not installed'
+            return self
+        display = ':%d' % (90 + os.getpid() % 100)
+        self._process = subprocess.Popen([xvfb, display, '-nolisten', 'tcp', '-screen', '0', '1024x768x24'],
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(0.5)
+        if self._process.poll() is not None:
+            self.reason = 'Xvfb exited with status %d' % self._process.returncode
+            self._process = None
+            return self
+        self._previous = os.environ.get('DISPLAY')
+        os.environ['DISPLAY'] = display
+        self.available = True
+        return self
+
+    def __exit__(self, *exc):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait()
+            if self._previous is None:
+                os.environ.pop('DISPLAY', None)
+            else:
+                os.environ['DISPLAY'] = self._previous
+        return False
+
+
+def run_benchmarks(names=None, size=500, seed=0, rounds=3, gui=True, log=None, corpus_path=None):
+    # PT: Roda os cenários pedidos e devolve o documento de resultados (dict serializável em JSON)
+    # EN: Run the requested scenarios and return the results document (JSON-serializable dict)
+    # FR: Exécute les scénarios demandés et renvoie le document de résultats (dict sérialisable en JSON)
+    names = [name for name in SCENARIOS if names is None or name in names]
+    corpus = generate_corpus(size, seed)
+    if corpus_path:
+        corpus['recorded'] = load_corpus(corpus_path)
+    results = {}
+    skipped = {}
+    with tempfile.TemporaryDirectory(prefix='calc-bench-') as workdir, DisplayVirtual() as display:
+        for name in names:
+            if name in GUI_SCENARIOS and not (gui and display.available):
+                skipped[name] = display.reason if gui else 'GUI scenarios disabled'
+                continue
+            try:
+                results[name] = SCENARIOS[name](corpus, rounds, workdir)
+            except Pulado as e:
+                skipped[name] = str(e)
+                continue
+            if log is not None:
+                log(name, results[name])
+    # PT: Ganho de cada cenário com threads sobre a vazão de uma thread
+    # EN: Speedup of each threaded scenario over the single-thread throughput
+    # FR: Gain de chaque scénario à threads par rapport au débit d'un seul thread
+    single = results.get('eval.threads.1')
+    for result in results.values():
+        if 'threads' in result and single and single['throughput']:
+            result['speedup'] = round(result['throughput'] / single['throughput'], 2)
+    return {
+        'version': FORMAT_VERSION,
+        'meta': {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                 'platform': platform.platform(), 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                 'size': size, 'seed': seed, 'rounds': rounds, 'corpus': corpus_path,
+                 'gil': gil_enabled(), 'cpus': os.cpu_count()},
+        'scenarios': results,
+        'skipped': skipped,
+    }
+
+
+def compare(current, baseline, threshold=0.10):
+    # PT: Regressões em relação à linha de base: p50 ou p99 mais lentos, ou vazão menor, por mais
+    #     de `threshold` (fração). Devolve [(cenário, métrica, antes, depois, variação)]
+    # EN: Regressions against the baseline: p50 or p99 slower, or throughput lower, by more
+    #     than `threshold` (a fraction). Returns [(scenario, metric, before, after, change)]
+    # FR: Régressions par rapport à la référence : p50 ou p99 plus lents, ou débit plus bas, de plus
+    #     de `threshold` (fraction). Renvoie [(scénario, métrique, avant, après, variation)]
+    regressions = []
+    for name, now in current.get('scenarios', {}).items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        for metric in ('p50_us', 'p99_us'):
+            if before.get(metric) and now[metric] > before[metric] * (1 + threshold):
+                regressions.append((name, metric, before[metric], now[metric], now[metric] / before[metric] - 1))
+        if before.get('throughput') and now['throughput'] < before['throughput'] * (1 - threshold):
+            regressions.append((name, 'throughput', before['throughput'], now['throughput'],
+                                now['throughput'] / before['throughput'] - 1))
+    return regressions
+
+
+def _print_result(name, result):
+    sys.stderr.write('%-24s %10.1f op/s  p50 %9.2f us  p90 %9.2f us  p99 %9.2f us\n' % (
+        name, result['throughput'], result['p50_us'], result['p90_us'], result['p99_us']))
+
+
+def run(args):
+    # PT: Ponto de entrada do subcomando "bench"
+    # EN: Entry point of the "bench" subcommand
+    # FR: Point d'entrée de la sous-commande « bench »
+    names = None
+    if args.only:
+        names = [name for name in SCENARIOS if any(fnmatch.fnmatch(name, p) for p in args.only)]
+    results = run_benchmarks(names, size=args.size, seed=args.seed, rounds=args.rounds,
+                             gui=not args.no_gui, log=_print_result, corpus_path=args.corpus)
+    for name, reason in results['skipped'].items():
+        sys.stderr.write('%-24s skipped: %s\n' % (name, reason))
+    scaling = [(name, result) for name, result in results['scenarios'].items() if 'speedup' in result]
+    if len(scaling) > 1:
+        for name, result in scaling:
+            sys.stderr.write('%-24s %5.2fx the single-thread throughput\n' % (name, result['speedup']))
+        if results['meta']['gil']:
+            sys.stderr.write('the GIL is enabled: threads take turns, so no speedup is expected '
+                             '(run on a free-threaded build, e.g. python3.13t, to measure scaling)\n')
+    if args.output:
+        with open(args.output, mode='w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if not args.baseline:
+        return 0
+    with open(args.baseline, mode='r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    for key in ('size', 'seed', 'rounds'):
+        if baseline.get('meta', {}).get(key) != results['meta'][key]:
+            sys.stderr.write('warning: baseline was run with %s=%s, this run uses %s\n'
+                             % (key, baseline.get('meta', {}).get(key), results['meta'][key]))
+    regressions = compare(results, baseline, args.threshold)
+    for name, metric, before, after, change in regressions:
+        sys.stderr.write('REGRESSION %s %s: %s -> %s (%+.1f%%)\n' % (name, metric, before, after, change * 100))
+    return 1 if regressions else 0
+
+
+def add_arguments(parser):
+    parser.add_argument('-o', '--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='results JSON to compare against; exit status 1 on regression')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='allowed slowdown as a fraction before a regression is reported (default: 0.10)')
+    parser.add_argument('--only', action='append', metavar='PATTERN',
+                        help='run only scenarios matching this glob, e.g. "eval.*" (repeatable)')
+    parser.add_argument('--corpus', metavar='PATH',
+                        help='extra "eval.recorded" scenario from real expressions: one per line, '
+                             'or JSON lines with "expression" (e.g. the slow-expression log)')
+    parser.add_argument('--size', type=int, default=500, help='expressions per corpus category (default: 500)')
+    parser.add_argument('--seed', type=int, default=0, help='corpus seed (default: 0)')
+    parser.add_argument('--rounds', type=int, default=3, help='rounds per scenario (default: 3)')
+    parser.add_argument('--no-gui', action='store_true', help='skip the scenarios that need an X display')
+    parser.set_defaults(func=run)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import re
+
+# PT: Módulo próprio (nomes das funções e constantes científicas)
+# EN: Local module (names of the scientific functions and constants)
+# FR: Module local (noms des fonctions et constantes scientifiques)
+from .funcoes import CONSTANTS, FUNCTIONS
+
+
+# PT: Tamanho a partir do qual novas teclas são ignoradas (mesma regra do _lenght_max)
+# EN: Length from which new keys are ignored (same rule as _lenght_max)
+# FR: Longueur à partir de laquelle les nouvelles touches sont ignorées (même règle que _lenght_max)
+MAX_LENGTH = 15
+
+# PT: Classes do último caractere
+# EN: Classes of the last character
+# FR: Classes du dernier caractère
+EMPTY, DIGIT, DOT, OPERATOR, OPEN, CLOSE, OTHER, NAME = range(8)
+
+_CLASSES = {'.': DOT, '+': OPERATOR, '-': OPERATOR, '*': OPERATOR, '/': OPERATOR, '(': OPEN, ')': CLOSE}
+_CLASSES.update((digit, DIGIT) for digit in '0123456789')
+_CLASSES.update((letter, NAME) for letter in 'abcdefghijklmnopqrstuvwxyz')
+
+# PT: Nome de função com "(" ou constante no fim do texto: apagado de uma vez pelo "<"
+# EN: Function name with "(" or constant at the end of the text: deleted at once by "<"
+# FR: Nom de fonction avec « ( » ou constante à la fin du texte : effacé d'un coup par « < »
+_TRAILING_NAME = re.compile(r'[a-z][a-z0-9]*\(?$')
+
+
+def char_class(char):
+    return _CLASSES.get(char, OTHER) if char else EMPTY
+
+
+class ModeloEntrada(object):
+    """Estado da entrada da calculadora, sem Tk: texto, classe do último caractere, profundidade e tamanho."""
+    # PT: As regras são as mesmas dos antigos handlers da GUI, mas cada tecla olha só o último
+    #     caractere, a profundidade de parênteses e o tamanho guardados, em O(1). Cada método
+    #     devolve True se o texto mudou; a GUI então escreve o widget uma única vez
+    # EN: The rules are the same as the old GUI handlers, but each key only looks at the stored
+    #     last character, parenthesis depth and length, in O(1). Each method returns True if the
+    #     text changed; the GUI then writes the widget a single time
+    # FR: Les règles sont celles des anciens handlers de la GUI, mais chaque touche ne regarde que
+    #     le dernier caractère, la profondeur de parenthèses et la longueur mémorisés, en O(1). Chaque
+    #     méthode renvoie True si le texte a changé ; la GUI écrit alors le widget une seule fois
+
+    def __init__(self, text='0'):
+        self.set_text(text)
+
+    # ---------- State ----------
+    def set_text(self, text, error=False):
+        # PT: Substitui todo o texto (resultado, mensagem de erro, item do histórico)
+        # EN: Replace the whole text (result, error message, history item)
+        # FR: Remplace tout le texte (résultat, message d'erreur, élément d'historique)
+        self.text = str(text)
+        self.length = len(self.text)
+        self.depth = self.text.count('(') - self.text.count(')')
+        self.last = char_class(self.text[-1:])
+        self.error = error
+        return True
+
+    def _append(self, piece):
+        self.text += piece
+        self.length += len(piece)
+        for char in piece:
+            if char == '(':
+                self.depth += 1
+            elif char == ')':
+                self.depth -= 1
+        self.last = char_class(piece[-1])
+        return True
+
+    def _has_room(self):
+        return self.length < MAX_LENGTH
+
+    # ---------- Keys ----------
+    def insert_value(self, value):
+        value = str(value)
+        if self.error:
+            self.set_text('')
+        if self.text == '0':
+            return self.set_text(value)
+        if self.last != NAME and self._has_room():
+            return self._append(value)
+        return False
+
+    def insert_dot(self, dot='.'):
+        if self.error or self.last in (EMPTY, DOT, OPERATOR, NAME) or not self._has_room():
+            return False
+        return self._append(dot)
+
+    def open_paren(self):
+        if self.error:
+            return False
+        if self.text == '0':
+            return self.set_text('(')
+        if self.last == OPERATOR and self._has_room():
+            return self._append('(')
+        return False
+
+    def close_paren(self):
+        if self.error or self.depth <= 0:
+            return False
+        if self.last in (EMPTY, OPERATOR, OPEN) or not self._has_room():
+            return False
+        return self._append(')')
+
+    def _starts_operand(self, piece):
+        # PT: Função ou constante começam um operando: substituem o "0" ou vêm após operador ou "("
+        # EN: A function or constant starts an operand: it replaces the "0" or follows an operator or "("
+        # FR: Une fonction ou constante commence un opérande : elle remplace le « 0 » ou suit un opérateur ou « ( »
+        if self.error:
+            return False
+        if self.text == '0':
+            return self.set_text(piece)
+        if self.last in (OPERATOR, OPEN) and self._has_room():
+            return self._append(piece)
+        return False
+
+    def insert_function(self, name):
+        return self._starts_operand(name + '(')
+
+    def insert_constant(self, name):
+        return self._starts_operand(name)
+
+    def insert_operator(self, operator):
+        if self.error or self.last in (EMPTY, OPERATOR) or not self._has_room():
+            return False
+        return self._append(operator)
+
+    def delete_last(self):
+        if self.error or self.last == EMPTY:
+            return False
+        removed = self.text[-1]
+        if self.last in (NAME, OPEN):
+            match = _TRAILING_NAME.search(self.text, max(0, self.length - 12))
+            if match is not None:
+                removed = match.group()
+        if self.length == len(removed):
+            return self.set_text('0')
+        self.text = self.text[:-len(removed)]
+        self.length -= len(removed)
+        if removed[-1] == '(':
+            self.depth -= 1
+        elif removed == ')':
+            self.depth += 1
+        self.last = char_class(self.text[-1])
+        return True
+
+    def clear(self):
+        return self.set_text('0')
+
+    def press(self, key):
+        # PT: Tecla pelo rótulo do botão ('7', '.', '(', ')', '+', '**', '**(1/2)', '<', 'C',
+        #     'sin(', 'pi'); útil para testes e uso sem interface
+        # EN: Key by button label ('7', '.', '(', ')', '+', '**', '**(1/2)', '<', 'C',
+        #     'sin(', 'pi'); handy for tests and headless use
+        # FR: Touche par libellé de bouton ('7', '.', '(', ')', '+', '**', '**(1/2)', '<', 'C',
+        #     'sin(', 'pi') ; pratique pour les tests et l'usage sans interface
+        if key.isdigit():
+            return self.insert_value(key)
+        if key == '.':
+            return self.insert_dot(key)
+        if key == '(':
+            return self.open_paren()
+        if key == ')':
+            return self.close_paren()
+        if key == '<':
+            return self.delete_last()
+        if key == 'C':
+            return self.clear()
+        if key[:-1] in FUNCTIONS and key[-1:] == '(':
+            return self.insert_function(key[:-1])
+        if key in CONSTANTS['float']:
+            return self.insert_constant(key)
+        return self.insert_operator(key)
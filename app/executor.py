@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    # PT: Windows não tem limites de memória por processo via resource
+    # EN: Windows has no per-process memory limits through resource
+    # FR: Windows n'a pas de limites mémoire par processus via resource
+    resource = None
+
+# PT: Módulo próprio (lógica de cálculo)
+# EN: Local module (calculation logic)
+# FR: Module local (logique de calcul)
+from .calculador import Calculador
+from .previa import longest_valid_prefix
+
+
+# PT: Acima desta estimativa (bits) a expressão roda em um processo separado, que pode ser encerrado
+# EN: Above this estimate (bits) the expression runs in a separate process, which can be killed
+# FR: Au-delà de cette estimation (bits) l'expression s'exécute dans un processus séparé, qui peut être tué
+HEAVY_BITS = 1 << 16
+
+_HEAVY = object()
+
+
+def _evaluate_in_process(expr, engine, precision, max_bits, memory_limit, conn):
+    # PT: Corpo do processo filho: aplica o limite de memória, calcula e devolve pelo pipe
+    # EN: Child process body: apply the memory limit, compute and send back through the pipe
+    # FR: Corps du processus enfant : applique la limite mémoire, calcule et renvoie par le pipe
+    if resource is not None and memory_limit:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        except (ValueError, OSError):
+            pass
+    try:
+        result = Calculador(engine=engine, precision=precision, max_bits=max_bits).calculation(expr)
+    except MemoryError:
+        result = "__ERR__"
+    conn.send(result)
+    conn.close()
+
+
+class Tarefa(object):
+    """Avaliação em andamento; consultada pela GUI com done() via master.after."""
+    # PT: Começa na thread de trabalho; se a estimativa for alta, passa para um processo
+    # EN: Starts on the worker thread; if the estimate is high, moves to a process
+    # FR: Commence sur le thread de travail ; si l'estimation est élevée, passe à un processus
+
+    def __init__(self, executor, expr):
+        self.expr = expr
+        self._executor = executor
+        self._deadline = time.monotonic() + executor.timeout
+        self._future = None
+        self._process = None
+        self._conn = None
+        self._result = None
+        self._done = False
+        self._cancelled = False
+        # PT: Com a thread presa por uma tarefa que estourou o prazo, vai direto para um processo
+        # EN: With the thread held by a task that ran past its deadline, go straight to a process
+        # FR: Avec le thread occupé par une tâche qui a dépassé son délai, passe directement à un processus
+        if executor.stalled:
+            self._start_process()
+        else:
+            self._future = executor._thread.submit(executor._evaluate_cheap, expr)
+
+    def done(self):
+        # PT: Não bloqueia; verifica resultado, morte do processo e prazo
+        # EN: Non-blocking; checks for a result, process death and deadline
+        # FR: Non bloquant ; vérifie le résultat, la mort du processus et le délai
+        if self._done:
+            return True
+        if self._process is None:
+            if self._future.done():
+                result = self._future.result()
+                if result is _HEAVY:
+                    self._start_process()
+                else:
+                    self._finish(result)
+            elif time.monotonic() > self._deadline:
+                if not self._future.cancel():
+                    self._executor._stall(self._future)
+                self._finish("__ERR__")
+            return self._done
+        if self._conn.poll():
+            self._receive()
+        elif not self._process.is_alive():
+            # PT: O processo pode ter enviado e saído entre as duas verificações
+            # EN: The process may have sent and exited between the two checks
+            # FR: Le processus a pu envoyer et sortir entre les deux vérifications
+            if self._conn.poll():
+                self._receive()
+            else:
+                self._finish("__ERR__")
+        elif time.monotonic() > self._deadline:
+            self._stop_process()
+            self._finish("__ERR__")
+        return self._done
+
+    def result(self):
+        return self._result
+
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        # PT: Cancela: encerra o processo (se houver) e descarta o resultado
+        # EN: Cancel: kill the process (if any) and discard the result
+        # FR: Annule : tue le processus (s'il y en a un) et ignore le résultat
+        if self._done:
+            return False
+        if self._future is not None and not self._future.cancel():
+            self._executor._stall(self._future)
+        self._stop_process()
+        self._cancelled = True
+        self._finish(None)
+        return True
+
+    def _start_process(self):
+        executor = self._executor
+        calc = executor.calc
+        # PT: Importado só quando a primeira expressão cara aparece (custo de abertura)
+        # EN: Imported only when the first expensive expression shows up (startup cost)
+        # FR: Importé seulement à l'apparition de la première expression coûteuse (coût de démarrage)
+        import multiprocessing
+        context = multiprocessing.get_context('spawn')
+        self._conn, child_conn = context.Pipe(duplex=False)
+        self._process = context.Process(
+            target=_evaluate_in_process,
+            args=(self.expr, calc.engine, calc.precision, calc.max_bits, executor.memory_limit, child_conn),
+            daemon=True)
+        self._process.start()
+        child_conn.close()
+
+    def _receive(self):
+        try:
+            self._finish(self._conn.recv())
+        except (EOFError, OSError):
+            self._finish("__ERR__")
+
+    def _stop_process(self):
+        if self._process is not None and self._process.is_alive():
+            self._process.terminate()
+
+    def _finish(self, result):
+        self._result = result
+        self._done = True
+        if self._conn is not None:
+            self._conn.close()
+            self._process.join(timeout=0)
+
+
+class ExecutorDeCalculo(object):
+    """Executa cálculos fora da thread do Tk, com prazo e limite de memória."""
+    # PT: Expressões impossíveis são rejeitadas pela estimativa de custo do Calculador;
+    #     as baratas rodam em uma thread de trabalho e as caras em um processo que pode ser encerrado
+    # EN: Hopeless expressions are rejected by the Calculador cost estimate;
+    #     cheap ones run on a worker thread and expensive ones in a process that can be killed
+    # FR: Les expressions sans espoir sont rejetées par l'estimation de coût du Calculador ;
+    #     les peu coûteuses s'exécutent sur un thread de travail et les coûteuses dans un processus qui peut être tué
+
+    def __init__(self, calc, timeout=10.0, memory_limit=512 * 1024 * 1024, heavy_bits=HEAVY_BITS):
+        self.calc = calc
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.heavy_bits = heavy_bits
+        # PT: Uma única thread para cálculos leves, prévias e aquecimento, em ordem. O Calculador é
+        #     compartilhado (planilha, calculate_many em outras threads) e seguro entre threads; o
+        #     que a thread única garante é a ordem, não a exclusividade. Uma tarefa leve que passa
+        #     do prazo não pode ser interrompida: enquanto ela ocupa a thread (`stalled`), as novas
+        #     avaliações vão para um processo e as prévias são puladas
+        # EN: A single thread for light calculations, previews and warming, in order. The Calculador
+        #     is shared (worksheet, calculate_many on other threads) and thread-safe; what the single
+        #     thread guarantees is ordering, not exclusivity. A light task that runs past its deadline
+        #     cannot be interrupted: while it holds the thread (`stalled`), new evaluations go to a
+        #     process and previews are skipped
+        # FR: Un seul thread pour les calculs légers, les aperçus et le réchauffement, dans l'ordre. Le
+        #     Calculador est partagé (feuille de calcul, calculate_many sur d'autres threads) et sûr entre
+        #     threads ; ce que le thread unique garantit est l'ordre, pas l'exclusivité. Une tâche légère
+        #     qui dépasse son délai ne peut pas être interrompue : tant qu'elle occupe le thread
+        #     (`stalled`), les nouvelles évaluations vont à un processus et les aperçus sont sautés
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='calculador')
+        self._stalled = None
+        # PT: Geração da prévia mais recente de cada dono (janela); uma janela não descarta a de outra
+        # EN: Generation of each owner's (window's) latest preview; one window does not discard another's
+        # FR: Génération du dernier aperçu de chaque propriétaire (fenêtre) ; une fenêtre n'écarte pas celui d'une autre
+        self._preview_generations = {}
+
+    def submit(self, expr):
+        return Tarefa(self, expr)
+
+    @property
+    def stalled(self):
+        # PT: Verdadeiro enquanto uma tarefa leve vencida ou cancelada ainda roda na thread
+        # EN: True while a light task that timed out or was cancelled is still running on the thread
+        # FR: Vrai tant qu'une tâche légère expirée ou annulée tourne encore sur le thread
+        future = self._stalled
+        return future is not None and not future.done()
+
+    def _stall(self, future):
+        if not future.done():
+            self._stalled = future
+
+    def _evaluate_cheap(self, expr):
+        try:
+            cost = self.calc.estimate(expr)
+        except (NameError, SyntaxError, ValueError, ArithmeticError, RecursionError):
+            cost = 0
+        if self.heavy_bits < cost <= self.calc.max_bits:
+            return _HEAVY
+        return self.calc.calculation(expr)
+
+    def preview(self, expr, owner=None):
+        # PT: Prévia do resultado (Future com o texto, ou None). Só a prévia mais recente roda:
+        #     as anteriores ainda na fila são descartadas sem calcular. Expressões caras não
+        #     têm prévia, então a fila nunca fica presa atrás delas. Com a thread presa
+        #     (`stalled`) devolve None direto, sem Future
+        # EN: Result preview (Future with the text, or None). Only the latest preview runs:
+        #     earlier ones still queued are discarded without computing. Expensive expressions
+        #     get no preview, so the queue is never stuck behind them. With the thread held
+        #     (`stalled`) returns None directly, with no Future
+        # FR: Aperçu du résultat (Future avec le texte, ou None). Seul l'aperçu le plus récent
+        #     s'exécute : les précédents encore en file sont ignorés sans calcul. Les expressions
+        #     coûteuses n'ont pas d'aperçu, la file n'est donc jamais bloquée derrière elles. Avec le
+        #     thread occupé (`stalled`) renvoie None directement, sans Future
+        generation = self._preview_generations.get(owner, 0) + 1
+        self._preview_generations[owner] = generation
+        if self.stalled:
+            return None
+        return self._thread.submit(self._evaluate_preview, expr, owner, generation)
+
+    def _evaluate_preview(self, expr, owner, generation):
+        if generation != self._preview_generations.get(owner):
+            return None
+        candidate = longest_valid_prefix(expr)
+        if candidate is None:
+            return None
+        try:
+            if self.calc.estimate(candidate) > self.heavy_bits:
+                return None
+        except (NameError, SyntaxError, ValueError, ArithmeticError, RecursionError):
+            return None
+        result = self.calc.calculation(candidate)
+        return None if result == "__ERR__" else result
+
+    def warm(self, entries):
+        # PT: Aquece o cache do Calculador na thread de trabalho, atrás do que já está na fila
+        # EN: Warm the Calculador cache on the worker thread, behind what is already queued
+        # FR: Réchauffe le cache du Calculador sur le thread de travail, derrière ce qui est déjà en file
+        return self._thread.submit(self.calc.warm, entries)
+
+    def shutdown(self):
+        self._thread.shutdown(wait=False, cancel_futures=True)
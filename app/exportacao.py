@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+
+
+# PT: Formatos suportados; o sufixo '.gz' adiciona compressão gzip a qualquer um
+# EN: Supported formats; the '.gz' suffix adds gzip compression to any of them
+# FR: Formats pris en charge ; le suffixe '.gz' ajoute la compression gzip à chacun
+FORMATS = ('csv', 'jsonl')
+
+_EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl'}
+
+FIELDS = ('time', 'expression', 'result')
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def detect_format(path):
+    # PT: (formato, gzip?) a partir da extensão do destino; CSV por padrão
+    # EN: (format, gzip?) from the destination extension; CSV by default
+    # FR: (format, gzip ?) à partir de l'extension de la destination ; CSV par défaut
+    root, ext = os.path.splitext(path.lower())
+    compressed = ext == '.gz'
+    if compressed:
+        ext = os.path.splitext(root)[1]
+    return _EXTENSIONS.get(ext, 'csv'), compressed
+
+
+def read_chunks(store, chunk_size=4096):
+    # PT: Lê o histórico em blocos de IDs; o intervalo é fixado no início, então entradas
+    #     novas durante a exportação ficam de fora e as descartadas são puladas
+    # EN: Read the history in ID blocks; the range is fixed at the start, so entries added
+    #     during the export are left out and dropped ones are skipped
+    # FR: Lit l'historique par blocs d'ID ; l'intervalle est fixé au départ, donc les entrées
+    #     ajoutées pendant l'export sont exclues et celles retirées sont sautées
+    start_id, stop_id = store.first_id, store.next_id
+    for block_start in range(start_id, stop_id, chunk_size):
+        chunk = store.read(block_start, min(block_start + chunk_size, stop_id))
+        if chunk:
+            yield chunk
+
+
+def encode_csv(chunks, header=FIELDS):
+    # PT: Cada bloco vira um único texto CSV; o buffer é reaproveitado entre blocos
+    # EN: Each block becomes a single CSV text; the buffer is reused between blocks
+    # FR: Chaque bloc devient un seul texte CSV ; le tampon est réutilisé entre les blocs
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for chunk in chunks:
+        writer.writerows([e.get('time', ''), e.get('expression', ''), e.get('result', '')] for e in chunk)
+        yield buffer.getvalue(), len(chunk)
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def encode_jsonl(chunks):
+    for chunk in chunks:
+        yield ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in chunk), len(chunk)
+
+
+def export(store, path, fmt=None, compressed=None, header=FIELDS, chunk_size=4096,
+           progress=None, cancelled=None):
+    # PT: Exporta o histórico em fluxo (memória proporcional a um bloco) para `path`,
+    #     escrevendo em um arquivo temporário que só substitui o destino no final.
+    #     progress(feitas, total) é chamado a cada bloco; cancelled() interrompe
+    # EN: Stream the history (memory proportional to one block) to `path`, writing a
+    #     temporary file that only replaces the destination at the end.
+    #     progress(done, total) is called on every block; cancelled() stops the export
+    # FR: Exporte l'historique en flux (mémoire proportionnelle à un bloc) vers `path`, en
+    #     écrivant un fichier temporaire qui ne remplace la destination qu'à la fin.
+    #     progress(faites, total) est appelé à chaque bloc ; cancelled() interrompt l'export
+    detected, detected_gzip = detect_format(path)
+    fmt = fmt or detected
+    compressed = detected_gzip if compressed is None else compressed
+    if fmt not in FORMATS:
+        raise ValueError('unknown export format: %r' % fmt)
+    total = len(store)
+    chunks = read_chunks(store, chunk_size)
+    pieces = encode_csv(chunks, header) if fmt == 'csv' else encode_jsonl(chunks)
+    tmp = path + '.tmp'
+    if compressed:
+        f = gzip.open(tmp, mode='wt', encoding='utf-8', newline='')
+    else:
+        f = open(tmp, mode='w', encoding='utf-8', newline='')
+    done = 0
+    try:
+        with f:
+            for text, count in pieces:
+                if cancelled is not None and cancelled():
+                    raise ExportCancelled(path)
+                f.write(text)
+                done += count
+                if progress is not None:
+                    progress(done, total)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return done
+
+
+class Exportacao(object):
+    """Exportação em uma thread de fundo; consultada pela GUI com done() via master.after."""
+    # PT: Mesmo modelo do Tarefa: a GUI pergunta, a thread nunca toca no Tk
+    # EN: Same model as Tarefa: the GUI asks, the thread never touches Tk
+    # FR: Même modèle que Tarefa : la GUI interroge, le thread ne touche jamais Tk
+
+    def __init__(self, store, path, header=FIELDS, chunk_size=4096):
+        self.path = path
+        self.total = len(store)
+        self.exported = 0
+        self.error = None
+        self._cancelled = False
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(store, path, header, chunk_size), name='history-export', daemon=True)
+        self._thread.start()
+
+    def _run(self, store, path, header, chunk_size):
+        try:
+            export(store, path, header=header, chunk_size=chunk_size,
+                   progress=self._progress, cancelled=self.cancelled)
+        except ExportCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    def _progress(self, done, total):
+        self.exported = done
+        self.total = total
+
+    def done(self):
+        return self._done.is_set()
+
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        self._cancelled = True
+
+    def fraction(self):
+        return self.exported / self.total if self.total else 1.0
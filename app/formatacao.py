@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+from decimal import Context, Decimal, ROUND_HALF_EVEN
+from fractions import Fraction
+
+
+# PT: Tamanho máximo do texto antes de passar para notação científica
+# EN: Maximum text length before switching to scientific notation
+# FR: Longueur maximale du texte avant de passer en notation scientifique
+MAX_LENGTH = 15
+
+# PT: Inteiros com até 1023 bits ainda cabem em um float; o texto deles é curto (<= 308 dígitos)
+# EN: Integers with up to 1023 bits still fit in a float; their text is short (<= 308 digits)
+# FR: Les entiers jusqu'à 1023 bits tiennent encore dans un float ; leur texte est court (<= 308 chiffres)
+_FLOAT_BITS = 1023
+
+# PT: Bits mais significativos usados para o logaritmo de inteiros enormes
+# EN: Most significant bits used for the logarithm of huge integers
+# FR: Bits les plus significatifs utilisés pour le logarithme des entiers énormes
+_TOP_BITS = 64
+
+_CONTEXT = Context(prec=50, rounding=ROUND_HALF_EVEN)
+_LOG10_2 = _CONTEXT.log10(Decimal(2))
+_FIVE_PLACES = Decimal('0.00001')
+
+
+def _log10(n):
+    # PT: log10(n) para n > 0 inteiro, sem converter n para texto: usa só os 64 bits
+    #     mais significativos e bit_length(); erro relativo < 2**-63
+    # EN: log10(n) for an integer n > 0, without converting n to text: only uses the 64
+    #     most significant bits and bit_length(); relative error < 2**-63
+    # FR: log10(n) pour un entier n > 0, sans convertir n en texte : n'utilise que les 64
+    #     bits les plus significatifs et bit_length() ; erreur relative < 2**-63
+    shift = max(n.bit_length() - _TOP_BITS, 0)
+    return _CONTEXT.add(_CONTEXT.log10(Decimal(n >> shift)), _CONTEXT.multiply(Decimal(shift), _LOG10_2))
+
+
+def _scientific(negative, log10):
+    # PT: Monta "d.dddddE+xx" a partir de log10|valor|, no mesmo formato de '{:5.5E}'
+    # EN: Build "d.dddddE+xx" from log10|value|, in the same format as '{:5.5E}'
+    # FR: Construit « d.dddddE+xx » à partir de log10|valeur|, au même format que '{:5.5E}'
+    exponent = int(log10.to_integral_value(rounding='ROUND_FLOOR'))
+    mantissa = _CONTEXT.power(Decimal(10), _CONTEXT.subtract(log10, Decimal(exponent)))
+    mantissa = mantissa.quantize(_FIVE_PLACES, context=_CONTEXT)
+    if mantissa >= 10:
+        mantissa = Decimal('1.00000')
+        exponent += 1
+    return '%s%sE%s%02d' % ('-' if negative else '', mantissa, '-' if exponent < 0 else '+', abs(exponent))
+
+
+def _format_decimal(value):
+    # PT: Decimal não passa por float (evita overflow); expoente com 2 dígitos como em float
+    # EN: Decimal does not go through float (avoids overflow); 2-digit exponent as with float
+    # FR: Decimal ne passe pas par float (évite le débordement) ; exposant à 2 chiffres comme float
+    mantissa, exponent = '{:.5E}'.format(value).split('E')
+    return '%sE%s%02d' % (mantissa, exponent[0], int(exponent[1:]))
+
+
+def _format_int(value):
+    if value.bit_length() <= _FLOAT_BITS:
+        text = str(value)
+        if len(text) > MAX_LENGTH:
+            text = '{:5.5E}'.format(float(value))
+        return text
+    # PT: Inteiro enorme: nunca gera o texto decimal completo (quadrático e limitado por
+    #     sys.get_int_max_str_digits) nem converte para float (OverflowError)
+    # EN: Huge integer: never builds the full decimal text (quadratic and limited by
+    #     sys.get_int_max_str_digits) nor converts to float (OverflowError)
+    # FR: Entier énorme : ne construit jamais le texte décimal complet (quadratique et limité
+    #     par sys.get_int_max_str_digits) ni ne convertit en float (OverflowError)
+    return _scientific(value < 0, _log10(abs(value)))
+
+
+def _format_fraction(value):
+    if value.denominator == 1:
+        return _format_int(value.numerator)
+    numerator, denominator = value.numerator, value.denominator
+    if numerator.bit_length() <= _FLOAT_BITS and denominator.bit_length() <= _FLOAT_BITS:
+        text = str(value)
+        if len(text) <= MAX_LENGTH:
+            return text
+        approximation = float(value)
+        if approximation and abs(approximation) != float('inf'):
+            return '{:5.5E}'.format(approximation)
+    return _scientific(numerator < 0, _CONTEXT.subtract(_log10(abs(numerator)), _log10(denominator)))
+
+
+def format_result(value):
+    # PT: Texto do resultado: str() quando curto, senão notação científica '{:5.5E}'.
+    #     Trata int, float, Decimal e Fraction da mesma forma, em tempo quase constante
+    #     mesmo para inteiros com milhões de dígitos
+    # EN: Result text: str() when short, otherwise '{:5.5E}' scientific notation.
+    #     Handles int, float, Decimal and Fraction the same way, in near-constant time
+    #     even for integers with millions of digits
+    # FR: Texte du résultat : str() quand il est court, sinon notation scientifique '{:5.5E}'.
+    #     Traite int, float, Decimal et Fraction de la même façon, en temps quasi constant
+    #     même pour des entiers de millions de chiffres
+    if isinstance(value, complex):
+        # PT: Ex.: raiz de negativo; a calculadora só trabalha com reais
+        # EN: E.g. root of a negative; the calculator only works with reals
+        # FR: Ex. : racine d'un négatif ; la calculatrice ne travaille qu'avec des réels
+        raise ValueError('complex result')
+    if isinstance(value, int):
+        return _format_int(value)
+    if isinstance(value, Fraction):
+        return _format_fraction(value)
+    if isinstance(value, Decimal):
+        if not value:
+            # PT: Zero com expoente (ex.: underflow "0E-1000026") aparece como o float mostraria
+            # EN: Zero with an exponent (e.g. the "0E-1000026" underflow) shows as float would show it
+            # FR: Zéro avec exposant (ex. : le sous-dépassement « 0E-1000026 ») s'affiche comme le float
+            text = '0' if value.as_tuple().exponent >= 0 else '0.0'
+            return '-' + text if value.is_signed() else text
+        text = str(value)
+        if len(text) > MAX_LENGTH or 'E' in text:
+            # PT: Valores minúsculos (ex.: "1E-1000026") também ficam no formato científico fixo
+            # EN: Tiny values (e.g. "1E-1000026") also get the fixed scientific format
+            # FR: Les valeurs minuscules (ex. : « 1E-1000026 ») prennent aussi le format scientifique fixe
+            return _format_decimal(value)
+        return text
+    text = str(value)
+    if len(text) > MAX_LENGTH:
+        text = '{:5.5E}'.format(value)
+    return text
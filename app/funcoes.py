@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import math
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal, localcontext
+from fractions import Fraction
+
+
+# PT: Maior n aceito em factorial(n): ~1,5 milhão de bits e ~0,3 s; acima disso OverflowError
+#     sem calcular nada (factorial cresce mais rápido e custa mais que uma potência do mesmo tamanho)
+# EN: Largest n accepted by factorial(n): ~1.5 million bits and ~0.3 s; above it OverflowError
+#     without computing anything (factorial grows faster and costs more than a power of the same size)
+# FR: Plus grand n accepté par factorial(n) : ~1,5 million de bits et ~0,3 s ; au-delà OverflowError
+#     sans rien calculer (factorial croît plus vite et coûte plus qu'une puissance de même taille)
+MAX_FACTORIAL = 100000
+
+# PT: π e e com 50 dígitos para o motor Decimal (o contexto arredonda para a precisão configurada)
+# EN: π and e to 50 digits for the Decimal engine (the context rounds to the configured precision)
+# FR: π et e à 50 chiffres pour le moteur Decimal (le contexte arrondit à la précision configurée)
+_PI = Decimal('3.1415926535897932384626433832795028841971693993751')
+_E = Decimal('2.7182818284590452353602874713526624977572470937000')
+
+CONSTANTS = {
+    'float': {'pi': math.pi, 'e': math.e},
+    'decimal': {'pi': _PI, 'e': _E},
+    'fraction': {'pi': Fraction(math.pi), 'e': Fraction(math.e)},
+}
+
+
+def _integer(value):
+    # PT: Valor inteiro exato de int, float, Decimal ou Fraction; ValueError se não for inteiro
+    # EN: Exact integer value of an int, float, Decimal or Fraction; ValueError if not an integer
+    # FR: Valeur entière exacte d'un int, float, Decimal ou Fraction ; ValueError si non entier
+    if type(value) is int:
+        return value
+    if isinstance(value, Fraction):
+        if value.denominator != 1:
+            raise ValueError('factorial() only accepts integral values')
+        return value.numerator
+    if value != value or value in (float('inf'), float('-inf')) or value != int(value):
+        raise ValueError('factorial() only accepts integral values')
+    return int(value)
+
+
+def _factorial_argument(value):
+    n = _integer(value)
+    if n < 0:
+        raise ValueError('factorial() not defined for negative values')
+    if n > MAX_FACTORIAL:
+        raise OverflowError('factorial() argument larger than %d' % MAX_FACTORIAL)
+    return n
+
+
+def factorial(value):
+    return math.factorial(_factorial_argument(value))
+
+
+def _decimal_factorial(value):
+    # PT: Decimal(int) é quadrático no tamanho (~5 s para 100000!): acima de 1000 o produto é
+    #     feito em Decimal com dígitos de guarda e arredondado para a precisão do contexto
+    # EN: Decimal(int) is quadratic in the size (~5 s for 100000!): above 1000 the product is
+    #     done in Decimal with guard digits and rounded to the context precision
+    # FR: Decimal(int) est quadratique en la taille (~5 s pour 100000!) : au-delà de 1000 le
+    #     produit est fait en Decimal avec des chiffres de garde et arrondi à la précision du contexte
+    n = _factorial_argument(value)
+    if n <= 1000:
+        return +Decimal(math.factorial(n))
+    with localcontext() as context:
+        context.prec += 10
+        result = Decimal(1)
+        for i in range(2, n + 1):
+            result *= i
+    return +result
+
+
+def factorial_bits(n):
+    # PT: log2(n!) sem calcular n! (usado por custo.estimate)
+    # EN: log2(n!) without computing n! (used by custo.estimate)
+    # FR: log2(n!) sans calculer n! (utilisé par custo.estimate)
+    if n < 2:
+        return 0.0
+    return math.lgamma(n + 1) / math.log(2)
+
+
+def _fraction_sqrt(value):
+    # PT: Raiz exata quando numerador e denominador são quadrados perfeitos (ex.: 9/4 -> 3/2)
+    # EN: Exact root when numerator and denominator are perfect squares (e.g. 9/4 -> 3/2)
+    # FR: Racine exacte quand numérateur et dénominateur sont des carrés parfaits (ex. : 9/4 -> 3/2)
+    value = Fraction(value)
+    if value < 0:
+        raise ValueError('math domain error')
+    numerator, denominator = math.isqrt(value.numerator), math.isqrt(value.denominator)
+    if numerator * numerator == value.numerator and denominator * denominator == value.denominator:
+        return Fraction(numerator, denominator)
+    return Fraction(math.sqrt(value))
+
+
+def _via_float(function, back):
+    # PT: Funções sem versão exata: calcula em float e volta para o tipo do motor
+    # EN: Functions with no exact version: compute in float and go back to the engine's type
+    # FR: Fonctions sans version exacte : calcule en float et revient au type du moteur
+    def run(value):
+        return back(function(float(value)))
+    return run
+
+
+def _decimal(value):
+    return Decimal(repr(value))
+
+
+class Funcao(object):
+    """Função da biblioteca científica: uma implementação por motor e o nome da ufunc NumPy."""
+    # PT: `kind` diz a custo.estimate o que acontece com o tamanho exato do argumento:
+    #     'same' (abs), 'integer' (floor, ceil: inteiro do mesmo tamanho), 'factorial' ou
+    #     None (resultado aproximado, de tamanho limitado)
+    # EN: `kind` tells custo.estimate what happens to the exact size of the argument:
+    #     'same' (abs), 'integer' (floor, ceil: an integer of the same size), 'factorial' or
+    #     None (approximate result, of bounded size)
+    # FR: `kind` indique à custo.estimate ce qui arrive à la taille exacte de l'argument :
+    #     'same' (abs), 'integer' (floor, ceil : un entier de même taille), 'factorial' ou
+    #     None (résultat approché, de taille bornée)
+
+    __slots__ = ('name', 'engines', 'numpy', 'kind')
+
+    def __init__(self, name, float_function, decimal_function=None, fraction_function=None,
+                 numpy=None, kind=None):
+        self.name = name
+        self.engines = {
+            'float': float_function,
+            'decimal': decimal_function or _via_float(float_function, _decimal),
+            'fraction': fraction_function or _via_float(float_function, Fraction),
+        }
+        self.numpy = numpy
+        self.kind = kind
+
+
+def _positive(function):
+    # PT: Decimal.ln(0) devolve -Infinity; como em math, logaritmo de valor <= 0 é erro de domínio
+    # EN: Decimal.ln(0) returns -Infinity; as in math, the logarithm of a value <= 0 is a domain error
+    # FR: Decimal.ln(0) renvoie -Infinity ; comme dans math, le logarithme d'une valeur <= 0 est une erreur de domaine
+    def run(value):
+        if not value > 0:
+            raise ValueError('math domain error')
+        return function(value)
+    return run
+
+
+def _log2_decimal(value):
+    return value.ln() / Decimal(2).ln()
+
+
+FUNCTIONS = {function.name: function for function in (
+    Funcao('sin', math.sin, numpy='sin'),
+    Funcao('cos', math.cos, numpy='cos'),
+    Funcao('tan', math.tan, numpy='tan'),
+    Funcao('asin', math.asin, numpy='arcsin'),
+    Funcao('acos', math.acos, numpy='arccos'),
+    Funcao('atan', math.atan, numpy='arctan'),
+    Funcao('sinh', math.sinh, numpy='sinh'),
+    Funcao('cosh', math.cosh, numpy='cosh'),
+    Funcao('tanh', math.tanh, numpy='tanh'),
+    Funcao('exp', math.exp, Decimal.exp, numpy='exp'),
+    Funcao('ln', math.log, _positive(Decimal.ln), numpy='log'),
+    Funcao('log', math.log10, _positive(Decimal.log10), numpy='log10'),
+    Funcao('log2', math.log2, _positive(_log2_decimal), numpy='log2'),
+    Funcao('sqrt', math.sqrt, Decimal.sqrt, _fraction_sqrt, numpy='sqrt'),
+    Funcao('rad', math.radians, lambda value: value * _PI / 180, numpy='radians'),
+    Funcao('deg', math.degrees, lambda value: value * 180 / _PI, numpy='degrees'),
+    Funcao('abs', abs, abs, abs, numpy='absolute', kind='same'),
+    Funcao('floor', math.floor, lambda value: value.to_integral_value(ROUND_FLOOR),
+           lambda value: Fraction(math.floor(value)), numpy='floor', kind='integer'),
+    Funcao('ceil', math.ceil, lambda value: value.to_integral_value(ROUND_CEILING),
+           lambda value: Fraction(math.ceil(value)), numpy='ceil', kind='integer'),
+    Funcao('factorial', factorial, _decimal_factorial, lambda value: Fraction(factorial(value)),
+           kind='factorial'),
+)}
+
+
+def library(engine):
+    # PT: (funções, constantes) do motor: dicts nome -> callable / valor, ligados na compilação
+    # EN: (functions, constants) of the engine: dicts name -> callable / value, bound at compile time
+    # FR: (fonctions, constantes) du moteur : dicts nom -> callable / valeur, liés à la compilation
+    return ({name: function.engines[engine] for name, function in FUNCTIONS.items()},
+            CONSTANTS[engine])
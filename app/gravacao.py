@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import json
+import struct
+import sys
+import time
+
+# PT: Módulos próprios (entrada sem Tk, motor de cálculo e resumo de latências)
+# EN: Local modules (Tk-free input, calculation engine and latency summary)
+# FR: Modules locaux (saisie sans Tk, moteur de calcul et résumé des latences)
+from .calculador import Calculador
+from .desempenho import summarize
+from .entrada import ModeloEntrada
+
+
+# PT: Teclas gravadas, pelo rótulo usado em ModeloEntrada.press ('=' avalia). O índice na tupla é
+#     o código no arquivo: novas teclas só podem ser acrescentadas no fim
+# EN: Recorded keys, by the label used in ModeloEntrada.press ('=' evaluates). The tuple index is
+#     the code in the file: new keys may only be appended at the end
+# FR: Touches enregistrées, par le libellé utilisé dans ModeloEntrada.press ('=' évalue). L'indice
+#     dans le tuple est le code dans le fichier : les nouvelles touches ne s'ajoutent qu'à la fin
+KEYS = ('0', '1', '2', '3', '4', '5', '6', '7', '8', '9',
+        '.', '(', ')', '<', 'C', '+', '-', '*', '/', '**', '**(1/2)', '=',
+        'sin(', 'cos(', 'tan(', 'asin(', 'acos(', 'atan(', 'sinh(', 'cosh(', 'tanh(',
+        'exp(', 'ln(', 'log(', 'log2(', 'sqrt(', 'rad(', 'deg(', 'abs(', 'floor(', 'ceil(',
+        'factorial(', 'pi', 'e')
+
+_CODES = {key: code for code, key in enumerate(KEYS)}
+
+# PT: Cabeçalho: assinatura e início da gravação (ms desde a época)
+# EN: Header: signature and recording start (ms since the epoch)
+# FR: En-tête : signature et début de l'enregistrement (ms depuis l'époque)
+_MAGIC = b'CALCKEY1'
+_HEADER = struct.Struct('<8sq')
+
+# PT: Métodos da Calculadora ligados aos botões -> tecla (None: a tecla é o argumento)
+# EN: Calculadora methods bound to the buttons -> key (None: the key is the argument)
+# FR: Méthodes de la Calculadora liées aux boutons -> touche (None : la touche est l'argument)
+COMMANDS = {
+    '_set_values_in_input': None,
+    '_set_operator_in_input': None,
+    '_set_dot_in_input': '.',
+    '_set_open_parent': '(',
+    '_set_close_parent': ')',
+    '_del_last_value_in_input': '<',
+    '_clear_input': 'C',
+    '_evaluate_and_display': '=',
+    '_set_function_in_input': None,
+    '_set_constant_in_input': None,
+}
+
+_METHODS = {key: name for name, key in COMMANDS.items() if key is not None}
+
+
+def _varint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def key_group(key):
+    # PT: Grupo usado no relatório: 'digit', 'operator', 'function', 'constant' ou a própria tecla
+    # EN: Group used in the report: 'digit', 'operator', 'function', 'constant' or the key itself
+    # FR: Groupe utilisé dans le rapport : 'digit', 'operator', 'function', 'constant' ou la touche elle-même
+    if key.isdigit():
+        return 'digit'
+    if key in ('+', '-', '*', '/', '**', '**(1/2)'):
+        return 'operator'
+    if key[:1].isalpha():
+        return 'function' if key.endswith('(') else 'constant'
+    return key
+
+
+class Gravador(object):
+    """Grava as teclas recebidas por uma Calculadora: (intervalo em ms, código) por evento, 2-4 bytes cada."""
+
+    def __init__(self, path):
+        self.path = path
+        self.events = 0
+        self._file = open(path, mode='wb')
+        self._file.write(_HEADER.pack(_MAGIC, int(time.time() * 1000)))
+        self._last = time.monotonic()
+
+    def record(self, key):
+        code = _CODES.get(str(key))
+        if code is None or self._file is None:
+            return
+        now = time.monotonic()
+        self._file.write(_varint(int((now - self._last) * 1000)) + bytes((code,)))
+        self._last = now
+        self.events += 1
+
+    def wrap(self, key, function):
+        # PT: Grava a tecla e chama o comando original; `key` None => a tecla é o 1º argumento
+        # EN: Record the key and call the original command; `key` None => the key is the 1st argument
+        # FR: Enregistre la touche et appelle la commande d'origine ; `key` None => la touche est le 1er argument
+        def recorded(*args):
+            self.record(key if key is not None else args[0])
+            return function(*args)
+        recorded.__wrapped__ = function
+        return recorded
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_stream(path):
+    # PT: Lista de (intervalo em segundos, tecla) de um arquivo gravado
+    # EN: List of (interval in seconds, key) from a recorded file
+    # FR: Liste de (intervalle en secondes, touche) d'un fichier enregistré
+    with open(path, mode='rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size or data[:8] != _MAGIC:
+        raise ValueError('%s is not a key recording' % path)
+    events = []
+    pos = _HEADER.size
+    size = len(data)
+    while pos < size:
+        delay = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            delay |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        if pos >= size:
+            # PT: Último evento cortado (gravação interrompida)
+            # EN: Truncated last event (interrupted recording)
+            # FR: Dernier événement tronqué (enregistrement interrompu)
+            break
+        code = data[pos]
+        pos += 1
+        if code < len(KEYS):
+            events.append((delay / 1000.0, KEYS[code]))
+    return events
+
+
+def write_stream(path, events):
+    # PT: Grava (intervalo em segundos, tecla) direto, ex.: sessões sintéticas
+    # EN: Write (interval in seconds, key) directly, e.g. synthetic sessions
+    # FR: Écrit (intervalle en secondes, touche) directement, ex. : sessions synthétiques
+    with open(path, mode='wb') as f:
+        f.write(_HEADER.pack(_MAGIC, int(time.time() * 1000)))
+        for delay, key in events:
+            f.write(_varint(int(delay * 1000)) + bytes((_CODES[key],)))
+
+
+class SessaoSemInterface(object):
+    """Mesmas regras da Calculadora sem Tk: ModeloEntrada para as teclas e Calculador para o '='."""
+
+    def __init__(self, calc=None, error_text='Error'):
+        self.calc = calc or Calculador()
+        self.error_text = error_text
+        self.input = ModeloEntrada('0')
+
+    def press(self, key):
+        if key != '=':
+            return self.input.press(key)
+        result = self.calc.calculation(self.input.text)
+        if result == "__ERR__":
+            return self.input.set_text(self.error_text, error=True)
+        return self.input.set_text(result)
+
+
+class SessaoAoVivo(object):
+    """Dirige uma Calculadora real pelos mesmos métodos dos botões, até o widget estar atualizado."""
+    # PT: Para o '=' espera o resultado chegar ao visor (rodando o loop do Tk), como um usuário veria
+    # EN: For '=' it waits for the result to reach the display (running the Tk loop), as a user would see it
+    # FR: Pour '=' attend que le résultat arrive à l'écran (en faisant tourner la boucle Tk), comme un utilisateur le verrait
+
+    def __init__(self, calculadora):
+        self.calculadora = calculadora
+        self.master = calculadora.master
+
+    def press(self, key):
+        calculadora = self.calculadora
+        name = _METHODS.get(key)
+        if name is None:
+            if key.isdigit():
+                method = '_set_values_in_input'
+            elif key.endswith('(') and key[:1].isalpha():
+                method = '_set_function_in_input'
+            elif key[:1].isalpha():
+                method = '_set_constant_in_input'
+            else:
+                method = '_set_operator_in_input'
+            getattr(calculadora, method)(key)
+        else:
+            getattr(calculadora, name)()
+        if key == '=':
+            while calculadora._pending is not None:
+                self.master.update()
+        self.master.update_idletasks()
+
+
+def replay(events, session, speed=0.0):
+    # PT: Reproduz os eventos na sessão. speed 0 = o mais rápido possível; 1 = velocidade gravada;
+    #     2 = duas vezes mais rápido. Devolve o relatório (vazão e latências por grupo de tecla)
+    # EN: Replay the events on the session. speed 0 = as fast as possible; 1 = recorded speed;
+    #     2 = twice as fast. Returns the report (throughput and latencies per key group)
+    # FR: Rejoue les événements sur la session. speed 0 = le plus vite possible ; 1 = vitesse
+    #     enregistrée ; 2 = deux fois plus vite. Renvoie le rapport (débit et latences par groupe de touches)
+    clock = time.perf_counter_ns
+    latencies = {}
+    everything = []
+    started = time.perf_counter()
+    due = started
+    for delay, key in events:
+        if speed > 0:
+            due += delay / speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        start = clock()
+        session.press(key)
+        elapsed = clock() - start
+        latencies.setdefault(key_group(key), []).append(elapsed)
+        everything.append(elapsed)
+    wall = time.perf_counter() - started
+    report = {
+        'events': len(everything),
+        'wall_seconds': round(wall, 6),
+        'events_per_second': round(len(everything) / wall, 1) if wall else 0.0,
+        'speed': speed,
+        'all': summarize(everything, sum(everything) / 1e9),
+        'commands': {group: summarize(values, sum(values) / 1e9) for group, values in sorted(latencies.items())},
+    }
+    return report
+
+
+def run(args):
+    # PT: Ponto de entrada do subcomando "replay"
+    # EN: Entry point of the "replay" subcommand
+    # FR: Point d'entrée de la sous-commande « replay »
+    events = read_stream(args.recording) * args.repeat
+    if args.gui:
+        import tkinter as tk
+        from .calculadora import Calculadora
+        try:
+            master = tk.Tk()
+        except tk.TclError as e:
+            sys.stderr.write('cannot open a window: %s\n' % e)
+            return 2
+        session = SessaoAoVivo(Calculadora(master))
+    else:
+        session = SessaoSemInterface(Calculador(engine=args.engine))
+    try:
+        report = replay(events, session, speed=args.speed)
+    finally:
+        if args.gui:
+            master.destroy()
+    sys.stderr.write('%d events in %.3f s: %.1f events/s\n' % (
+        report['events'], report['wall_seconds'], report['events_per_second']))
+    for group, summary in report['commands'].items():
+        sys.stderr.write('  %-10s n=%-7d p50 %9.2f us  p99 %9.2f us  max %9.2f us\n' % (
+            group, summary['ops'], summary['p50_us'], summary['p99_us'], summary['max_us']))
+    if args.output:
+        with open(args.output, mode='w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return 0
+
+
+def add_arguments(parser):
+    parser.add_argument('recording', help='key recording (see "record_keys_path" in settings.json)')
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help='0 = as fast as possible (default), 1 = recorded speed, 2 = twice as fast')
+    parser.add_argument('--repeat', type=int, default=1, help='replay the recording this many times')
+    parser.add_argument('--gui', action='store_true',
+                        help='drive a real Calculadora window (needs a display) instead of a headless session')
+    parser.add_argument('--engine', default='auto', help='numeric engine of the headless session (default: auto)')
+    parser.add_argument('-o', '--output', help='write the report as JSON to this file')
+    parser.set_defaults(func=run)
@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import atexit
+import contextlib
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:
+    # PT: Windows não tem flock: o diário fica sem trava entre processos
+    # EN: Windows has no flock: the journal is left without a cross-process lock
+    # FR: Windows n'a pas de flock : le journal reste sans verrou entre processus
+    fcntl = None
+
+# PT: Módulo próprio (armazenamento em colunas)
+# EN: Local module (columnar storage)
+# FR: Module local (stockage en colonnes)
+from .colunas import HistoryColumns
+
+
+# PT: Bytes finais do diário conferidos contra o instantâneo binário
+# EN: Trailing journal bytes checked against the binary snapshot
+# FR: Octets finaux du journal vérifiés par rapport à l'instantané binaire
+_CHECK_BYTES = 4096
+
+
+class HistoryStore(object):
+    """Histórico em memória com diário JSON-lines gravado por uma thread em segundo plano."""
+    # PT: Cada cálculo vira uma linha anexada ao diário; a thread de escrita agrupa as linhas
+    #     e grava por tempo ou por quantidade. A compactação reescreve o arquivo só com as
+    #     últimas `limit` entradas, periodicamente e ao sair. A thread do Tk nunca faz E/S
+    # EN: Each calculation becomes a line appended to the journal; the writer thread groups
+    #     lines and writes them on a timer or a size threshold. Compaction rewrites the file
+    #     with only the last `limit` entries, periodically and on exit. The Tk thread never does I/O
+    # FR: Chaque calcul devient une ligne ajoutée au journal ; le thread d'écriture regroupe les
+    #     lignes et les écrit selon un délai ou un seuil de taille. La compaction réécrit le fichier
+    #     avec seulement les `limit` dernières entrées, périodiquement et à la sortie. Le thread Tk ne fait jamais d'E/S
+
+    def __init__(self, path='./app/settings/history.jsonl', legacy_path='./app/settings/history.json',
+                 limit=10000, flush_interval=0.5, batch_size=256, snapshot_path=None, on_write=None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.snapshot_path = snapshot_path or os.path.splitext(path)[0] + '.bin'
+        self.limit = limit
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # PT: on_write(linhas, ns) é chamado na thread de escrita depois de cada lote gravado
+        # EN: on_write(lines, ns) is called on the writer thread after each batch is written
+        # FR: on_write(lignes, ns) est appelé sur le thread d'écriture après chaque lot écrit
+        self.on_write = on_write
+        self._entries = HistoryColumns(limit)
+        # PT: IDs de registro são sequenciais: o da entrada i é first_id + i
+        # EN: Record IDs are sequential: the one of entry i is first_id + i
+        # FR: Les ID d'enregistrement sont séquentiels : celui de l'entrée i est first_id + i
+        self._next_id = 0
+        self._listeners = []
+        # PT: Protege as colunas de leitores em outras threads (ex.: exportação)
+        # EN: Guards the columns against readers on other threads (e.g. export)
+        # FR: Protège les colonnes des lecteurs d'autres threads (ex. : export)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._lines = 0
+        self._torn = False
+        # PT: Tamanho do diário que as entradas em memória espelham; outro processo (ou outro
+        #     HistoryStore) gravando no mesmo arquivo faz o tamanho divergir, e a partir daí o
+        #     instantâneo não é mais salvo (ele descreveria um diário que não é o do arquivo)
+        # EN: Journal size mirrored by the in-memory entries; another process (or another
+        #     HistoryStore) writing to the same file makes the size diverge, and from then on the
+        #     snapshot is no longer saved (it would describe a journal that is not the file's)
+        # FR: Taille du journal reflétée par les entrées en mémoire ; un autre processus (ou un autre
+        #     HistoryStore) écrivant dans le même fichier fait diverger la taille, et dès lors
+        #     l'instantané n'est plus sauvegardé (il décrirait un journal qui n'est pas celui du fichier)
+        self._offset = 0
+        self._shared = False
+        self._closed = False
+        self._snapshot_stale = False
+        self._load()
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------- UI-facing API ----------
+    def append(self, entry):
+        # PT: Custo na thread do Tk: um append em memória e um put na fila
+        # EN: Cost on the Tk thread: one in-memory append and one queue put
+        # FR: Coût sur le thread Tk : un ajout en mémoire et un put dans la file
+        with self._lock:
+            self._entries.append(entry)
+            record_id = self._next_id
+            self._next_id += 1
+        self._snapshot_stale = True
+        self._queue.put(('append', json.dumps(entry, ensure_ascii=False) + '\n'))
+        for listener in self._listeners:
+            listener('append', record_id, entry)
+        return record_id
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._snapshot_stale = True
+        self._queue.put(('clear', None))
+        for listener in self._listeners:
+            listener('clear', None, None)
+
+    def subscribe(self, listener):
+        # PT: listener(evento, id, entrada) é chamado a cada append ('append') e limpeza ('clear')
+        # EN: listener(event, id, entry) is called on every append ('append') and clear ('clear')
+        # FR: listener(événement, id, entrée) est appelé à chaque ajout ('append') et effacement ('clear')
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    @property
+    def first_id(self):
+        return self._next_id - len(self._entries)
+
+    @property
+    def next_id(self):
+        return self._next_id
+
+    def get(self, record_id):
+        # PT: Entrada pelo ID de registro, ou None se já foi descartada
+        # EN: Entry by record ID, or None if it was already dropped
+        # FR: Entrée par ID d'enregistrement, ou None si elle a déjà été retirée
+        with self._lock:
+            index = record_id - self.first_id
+            if 0 <= index < len(self._entries):
+                return self._entries[index]
+        return None
+
+    def read(self, start_id, stop_id):
+        # PT: Entradas com IDs em [start_id, stop_id) que ainda existem, de uma vez só
+        # EN: Entries with IDs in [start_id, stop_id) that still exist, in one go
+        # FR: Entrées d'ID dans [start_id, stop_id) qui existent encore, en une seule fois
+        with self._lock:
+            first_id = self.first_id
+            return self._entries[max(start_id - first_id, 0):max(stop_id - first_id, 0)]
+
+    def flush(self, wait=False):
+        # PT: Pede a gravação imediata do que estiver pendente (opcionalmente espera)
+        # EN: Ask for the pending lines to be written now (optionally waits)
+        # FR: Demande l'écriture immédiate des lignes en attente (attend éventuellement)
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        if wait:
+            done.wait()
+
+    def close(self):
+        # PT: Grava o pendente, compacta e encerra a thread (chamado também via atexit)
+        # EN: Write pending lines, compact and stop the thread (also called through atexit)
+        # FR: Écrit ce qui est en attente, compacte et arrête le thread (appelé aussi via atexit)
+        if self._closed:
+            return
+        self._closed = True
+        done = threading.Event()
+        self._queue.put(('stop', done))
+        done.wait(timeout=10)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        # PT: Índice ou fatia, como em uma lista
+        # EN: Index or slice, as with a list
+        # FR: Indice ou tranche, comme pour une liste
+        with self._lock:
+            return self._entries[index]
+
+    @property
+    def columns(self):
+        return self._entries
+
+    # ---------- Loading ----------
+    def _load(self):
+        # PT: Carrega o instantâneo binário (se ainda bater com o diário) e lê o resto do diário
+        #     linha a linha (linhas corrompidas, ex.: a última após uma queda, são ignoradas);
+        #     na primeira execução importa o history.json antigo
+        # EN: Load the binary snapshot (if it still matches the journal) and read the rest of the
+        #     journal line by line (corrupt lines, e.g. the last one after a crash, are skipped);
+        #     on the first run import the old history.json
+        # FR: Charge l'instantané binaire (s'il correspond encore au journal) et lit le reste du
+        #     journal ligne par ligne (les lignes corrompues, ex. la dernière après un crash, sont ignorées) ;
+        #     à la première exécution importe l'ancien history.json
+        if not os.path.exists(self.path):
+            self._import_legacy()
+            return
+        offset = self._load_snapshot()
+        try:
+            with open(self.path, mode='rb') as f:
+                f.seek(offset)
+                for line in f:
+                    self._lines += 1
+                    self._snapshot_stale = True
+                    self._torn = not line.endswith(b'\n')
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(entry, dict):
+                        self._entries.append(entry)
+                        self._next_id += 1
+                self._offset = f.tell()
+        except OSError:
+            pass
+
+    def _load_snapshot(self):
+        # PT: Deslocamento do diário coberto pelo instantâneo (0 se não houver um válido)
+        # EN: Journal offset covered by the snapshot (0 if there is no valid one)
+        # FR: Décalage du journal couvert par l'instantané (0 s'il n'y en a pas de valide)
+        try:
+            entries, lines, offset, check = HistoryColumns.load(self.snapshot_path, self.limit)
+            if check != self._journal_check(offset):
+                return 0
+        except (OSError, ValueError, KeyError, IndexError, struct.error):
+            return 0
+        self._entries = entries
+        self._lines = lines
+        self._next_id = len(entries)
+        return offset
+
+    def _journal_check(self, offset):
+        # PT: CRC dos últimos bytes do diário antes de `offset` (diário reescrito => não bate)
+        # EN: CRC of the journal's last bytes before `offset` (rewritten journal => mismatch)
+        # FR: CRC des derniers octets du journal avant `offset` (journal réécrit => pas de correspondance)
+        with open(self.path, mode='rb') as f:
+            start = max(offset - _CHECK_BYTES, 0)
+            f.seek(start)
+            data = f.read(offset - start)
+        if len(data) != offset - start:
+            raise ValueError('journal shorter than snapshot')
+        return zlib.crc32(data)
+
+    def _import_legacy(self):
+        try:
+            with open(self.legacy_path, mode='r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, list):
+            return
+        for entry in data:
+            if isinstance(entry, dict):
+                self.append(entry)
+
+    # ---------- Writer thread ----------
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                op, payload = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                op, payload = None, None
+            if op == 'append':
+                pending.append(payload)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(pending) < self.batch_size:
+                    continue
+            # PT: Grava o lote: prazo vencido, lote cheio ou qualquer outra operação
+            # EN: Write the batch: deadline reached, batch full or any other operation
+            # FR: Écrit le lot : délai écoulé, lot plein ou toute autre opération
+            if pending:
+                if self.on_write is None:
+                    self._write(pending)
+                else:
+                    start = time.perf_counter_ns()
+                    self._write(pending)
+                    self.on_write(len(pending), time.perf_counter_ns() - start)
+                pending = []
+            deadline = None
+            if op == 'clear':
+                with self._journal_lock():
+                    self._rewrite([])
+                    self._shared = False
+            elif self._lines > 2 * self.limit:
+                self._compact()
+            if op == 'flush':
+                payload.set()
+            elif op == 'stop':
+                self._compact()
+                if self._snapshot_stale:
+                    self._save_snapshot()
+                payload.set()
+                return
+
+    @contextlib.contextmanager
+    def _journal_lock(self):
+        # PT: Trava consultiva (flock) em "<diário>.lock" durante cada escrita, compactação e
+        #     instantâneo: outro processo no mesmo diário (ex.: "serve --history" apontando para o
+        #     da GUI) não perde linhas no meio de um os.replace nem pisa no mesmo .tmp
+        # EN: Advisory lock (flock) on "<journal>.lock" during each write, compaction and
+        #     snapshot: another process on the same journal (e.g. "serve --history" pointed at the
+        #     GUI one) does not lose lines in the middle of an os.replace nor trample the same .tmp
+        # FR: Verrou consultatif (flock) sur « <journal>.lock » pendant chaque écriture, compaction et
+        #     instantané : un autre processus sur le même journal (ex. : « serve --history » pointant
+        #     vers celui de la GUI) ne perd pas de lignes au milieu d'un os.replace ni n'écrase le même .tmp
+        handle = None
+        if fcntl is not None:
+            try:
+                handle = open(self.path + '.lock', mode='a')
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            except OSError:
+                if handle is not None:
+                    handle.close()
+                handle = None
+        try:
+            yield
+        finally:
+            if handle is not None:
+                handle.close()
+
+    def _check_offset(self, size):
+        if size != self._offset:
+            self._shared = True
+
+    def _write(self, lines):
+        data = ''.join(lines).encode('utf-8')
+        with self._journal_lock():
+            try:
+                with open(self.path, mode='a+b') as f:
+                    end = f.seek(0, os.SEEK_END)
+                    if end != self._offset:
+                        self._check_offset(end)
+                        f.seek(max(end - 1, 0))
+                        self._torn = end > 0 and f.read(1) != b'\n'
+                    if self._torn:
+                        # PT: Fecha a linha incompleta deixada por uma queda
+                        # EN: Terminate the partial line left by a crash
+                        # FR: Termine la ligne incomplète laissée par un crash
+                        f.write(b'\n')
+                        self._torn = False
+                    f.write(data)
+                    self._offset = f.tell()
+                self._lines += len(lines)
+            except OSError:
+                pass
+
+    def _compact(self):
+        # PT: Mantém só as últimas `limit` linhas válidas do diário
+        # EN: Keep only the last `limit` valid lines of the journal
+        # FR: Ne garde que les `limit` dernières lignes valides du journal
+        if self._lines <= self.limit:
+            return
+        with self._journal_lock():
+            try:
+                with open(self.path, mode='rb') as f:
+                    self._check_offset(os.fstat(f.fileno()).st_size)
+                    tail = deque((line for line in f if line.endswith(b'\n')), maxlen=self.limit)
+            except OSError:
+                return
+            self._rewrite(tail)
+
+    def _save_snapshot(self):
+        # PT: Só roda na parada: quem chamou close() está esperando, as colunas não mudam
+        # EN: Only runs on stop: the close() caller is waiting, the columns do not change
+        # FR: Ne s'exécute qu'à l'arrêt : l'appelant de close() attend, les colonnes ne changent pas
+        with self._journal_lock():
+            try:
+                offset = os.path.getsize(self.path)
+                self._check_offset(offset)
+                if self._shared:
+                    return
+                self._entries.save(self.snapshot_path, self._lines, offset, self._journal_check(offset))
+            except (OSError, ValueError):
+                pass
+
+    def _rewrite(self, lines):
+        # PT: Escrita atômica: arquivo temporário + os.replace (com a trava do diário segura)
+        # EN: Atomic write: temporary file + os.replace (with the journal lock held)
+        # FR: Écriture atomique : fichier temporaire + os.replace (avec le verrou du journal tenu)
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, mode='wb') as f:
+                f.writelines(lines)
+                offset = f.tell()
+            os.replace(tmp, self.path)
+            self._lines = len(lines)
+            self._offset = offset
+            self._torn = False
+        except OSError:
+            pass
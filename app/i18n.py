@@ -9,9 +9,12 @@ translations = {
         "menu_configuration": "Configuration",
         "menu_language": "Language",
         "menu_theme": "Theme",
+        "menu_new_window": "New window",
+        "menu_worksheet": "Worksheet...",
         "menu_exit": "Exit",
         "start_message": "Calculator Tk started...",
         "error": "Error",
+        "worker_busy": "Previous calculation still running",
         "language_names": {"en": "English", "pt": "Portuguese", "fr": "Français"}
     },
     "pt": {
@@ -19,9 +22,12 @@ translations = {
         "menu_configuration": "Configuração",
         "menu_language": "Idioma",
         "menu_theme": "Tema",
+        "menu_new_window": "Nova janela",
+        "menu_worksheet": "Planilha...",
         "menu_exit": "Sair",
         "start_message": "Calculadora Tk Iniciada...",
         "error": "Erro",
+        "worker_busy": "Cálculo anterior ainda em andamento",
         "language_names": {"en": "English", "pt": "Português", "fr": "Français"}
     },
     "fr": {
@@ -29,9 +35,12 @@ translations = {
         "menu_configuration": "Configuration",
         "menu_language": "Langue",
         "menu_theme": "Thème",
+        "menu_new_window": "Nouvelle fenêtre",
+        "menu_worksheet": "Feuille de calcul...",
         "menu_exit": "Quitter",
         "start_message": "Calculatrice Tk démarrée...",
         "error": "Erreur",
+        "worker_busy": "Calcul précédent toujours en cours",
         "language_names": {"en": "English", "pt": "Português", "fr": "Français"}
     }
 }
\ No newline at end of file
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+from array import array
+
+
+class HistoryIndex(object):
+    """Índice de trigramas sobre expressões e resultados do histórico."""
+    # PT: Cada trigrama aponta para a lista (crescente) de IDs que o contêm; uma busca
+    #     intersecta as listas dos trigramas da consulta e confirma com `in`. Consultas
+    #     com menos de 3 caracteres caem em uma varredura simples
+    # EN: Each trigram points to the (increasing) list of IDs containing it; a search
+    #     intersects the lists of the query trigrams and confirms with `in`. Queries
+    #     shorter than 3 characters fall back to a plain scan
+    # FR: Chaque trigramme pointe vers la liste (croissante) des ID qui le contiennent ; une
+    #     recherche intersecte les listes des trigrammes de la requête et confirme avec `in`.
+    #     Les requêtes de moins de 3 caractères passent par un simple parcours
+
+    def __init__(self, store):
+        self._store = store
+        self._postings = {}
+        self._indexed = 0
+        for record_id in range(store.first_id, store.next_id):
+            self._index(record_id, store.get(record_id))
+        store.subscribe(self._on_change)
+
+    @staticmethod
+    def text(entry):
+        # PT: Texto pesquisável de uma entrada (expressão e resultado)
+        # EN: Searchable text of an entry (expression and result)
+        # FR: Texte recherchable d'une entrée (expression et résultat)
+        return ('%s = %s' % (entry.get('expression', ''), entry.get('result', ''))).lower()
+
+    def _index(self, record_id, entry):
+        text = self.text(entry)
+        for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array('q')
+            postings.append(record_id)
+        self._indexed += 1
+
+    def add(self, record_id, entry):
+        self._index(record_id, entry)
+        # PT: IDs descartados pelo limite do histórico continuam nas listas; quando passam
+        #     da metade do índice, ele é reconstruído
+        # EN: IDs dropped by the history limit stay in the lists; when they exceed half
+        #     of the index, it is rebuilt
+        # FR: Les ID retirés par la limite de l'historique restent dans les listes ; quand ils
+        #     dépassent la moitié de l'index, il est reconstruit
+        if self._indexed > 2 * max(len(self._store), 1024):
+            self._rebuild()
+
+    def _rebuild(self):
+        self._postings = {}
+        self._indexed = 0
+        store = self._store
+        for record_id in range(store.first_id, store.next_id):
+            self._index(record_id, store.get(record_id))
+
+    def _on_change(self, event, record_id, entry):
+        if event == 'append':
+            self.add(record_id, entry)
+        else:
+            self._postings = {}
+            self._indexed = 0
+
+    def search(self, query):
+        # PT: IDs (crescentes) das entradas cujo texto contém `query`
+        # EN: IDs (increasing) of the entries whose text contains `query`
+        # FR: ID (croissants) des entrées dont le texte contient `query`
+        query = query.lower()
+        store = self._store
+        first_id = store.first_id
+        if len(query) < 3:
+            return [record_id for record_id in range(first_id, store.next_id)
+                    if query in self.text(store.get(record_id))]
+        grams = sorted({query[i:i + 3] for i in range(len(query) - 2)},
+                       key=lambda gram: len(self._postings.get(gram, ())))
+        candidates = None
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if not postings:
+                return []
+            candidates = set(postings) if candidates is None else candidates.intersection(postings)
+            if not candidates:
+                return []
+        result = []
+        for record_id in sorted(candidates):
+            if record_id < first_id:
+                continue
+            entry = store.get(record_id)
+            if entry is not None and query in self.text(entry):
+                result.append(record_id)
+        return result
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import atexit
+import collections
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+
+# PT: Variável de ambiente que liga a instrumentação sem mexer no settings.json
+#     (qualquer valor diferente de '', '0', 'false' ou 'no')
+# EN: Environment variable that turns instrumentation on without touching settings.json
+#     (any value other than '', '0', 'false' or 'no')
+# FR: Variable d'environnement qui active l'instrumentation sans toucher à settings.json
+#     (toute valeur autre que '', '0', 'false' ou 'no')
+ENV_VAR = 'CALC_INSTRUMENTATION'
+
+# PT: Bits de sub-balde por potência de 2: 3 => erro relativo de no máximo 12,5%
+# EN: Sub-bucket bits per power of 2: 3 => at most 12.5% relative error
+# FR: Bits de sous-seau par puissance de 2 : 3 => au plus 12,5 % d'erreur relative
+_SUB_BITS = 3
+_EXACT = 1 << (_SUB_BITS + 1)
+_BUCKETS = (64 << _SUB_BITS) + _EXACT
+
+
+def enabled(settings):
+    value = os.environ.get(ENV_VAR)
+    if value is not None:
+        return value.strip().lower() not in ('', '0', 'false', 'no')
+    return bool(settings.get('instrumentation', False))
+
+
+def _bucket(ns):
+    bits = ns.bit_length()
+    if bits <= _SUB_BITS + 1:
+        return ns
+    shift = bits - _SUB_BITS - 1
+    return (shift << _SUB_BITS) + (ns >> shift)
+
+
+def _bucket_bounds(index):
+    if index < _EXACT:
+        return index, index
+    shift = (index >> _SUB_BITS) - 1
+    mantissa = index - (shift << _SUB_BITS)
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class Histograma(object):
+    """Histograma log-linear de durações em nanossegundos (baldes fixos, O(1) por registro)."""
+
+    __slots__ = ('counts', 'count', 'total', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = 0
+
+    def record(self, ns):
+        if ns < 0:
+            ns = 0
+        self.counts[_bucket(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if self.minimum is None or ns < self.minimum:
+            self.minimum = ns
+        if ns > self.maximum:
+            self.maximum = ns
+
+    def percentile(self, p):
+        # PT: Ponto médio do balde que contém o percentil p (0-100)
+        # EN: Midpoint of the bucket holding percentile p (0-100)
+        # FR: Milieu du seau contenant le percentile p (0-100)
+        if not self.count:
+            return 0
+        target = max(1, int(round(p / 100.0 * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                low, high = _bucket_bounds(index)
+                return min(max((low + high) // 2, self.minimum), self.maximum)
+        return self.maximum
+
+    def summary(self):
+        us = 1000.0
+        return {
+            'count': self.count,
+            'mean_us': round(self.total / self.count / us, 3) if self.count else 0.0,
+            'min_us': round((self.minimum or 0) / us, 3),
+            'p50_us': round(self.percentile(50) / us, 3),
+            'p90_us': round(self.percentile(90) / us, 3),
+            'p99_us': round(self.percentile(99) / us, 3),
+            'max_us': round(self.maximum / us, 3),
+            'buckets': {str(_bucket_bounds(i)[1]): c for i, c in enumerate(self.counts) if c},
+        }
+
+
+class Instrumentos(object):
+    """Histogramas por nome, embrulho de comandos da GUI e despejo em JSON (ao sair ou sob demanda)."""
+    # PT: Só existe quando a instrumentação está ligada; desligada, a Calculadora nem importa
+    #     este módulo e os comandos ficam exatamente como eram (custo zero)
+    # EN: Only exists when instrumentation is on; when off, Calculadora does not even import
+    #     this module and the commands stay exactly as they were (zero cost)
+    # FR: N'existe que si l'instrumentation est active ; sinon la Calculadora n'importe même pas
+    #     ce module et les commandes restent exactement comme avant (coût nul)
+
+    def __init__(self, path='./app/settings/instrumentation.json'):
+        self.path = path
+        self.histograms = collections.defaultdict(Histograma)
+        self.started = time.time()
+        self.profiler = None
+        atexit.register(self.dump)
+
+    def record(self, name, ns):
+        self.histograms[name].record(ns)
+
+    def wrap(self, name, function, widget=None):
+        # PT: Mede o comando (`name`) e, com `widget`, também o tempo até o Tk ficar ocioso
+        #     depois dele, isto é, com o redesenho feito (`name.idle`)
+        # EN: Time the command (`name`) and, with `widget`, also the time until Tk is idle
+        #     after it, that is, with the redraw done (`name.idle`)
+        # FR: Mesure la commande (`name`) et, avec `widget`, aussi le temps jusqu'à ce que Tk soit
+        #     oisif après elle, c'est-à-dire le redessin fait (`name.idle`)
+        clock = time.perf_counter_ns
+        handler = self.histograms[name]
+        idle = self.histograms[name + '.idle'] if widget is not None else None
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                handler.record(clock() - start)
+                if idle is not None:
+                    widget.after_idle(lambda: idle.record(clock() - start))
+        timed.__wrapped__ = function
+        return timed
+
+    def report(self):
+        # PT: Resumo por nome (sem os baldes), ordenado pelo p99
+        # EN: Per-name summary (without the buckets), sorted by p99
+        # FR: Résumé par nom (sans les seaux), trié par p99
+        rows = [(name, h.summary()) for name, h in self.histograms.items() if h.count]
+        rows.sort(key=lambda row: row[1]['p99_us'], reverse=True)
+        return ['%-32s n=%-7d p50 %9.1f us  p99 %9.1f us  max %9.1f us' % (
+            name, s['count'], s['p50_us'], s['p99_us'], s['max_us']) for name, s in rows]
+
+    def dump(self, path=None):
+        path = path or self.path
+        data = {
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+            'dumped': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'histograms': {name: h.summary() for name, h in sorted(self.histograms.items()) if h.count},
+        }
+        tmp = path + '.tmp'
+        try:
+            with open(tmp, mode='w', encoding='utf-8') as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp, path)
+        except OSError as e:
+            sys.stderr.write('instrumentation: cannot write %s: %s\n' % (path, e))
+            return None
+        if self.profiler is not None and self.profiler.samples:
+            self.profiler.dump()
+        return path
+
+    def install_signals(self):
+        # PT: Em sistemas POSIX: SIGUSR1 despeja os histogramas, SIGUSR2 liga/desliga o amostrador
+        #     (ex.: kill -USR1 <pid> em um quiosque já aberto)
+        # EN: On POSIX systems: SIGUSR1 dumps the histograms, SIGUSR2 toggles the sampler
+        #     (e.g. kill -USR1 <pid> on a kiosk that is already running)
+        # FR: Sur les systèmes POSIX : SIGUSR1 écrit les histogrammes, SIGUSR2 active/désactive
+        #     l'échantillonneur (ex. : kill -USR1 <pid> sur un kiosque déjà lancé)
+        if not hasattr(signal, 'SIGUSR1') or threading.current_thread() is not threading.main_thread():
+            return False
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.dump())
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self.toggle_profiler())
+        return True
+
+    def toggle_profiler(self, interval=0.005):
+        if self.profiler is not None and self.profiler.running:
+            self.profiler.stop()
+            self.profiler.dump()
+            return False
+        self.profiler = Amostrador(os.path.splitext(self.path)[0] + '.stacks.txt', interval=interval)
+        self.profiler.start()
+        return True
+
+
+class Amostrador(object):
+    """Profiler por amostragem da thread principal; grava pilhas no formato 'collapsed' (flame graphs)."""
+    # PT: Uma thread lê sys._current_frames() a cada `interval` segundos; a thread do Tk não
+    #     executa nada extra. O arquivo abre no speedscope ou no flamegraph.pl
+    # EN: A thread reads sys._current_frames() every `interval` seconds; the Tk thread runs
+    #     nothing extra. The file opens in speedscope or flamegraph.pl
+    # FR: Un thread lit sys._current_frames() toutes les `interval` secondes ; le thread Tk
+    #     n'exécute rien de plus. Le fichier s'ouvre dans speedscope ou flamegraph.pl
+
+    def __init__(self, path, interval=0.005, thread_id=None):
+        self.path = path
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.samples = collections.Counter()
+        self.running = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.running = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename),
+                                             code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def dump(self):
+        with open(self.path, mode='w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write('%s %d\n' % (stack, count))
+        return self.path
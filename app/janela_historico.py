@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+# PT: GUI toolkit
+# EN: GUI toolkit
+# FR: Boîte à outils GUI
+import tkinter as tk
+
+# PT: Módulo próprio (índice de busca)
+# EN: Local module (search index)
+# FR: Module local (index de recherche)
+from .indice import HistoryIndex
+
+
+class JanelaHistorico(object):
+    """Janela de histórico virtualizada: só as linhas visíveis existem no Listbox."""
+    # PT: Uma única janela por calculadora (escondida ao fechar, reaberta ao mostrar).
+    #     A barra de rolagem é controlada à mão: o Listbox recebe só uma página de linhas,
+    #     e cada linha é ligada ao ID de registro da entrada, sem reinterpretar o texto
+    # EN: A single window per calculator (hidden on close, shown again on open).
+    #     The scrollbar is driven by hand: the Listbox only receives one page of rows,
+    #     and each row is tied to the entry's record ID, without re-parsing the text
+    # FR: Une seule fenêtre par calculatrice (cachée à la fermeture, réaffichée à l'ouverture).
+    #     La barre de défilement est pilotée à la main : la Listbox ne reçoit qu'une page de lignes,
+    #     et chaque ligne est liée à l'ID d'enregistrement de l'entrée, sans réanalyser le texte
+
+    ROWS = 17
+    SEARCH_DELAY_MS = 150
+
+    def __init__(self, master, store, theme, t, on_select, index=None):
+        self._store = store
+        # PT: O índice pode ser compartilhado entre janelas (ver ContextoDaAplicacao.history_index)
+        # EN: The index can be shared between windows (see ContextoDaAplicacao.history_index)
+        # FR: L'index peut être partagé entre fenêtres (voir ContextoDaAplicacao.history_index)
+        self._index = index if index is not None else HistoryIndex(store)
+        self._on_select = on_select
+        self._ids = None
+        self._offset = 0
+        self._rows = []
+        self._search_job = None
+        self._render_job = None
+        self._shown = False
+
+        self._win = tk.Toplevel(master)
+        self._win.geometry('360x420')
+        self._win.resizable(False, False)
+        self._win.protocol('WM_DELETE_WINDOW', self.hide)
+
+        # PT: Busca incremental
+        # EN: Incremental search
+        # FR: Recherche incrémentale
+        search = tk.Frame(self._win)
+        search.pack(fill='x', padx=8, pady=(8, 0))
+        self._search_label = tk.Label(search)
+        self._search_label.pack(side='left')
+        self._query = tk.StringVar(self._win)
+        self._query.trace_add('write', self._on_query_changed)
+        tk.Entry(search, textvariable=self._query).pack(side='left', fill='x', expand=True, padx=(6, 0))
+
+        # PT: Lista de uma página + barra de rolagem controlada manualmente
+        # EN: One-page list + manually driven scrollbar
+        # FR: Liste d'une page + barre de défilement pilotée manuellement
+        self._frame = frame = tk.Frame(self._win)
+        frame.pack(fill='both', expand=True)
+        self._scrollbar = tk.Scrollbar(frame, command=self._on_scrollbar)
+        self._scrollbar.pack(side='right', fill='y', pady=8, padx=(0, 8))
+        self._listbox = tk.Listbox(frame, height=self.ROWS, activestyle='none')
+        self._listbox.pack(fill='both', expand=True, padx=(8, 0), pady=8)
+        self._listbox.bind('<Double-Button-1>', self._copy_selected)
+        self._listbox.bind('<MouseWheel>', lambda event: self._scroll(-1 if event.delta > 0 else 1))
+        self._listbox.bind('<Button-4>', lambda event: self._scroll(-1))
+        self._listbox.bind('<Button-5>', lambda event: self._scroll(1))
+        self._listbox.bind('<Prior>', lambda event: self._scroll(-self.ROWS))
+        self._listbox.bind('<Next>', lambda event: self._scroll(self.ROWS))
+
+        btns = tk.Frame(self._win)
+        btns.pack(fill='x', padx=8, pady=8)
+        self._copy_button = tk.Button(btns, command=self._copy_selected)
+        self._copy_button.pack(side='left')
+        self._close_button = tk.Button(btns, command=self.hide)
+        self._close_button.pack(side='right')
+
+        self.apply(theme, t)
+        store.subscribe(self._on_store_changed)
+
+    def apply(self, theme, t):
+        # PT: Aplica tema e textos nos widgets existentes (troca de tema/idioma sem recriar a janela)
+        # EN: Apply theme and texts to the existing widgets (theme/language switch without recreating the window)
+        # FR: Applique thème et textes aux widgets existants (changement de thème/langue sans recréer la fenêtre)
+        self._win.title(t.get('history_window_title', 'History'))
+        self._frame['bg'] = theme.get('frame_bg', '#ffffff')
+        self._search_label['text'] = t.get('history_search', 'Search')
+        self._copy_button['text'] = t.get('history_copy_btn', 'Copy to input')
+        self._close_button['text'] = t.get('close', 'Close')
+
+    # ---------- Visibility ----------
+    def show(self):
+        self._shown = True
+        self._win.deiconify()
+        self._win.lift()
+        self._scroll_to_end()
+
+    def hide(self):
+        self._shown = False
+        self._win.withdraw()
+
+    def destroy(self):
+        # PT: Para de ouvir o histórico (que continua vivo no contexto) e fecha a janela
+        # EN: Stop listening to the history (which stays alive in the context) and close the window
+        # FR: Cesse d'écouter l'historique (qui reste vivant dans le contexte) et ferme la fenêtre
+        self._store.unsubscribe(self._on_store_changed)
+        self._win.destroy()
+
+    # ---------- Rows ----------
+    def _count(self):
+        return len(self._store) if self._ids is None else len(self._ids)
+
+    def _id_at(self, position):
+        return self._store.first_id + position if self._ids is None else self._ids[position]
+
+    def _render(self):
+        # PT: Recria só as ROWS linhas visíveis e posiciona a barra de rolagem
+        # EN: Recreate only the ROWS visible rows and position the scrollbar
+        # FR: Recrée seulement les ROWS lignes visibles et positionne la barre de défilement
+        self._render_job = None
+        count = self._count()
+        self._offset = max(0, min(self._offset, count - self.ROWS))
+        self._rows = []
+        labels = []
+        for position in range(self._offset, min(self._offset + self.ROWS, count)):
+            record_id = self._id_at(position)
+            entry = self._store.get(record_id)
+            if entry is None:
+                continue
+            self._rows.append(record_id)
+            labels.append('%s  |  %s = %s' % (entry.get('time', ''), entry.get('expression', ''), entry.get('result', '')))
+        self._listbox.delete(0, 'end')
+        if labels:
+            self._listbox.insert('end', *labels)
+        if count:
+            self._scrollbar.set(self._offset / count, min(self._offset + self.ROWS, count) / count)
+        else:
+            self._scrollbar.set(0, 1)
+
+    def _schedule_render(self):
+        if self._render_job is None:
+            self._render_job = self._win.after_idle(self._render)
+
+    def _scroll(self, rows):
+        self._offset += rows
+        self._schedule_render()
+        return 'break'
+
+    def _scroll_to_end(self):
+        self._offset = self._count()
+        self._schedule_render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        # PT: Protocolo do Scrollbar do Tk: ('moveto', fração) ou ('scroll', n, 'units'|'pages')
+        # EN: Tk Scrollbar protocol: ('moveto', fraction) or ('scroll', n, 'units'|'pages')
+        # FR: Protocole du Scrollbar Tk : ('moveto', fraction) ou ('scroll', n, 'units'|'pages')
+        if action == 'moveto':
+            self._offset = int(float(amount) * self._count())
+            self._schedule_render()
+        else:
+            self._scroll(int(amount) * (self.ROWS if unit == 'pages' else 1))
+
+    # ---------- Search ----------
+    def _on_query_changed(self, *args):
+        if self._search_job is not None:
+            self._win.after_cancel(self._search_job)
+        self._search_job = self._win.after(self.SEARCH_DELAY_MS, self._apply_search)
+
+    def _apply_search(self):
+        self._search_job = None
+        query = self._query.get().strip()
+        self._ids = self._index.search(query) if query else None
+        self._scroll_to_end()
+
+    def _on_store_changed(self, event, record_id, entry):
+        # PT: Novas entradas entram na busca ativa sem refazer a consulta
+        # EN: New entries join the active search without re-running the query
+        # FR: Les nouvelles entrées rejoignent la recherche active sans relancer la requête
+        if event == 'clear':
+            self._ids = [] if self._ids is not None else None
+        elif self._ids is not None:
+            if self._query.get().strip().lower() in HistoryIndex.text(entry):
+                self._ids.append(record_id)
+        if self._shown:
+            self._scroll_to_end()
+
+    # ---------- Selection ----------
+    def _copy_selected(self, event=None):
+        selection = self._listbox.curselection()
+        if not selection or selection[0] >= len(self._rows):
+            return
+        entry = self._store.get(self._rows[selection[0]])
+        if entry is not None:
+            self._on_select(entry)
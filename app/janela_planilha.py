@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+# PT: GUI toolkit
+# EN: GUI toolkit
+# FR: Boîte à outils GUI
+import tkinter as tk
+
+# PT: Módulo próprio (planilha incremental)
+# EN: Local module (incremental worksheet)
+# FR: Module local (feuille incrémentale)
+from .planilha import Planilha
+
+
+class JanelaPlanilha(object):
+    """Editor de planilha: linhas à esquerda, resultados alinhados à direita."""
+    # PT: Cada edição (com um pequeno atraso) passa o texto para Planilha.update, que só
+    #     reavalia as linhas afetadas; só as linhas de resultado que mudaram são reescritas
+    # EN: Each edit (after a short delay) hands the text to Planilha.update, which only
+    #     re-evaluates the affected lines; only the result lines that changed are rewritten
+    # FR: Chaque modification (après un court délai) passe le texte à Planilha.update, qui ne
+    #     réévalue que les lignes touchées ; seules les lignes de résultat modifiées sont réécrites
+
+    UPDATE_DELAY_MS = 80
+
+    def __init__(self, master, calc, theme, t, on_select):
+        self.sheet = Planilha(calc)
+        self._on_select = on_select
+        self._error_text = 'Error'
+        self._update_job = None
+        self._rendered = 0
+
+        self._win = tk.Toplevel(master)
+        self._win.geometry('520x420')
+        self._win.protocol('WM_DELETE_WINDOW', self.hide)
+
+        self._frame = frame = tk.Frame(self._win)
+        frame.pack(fill='both', expand=True)
+        self._scrollbar = tk.Scrollbar(frame, command=self._on_scrollbar)
+        self._scrollbar.pack(side='right', fill='y', pady=8, padx=(0, 8))
+        self._results = tk.Text(frame, width=18, wrap='none', state='disabled', cursor='arrow',
+                                yscrollcommand=self._on_results_scrolled)
+        self._results.pack(side='right', fill='y', pady=8)
+        self._results.bind('<Double-Button-1>', self._copy_result)
+        self._editor = tk.Text(frame, wrap='none', undo=True, yscrollcommand=self._on_editor_scrolled)
+        self._editor.pack(side='left', fill='both', expand=True, padx=(8, 4), pady=8)
+        self._editor.bind('<<Modified>>', self._on_modified)
+
+        btns = tk.Frame(self._win)
+        btns.pack(fill='x', padx=8, pady=(0, 8))
+        self._close_button = tk.Button(btns, command=self.hide)
+        self._close_button.pack(side='right')
+
+        self.apply(theme, t)
+
+    def apply(self, theme, t):
+        # PT: Aplica tema e textos nos widgets existentes
+        # EN: Apply theme and texts to the existing widgets
+        # FR: Applique thème et textes aux widgets existants
+        self._win.title(t.get('worksheet_window_title', 'Worksheet'))
+        self._frame['bg'] = theme.get('frame_bg', '#ffffff')
+        self._close_button['text'] = t.get('close', 'Close')
+        error_text = t.get('error', 'Error')
+        if error_text != self._error_text:
+            self._error_text = error_text
+            self._render_all()
+
+    # ---------- Visibility ----------
+    def show(self):
+        self._win.deiconify()
+        self._win.lift()
+        self._editor.focus_set()
+
+    def hide(self):
+        self._win.withdraw()
+
+    def destroy(self):
+        if self._update_job is not None:
+            self._win.after_cancel(self._update_job)
+            self._update_job = None
+        self._win.destroy()
+
+    # ---------- Updates ----------
+    def _on_modified(self, event=None):
+        if not self._editor.edit_modified():
+            return
+        self._editor.edit_modified(False)
+        if self._update_job is not None:
+            self._win.after_cancel(self._update_job)
+        self._update_job = self._win.after(self.UPDATE_DELAY_MS, self._apply_text)
+
+    def _apply_text(self):
+        self._update_job = None
+        changed = self.sheet.update(self._editor.get('1.0', 'end-1c').split('\n'))
+        if len(self.sheet) != self._rendered:
+            # PT: Linhas inseridas ou removidas deslocam os resultados: redesenha a coluna
+            # EN: Inserted or removed lines shift the results: redraw the column
+            # FR: Des lignes insérées ou supprimées décalent les résultats : redessine la colonne
+            self._render_all()
+            return
+        self._results['state'] = 'normal'
+        for position in changed:
+            index = '%d.0' % (position + 1)
+            self._results.delete(index, '%s lineend' % index)
+            self._results.insert(index, self._result_text(self.sheet.line(position)))
+        self._results['state'] = 'disabled'
+        self._results.yview_moveto(self._editor.yview()[0])
+
+    def _render_all(self):
+        self._rendered = len(self.sheet)
+        self._results['state'] = 'normal'
+        self._results.delete('1.0', 'end')
+        self._results.insert('1.0', '\n'.join(self._result_text(line) for line in self.sheet.lines()))
+        self._results['state'] = 'disabled'
+        self._results.yview_moveto(self._editor.yview()[0])
+
+    def _result_text(self, line):
+        result = line.result
+        return self._error_text if result == "__ERR__" else result
+
+    # ---------- Scrolling ----------
+    # PT: Uma barra de rolagem para os dois Text, que rolam juntos
+    # EN: One scrollbar for both Text widgets, which scroll together
+    # FR: Une barre de défilement pour les deux Text, qui défilent ensemble
+    def _on_scrollbar(self, *args):
+        self._editor.yview(*args)
+        self._results.yview(*args)
+
+    def _on_editor_scrolled(self, first, last):
+        self._scrollbar.set(first, last)
+        self._results.yview_moveto(first)
+
+    def _on_results_scrolled(self, first, last):
+        self._scrollbar.set(first, last)
+        self._editor.yview_moveto(first)
+
+    # ---------- Selection ----------
+    def _copy_result(self, event=None):
+        # PT: Duplo clique em um resultado leva o valor para a entrada da calculadora
+        # EN: Double-clicking a result sends the value to the calculator input
+        # FR: Un double clic sur un résultat envoie la valeur dans la saisie de la calculatrice
+        position = int(self._results.index('@%d,%d' % (event.x, event.y)).split('.')[0]) - 1
+        if 0 <= position < len(self.sheet):
+            line = self.sheet.line(position)
+            if line.error is None and line.value is not None:
+                self._on_select({'expression': line.result})
+        return 'break'
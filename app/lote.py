@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+
+# PT: Módulo próprio (lógica de cálculo)
+# EN: Local module (calculation logic)
+# FR: Module local (logique de calcul)
+from .calculador import Calculador
+
+
+def read_expressions(stream):
+    # PT: Gera (número da linha, expressão) sem carregar o arquivo inteiro
+    # EN: Yield (line number, expression) without loading the whole file
+    # FR: Génère (numéro de ligne, expression) sans charger tout le fichier
+    for lineno, line in enumerate(stream, 1):
+        yield lineno, line.strip()
+
+
+def _chunks(items, size):
+    # PT: Agrupa o gerador em listas de tamanho fixo
+    # EN: Group the generator into fixed-size lists
+    # FR: Regroupe le générateur en listes de taille fixe
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def evaluate_serial(lines, calc=None):
+    # PT: Avalia linha a linha no processo atual; gera (linha, expressão, resultado)
+    # EN: Evaluate line by line in the current process; yield (line, expression, result)
+    # FR: Évalue ligne par ligne dans le processus courant ; génère (ligne, expression, résultat)
+    calc = calc or Calculador()
+    for lineno, expr in lines:
+        yield lineno, expr, calc.calculation(expr) if expr else ''
+
+
+# PT: Calculador de cada processo do pool (criado uma vez pelo initializer)
+# EN: Per-process Calculador of the pool (created once by the initializer)
+# FR: Calculador de chaque processus du pool (créé une fois par l'initializer)
+_worker_calc = None
+
+
+def _init_worker():
+    global _worker_calc
+    _worker_calc = Calculador()
+
+
+def _evaluate_chunk(expressions):
+    calculation = _worker_calc.calculation
+    return [calculation(expr) if expr else '' for expr in expressions]
+
+
+def evaluate_parallel(lines, jobs=None, chunk_size=1024, ordered=True):
+    # PT: Distribui blocos de linhas para um pool de processos, com no máximo
+    #     2 blocos pendentes por processo (memória constante)
+    # EN: Dispatch chunks of lines to a process pool, keeping at most
+    #     2 pending chunks per process (constant memory)
+    # FR: Distribue des blocs de lignes à un pool de processus, avec au plus
+    #     2 blocs en attente par processus (mémoire constante)
+    jobs = jobs or os.cpu_count() or 1
+    max_pending = 2 * jobs
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+        pending = deque() if ordered else {}
+
+        def drain():
+            if ordered:
+                chunk, future = pending.popleft()
+                yield from _merge(chunk, future.result())
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from _merge(pending.pop(future), future.result())
+
+        for chunk in _chunks(lines, chunk_size):
+            future = pool.submit(_evaluate_chunk, [expr for _, expr in chunk])
+            if ordered:
+                pending.append((chunk, future))
+            else:
+                pending[future] = chunk
+            if len(pending) >= max_pending:
+                yield from drain()
+        while pending:
+            yield from drain()
+
+
+def _merge(chunk, results):
+    for (lineno, expr), result in zip(chunk, results):
+        yield lineno, expr, result
+
+
+def run(args):
+    # PT: Ponto de entrada do subcomando "batch"
+    # EN: Entry point of the "batch" subcommand
+    # FR: Point d'entrée de la sous-commande « batch »
+    source = sys.stdin if args.input == '-' else open(args.input, mode='r', encoding='utf-8')
+    target = sys.stdout if args.output == '-' else open(args.output, mode='w', encoding='utf-8')
+    ordered = not args.unordered
+    errors = 0
+    try:
+        lines = read_expressions(source)
+        if args.jobs == 1:
+            results = evaluate_serial(lines)
+        else:
+            results = evaluate_parallel(lines, jobs=args.jobs or None,
+                                        chunk_size=args.chunk_size, ordered=ordered)
+        for lineno, expr, result in results:
+            if result == "__ERR__":
+                # PT: Erro reportado por linha, sem interromper o lote
+                # EN: Error reported per line, without stopping the batch
+                # FR: Erreur signalée par ligne, sans interrompre le lot
+                errors += 1
+                sys.stderr.write('line %d: cannot evaluate %r\n' % (lineno, expr))
+            if ordered:
+                target.write('%s\n' % result)
+            else:
+                target.write('%d\t%s\n' % (lineno, result))
+    finally:
+        target.flush()
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    return 1 if errors else 0
+
+
+def add_arguments(parser):
+    parser.add_argument('input', nargs='?', default='-',
+                        help='file with one expression per line (default: stdin)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write results to (default: stdout)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='worker processes; 0 uses every CPU (default: 1, no pool)')
+    parser.add_argument('--chunk-size', type=int, default=1024,
+                        help='lines sent to a worker at a time (default: 1024)')
+    parser.add_argument('--unordered', action='store_true',
+                        help='write results as soon as they finish, prefixed by the line number')
+    parser.set_defaults(func=run)
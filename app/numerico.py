@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import ast
+from decimal import Context, Decimal, localcontext
+from fractions import Fraction
+
+# PT: Módulos próprios (montagem das closures e funções científicas)
+# EN: Local modules (closure building and scientific functions)
+# FR: Modules locaux (construction des closures et fonctions scientifiques)
+from . import funcoes
+from .compilador import build, lookup
+
+
+# PT: Motores numéricos disponíveis; "auto" tenta float e passa a Decimal quando necessário
+# EN: Available numeric engines; "auto" tries float and switches to Decimal when needed
+# FR: Moteurs numériques disponibles ; « auto » essaie float et passe à Decimal si nécessaire
+ENGINES = ('float', 'decimal', 'fraction', 'auto')
+
+
+def _decimal_literal(value):
+    # PT: repr() devolve o texto mais curto do literal (0.1 -> "0.1"), então o Decimal é exato
+    # EN: repr() gives the shortest text of the literal (0.1 -> "0.1"), so the Decimal is exact
+    # FR: repr() donne le texte le plus court du littéral (0.1 -> "0.1"), donc le Decimal est exact
+    return Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+
+
+def _fraction_literal(value):
+    return Fraction(repr(value)) if isinstance(value, float) else Fraction(value)
+
+
+def needs_exact(tree):
+    # PT: Verdadeiro se algum literal decimal não tem representação binária exata (ex.: 0.1)
+    # EN: True if some decimal literal has no exact binary representation (e.g. 0.1)
+    # FR: Vrai si un littéral décimal n'a pas de représentation binaire exacte (ex. : 0.1)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, float):
+            if Fraction(repr(node.value)) != Fraction(node.value):
+                return True
+    return False
+
+
+def exact_runner(tree, engine, precision=28, observe=None, env=None):
+    # PT: Monta a closure da expressão para o motor "decimal" ou "fraction"; as variáveis
+    #     de uma fórmula (`env`) são convertidas como os literais, na leitura
+    # EN: Build the expression closure for the "decimal" or "fraction" engine; the variables
+    #     of a formula (`env`) are converted like the literals, when read
+    # FR: Construit la closure de l'expression pour le moteur « decimal » ou « fraction » ; les
+    #     variables d'une formule (`env`) sont converties comme les littéraux, à la lecture
+    literal = _fraction_literal if engine == 'fraction' else _decimal_literal
+    names = lookup(env, literal) if env is not None else None
+    library = funcoes.library(engine)
+    if engine == 'fraction':
+        return build(tree, literal, observe, names, library)
+    context = Context(prec=precision)
+    # PT: Chamadas dobradas na compilação já usam a precisão configurada
+    # EN: Calls folded at compile time already use the configured precision
+    # FR: Les appels pliés à la compilation utilisent déjà la précision configurée
+    with localcontext(context):
+        inner = build(tree, literal, observe, names, library)
+
+    def run():
+        with localcontext(context):
+            return inner()
+    return run
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import heapq
+import itertools
+import json
+import threading
+from fractions import Fraction
+
+
+class _PicoPorThread(threading.local):
+    peak = 0
+
+
+class Observador(object):
+    """Recebe cada valor intermediário da expressão e guarda o maior tamanho de inteiro visto (bits)."""
+    # PT: Passado como `observe` para compilador.build; só é usado quando o perfil está ligado.
+    #     O pico é guardado por thread: avaliações simultâneas do mesmo Calculador não se misturam
+    # EN: Passed as `observe` to compilador.build; only used when profiling is on.
+    #     The peak is kept per thread: simultaneous evaluations on the same Calculador do not mix
+    # FR: Passé comme `observe` à compilador.build ; utilisé seulement si le profilage est actif.
+    #     Le pic est gardé par thread : des évaluations simultanées du même Calculador ne se mélangent pas
+
+    __slots__ = ('_local',)
+
+    def __init__(self):
+        self._local = _PicoPorThread()
+
+    @property
+    def peak(self):
+        return self._local.peak
+
+    @peak.setter
+    def peak(self, bits):
+        self._local.peak = bits
+
+    def __call__(self, value):
+        if type(value) is int:
+            bits = value.bit_length()
+        elif type(value) is Fraction:
+            bits = max(value.numerator.bit_length(), value.denominator.bit_length())
+        else:
+            return value
+        local = self._local
+        if bits > local.peak:
+            local.peak = bits
+        return value
+
+
+class RegistroLento(object):
+    """As `size` avaliações mais lentas acima de `threshold_ms`, com as métricas de cada uma."""
+    # PT: Heap de mínimo limitado: inserir custa O(log size) e só quando passa do limite
+    #     (o lock também só é pego nesse caso)
+    # EN: Bounded min-heap: inserting costs O(log size) and only above the threshold
+    #     (the lock is also only taken in that case)
+    # FR: Tas min borné : insérer coûte O(log size) et seulement au-delà du seuil
+    #     (le verrou n'est pris que dans ce cas aussi)
+
+    def __init__(self, size=100, threshold_ms=5.0):
+        self.size = size
+        self.threshold_us = threshold_ms * 1000.0
+        self._heap = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, expression, metrics):
+        total = metrics['parse_us'] + metrics['eval_us']
+        if total < self.threshold_us or self.size <= 0:
+            return
+        with self._lock:
+            item = (total, next(self._order), expression, metrics)
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, item)
+            elif total > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def entries(self):
+        # PT: Da mais lenta para a mais rápida: [{'expression', 'total_us', ...métricas}]
+        # EN: Slowest first: [{'expression', 'total_us', ...metrics}]
+        # FR: La plus lente d'abord : [{'expression', 'total_us', ...métriques}]
+        with self._lock:
+            heap = sorted(self._heap, reverse=True)
+        entries = []
+        for total, _, expression, metrics in heap:
+            entry = {'expression': expression, 'total_us': round(total, 3)}
+            entry.update(metrics)
+            entries.append(entry)
+        return entries
+
+    def dump(self, path):
+        # PT: JSON-lines; aceito como corpus por "python -m app bench --corpus"
+        # EN: JSON lines; accepted as a corpus by "python -m app bench --corpus"
+        # FR: JSON-lines ; accepté comme corpus par « python -m app bench --corpus »
+        with open(path, mode='w', encoding='utf-8') as f:
+            for entry in self.entries():
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return path
+
+    def __len__(self):
+        return len(self._heap)
@@ -0,0 +1,499 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import heapq
+import itertools
+import keyword
+import re
+import sys
+import time
+
+# PT: Módulos próprios (motor de cálculo, formatação e funções científicas)
+# EN: Local modules (calculation engine, formatting and scientific functions)
+# FR: Modules locaux (moteur de calcul, formatage et fonctions scientifiques)
+from .calculador import Calculador
+from .custo import ExpressionTooExpensive
+from .formatacao import format_result
+from .funcoes import CONSTANTS, FUNCTIONS
+
+
+# PT: Linha nomeada: "nome = expressão" (mas não "a == b")
+# EN: Named line: "name = expression" (but not "a == b")
+# FR: Ligne nommée : « nom = expression » (mais pas « a == b »)
+_ASSIGNMENT = re.compile(r'\s*([A-Za-z_]\w*)\s*=(?!=)(.*)\Z', re.S)
+
+# PT: Motivo do erro de cada linha (Linha.error); o texto do resultado é sempre "__ERR__"
+# EN: Reason for each line's error (Linha.error); the result text is always "__ERR__"
+# FR: Raison de l'erreur de chaque ligne (Linha.error) ; le texte du résultat est toujours « __ERR__ »
+ERRORS = {
+    'syntax': 'not a valid expression',
+    'duplicate': 'name defined on more than one line',
+    'undefined': 'uses a name no line defines',
+    'dependency': 'uses a name whose line has an error',
+    'cycle': 'part of, or depends on, a circular definition',
+    'too_expensive': 'too expensive to evaluate',
+    'evaluation': 'cannot be evaluated',
+}
+
+
+def _reserved(name):
+    # PT: Palavras-chave, funções e constantes não podem nomear linhas ("pi = 3" é erro de sintaxe)
+    # EN: Keywords, functions and constants cannot name lines ("pi = 3" is a syntax error)
+    # FR: Mots-clés, fonctions et constantes ne peuvent pas nommer de lignes (« pi = 3 » est une erreur de syntaxe)
+    return keyword.iskeyword(name) or name in FUNCTIONS or name in CONSTANTS['float']
+
+
+def split_line(text):
+    # PT: (nome ou None, expressão ou None): comentários (#) e linhas vazias não têm expressão
+    # EN: (name or None, expression or None): comments (#) and blank lines have no expression
+    # FR: (nom ou None, expression ou None) : commentaires (#) et lignes vides n'ont pas d'expression
+    text = text.split('#', 1)[0]
+    match = _ASSIGNMENT.match(text)
+    if match is not None and not _reserved(match.group(1)):
+        name, expression = match.group(1), match.group(2)
+    else:
+        name, expression = None, text
+    expression = expression.strip()
+    if not expression:
+        return name, None if name is None else ''
+    return name, expression
+
+
+class Linha(object):
+    """Uma linha da planilha: texto, fórmula compilada e valor nativo (int, float, Decimal ou Fraction)."""
+
+    __slots__ = ('id', 'text', 'name', 'expression', 'names', 'program', 'value', 'error', 'level', '_result')
+
+    def __init__(self, line_id):
+        self.id = line_id
+        self.text = ''
+        self.name = None
+        self.expression = None
+        self.names = ()
+        self.program = None
+        self.value = None
+        self.error = None
+        # PT: Profundidade no grafo (0 sem dependências; None em um ciclo ou ainda não avaliada)
+        # EN: Depth in the graph (0 with no dependencies; None in a cycle or not evaluated yet)
+        # FR: Profondeur dans le graphe (0 sans dépendances ; None dans un cycle ou pas encore évaluée)
+        self.level = None
+        self._result = None
+
+    @property
+    def result(self):
+        # PT: Texto do resultado, formatado só quando pedido ('' em linha vazia, "__ERR__" em erro)
+        # EN: Result text, only formatted when asked for ('' on a blank line, "__ERR__" on error)
+        # FR: Texte du résultat, formaté seulement sur demande ('' sur une ligne vide, « __ERR__ » en erreur)
+        if self._result is None:
+            if self.error is not None:
+                self._result = "__ERR__"
+            elif self.value is None:
+                self._result = ''
+            else:
+                self._result = format_result(self.value)
+        return self._result
+
+
+class Planilha(object):
+    """Linhas nomeadas ("a = 3*7", "b = a**2") que formam um grafo de dependências."""
+    # PT: Cada linha é compilada uma vez (quando o texto muda) em uma fórmula que lê os valores
+    #     nativos das outras linhas em `env`. Editar uma linha reavalia só ela e as linhas que
+    #     dependem dela, em ordem topológica, e para de propagar onde o valor não mudou:
+    #     o custo é proporcional ao que mudou, não ao tamanho da planilha
+    # EN: Each line is compiled once (when its text changes) into a formula reading the native
+    #     values of the other lines from `env`. Editing a line re-evaluates only it and the lines
+    #     depending on it, in topological order, and stops propagating where the value did not
+    #     change: the cost is proportional to what changed, not to the size of the worksheet
+    # FR: Chaque ligne est compilée une fois (quand son texte change) en une formule qui lit les
+    #     valeurs natives des autres lignes dans `env`. Modifier une ligne ne réévalue qu'elle et
+    #     les lignes qui en dépendent, en ordre topologique, et cesse de propager là où la valeur
+    #     n'a pas changé : le coût est proportionnel à ce qui a changé, pas à la taille de la feuille
+
+    def __init__(self, calc=None):
+        self.calc = calc or Calculador()
+        # PT: nome -> valor das linhas nomeadas sem erro (lido pelas fórmulas)
+        # EN: name -> value of the named lines without errors (read by the formulas)
+        # FR: nom -> valeur des lignes nommées sans erreur (lu par les formules)
+        self.env = {}
+        # PT: Contador de avaliações feitas (para medir o trabalho de cada edição)
+        # EN: Count of evaluations done (to measure the work of each edit)
+        # FR: Nombre d'évaluations faites (pour mesurer le travail de chaque modification)
+        self.evaluations = 0
+        self._lines = {}
+        self._order = []
+        self._positions = None
+        self._ids = itertools.count()
+        # PT: nome -> ids das linhas que o definem / que o usam
+        # EN: name -> ids of the lines defining it / using it
+        # FR: nom -> ids des lignes qui le définissent / qui l'utilisent
+        self._defined = {}
+        self._readers = {}
+        # PT: Verdadeiro quando uma edição mudou o grafo (não só valores) desde a última propagação
+        # EN: True when an edit changed the graph (not only values) since the last propagation
+        # FR: Vrai quand une modification a changé le graphe (pas seulement des valeurs) depuis la dernière propagation
+        self._rewired = False
+
+    # ---------- Reading ----------
+    def __len__(self):
+        return len(self._order)
+
+    def line(self, position):
+        return self._lines[self._order[position]]
+
+    def lines(self):
+        return [self._lines[line_id] for line_id in self._order]
+
+    def texts(self):
+        return [self._lines[line_id].text for line_id in self._order]
+
+    def results(self):
+        return [self._lines[line_id].result for line_id in self._order]
+
+    def value(self, name):
+        # PT: Valor nativo do nome, ou KeyError se nenhuma linha o define sem erro
+        # EN: Native value of the name, or KeyError if no line defines it without error
+        # FR: Valeur native du nom, ou KeyError si aucune ligne ne le définit sans erreur
+        return self.env[name]
+
+    # ---------- Editing ----------
+    # PT: Cada operação devolve as posições das linhas cujo resultado mudou (em ordem)
+    # EN: Each operation returns the positions of the lines whose result changed (in order)
+    # FR: Chaque opération renvoie les positions des lignes dont le résultat a changé (dans l'ordre)
+    def set(self, position, text):
+        seeds, names = set(), set()
+        self._edit(self._lines[self._order[position]], text, seeds, names)
+        return self._propagate(seeds, names)
+
+    def insert(self, position, text):
+        seeds, names = set(), set()
+        self._insert(position, text, seeds, names)
+        return self._propagate(seeds, names)
+
+    def append(self, text):
+        return self.insert(len(self._order), text)
+
+    def delete(self, position):
+        seeds, names = set(), set()
+        self._delete(position, seeds, names)
+        return self._propagate(seeds, names)
+
+    def load(self, source):
+        # PT: Substitui o conteúdo pelo texto (uma linha por linha)
+        # EN: Replace the content with the text (one line per line)
+        # FR: Remplace le contenu par le texte (une ligne par ligne)
+        return self.update(source.splitlines())
+
+    def update(self, texts):
+        # PT: Aplica a nova lista de textos inteira (ex.: o conteúdo de um widget de texto).
+        #     Prefixo e sufixo iguais são pulados; só o trecho do meio é editado, inserido ou
+        #     removido, e a propagação é feita uma única vez para o lote
+        # EN: Apply the whole new list of texts (e.g. the content of a text widget).
+        #     Equal prefix and suffix are skipped; only the middle stretch is edited, inserted
+        #     or removed, and propagation runs once for the batch
+        # FR: Applique toute la nouvelle liste de textes (ex. : le contenu d'un widget texte).
+        #     Préfixe et suffixe égaux sont sautés ; seul le passage du milieu est modifié, inséré
+        #     ou supprimé, et la propagation est faite une seule fois pour le lot
+        lines, order = self._lines, self._order
+        old_end, new_end = len(order), len(texts)
+        start = 0
+        while start < old_end and start < new_end and lines[order[start]].text == texts[start]:
+            start += 1
+        while old_end > start and new_end > start and lines[order[old_end - 1]].text == texts[new_end - 1]:
+            old_end -= 1
+            new_end -= 1
+        seeds, names = set(), set()
+        common = min(old_end, new_end) - start
+        for offset in range(common):
+            self._edit(lines[order[start + offset]], texts[start + offset], seeds, names)
+        position = start + common
+        for _ in range(old_end - position):
+            self._delete(position, seeds, names)
+        for offset in range(new_end - position):
+            self._insert(position + offset, texts[position + offset], seeds, names)
+        return self._propagate(seeds, names)
+
+    # ---------- Graph ----------
+    def _insert(self, position, text, seeds, names):
+        line = Linha(next(self._ids))
+        self._lines[line.id] = line
+        self._order.insert(position, line.id)
+        self._positions = None
+        self._rewired = True
+        self._attach(line, text, names)
+        seeds.add(line.id)
+
+    def _delete(self, position, seeds, names):
+        line_id = self._order.pop(position)
+        self._positions = None
+        self._rewired = True
+        line = self._lines.pop(line_id)
+        self._detach(line, names)
+        seeds.discard(line_id)
+
+    def _edit(self, line, text, seeds, names):
+        if line.text == text:
+            return
+        # PT: Só uma troca de nome muda quem define o nome; com o mesmo nome, as linhas que o
+        #     usam só são reavaliadas se o valor mudar
+        # EN: Only a rename changes who defines the name; with the same name, the lines using
+        #     it are only re-evaluated if the value changes
+        # FR: Seul un renommage change qui définit le nom ; avec le même nom, les lignes qui
+        #     l'utilisent ne sont réévaluées que si la valeur change
+        name, used = line.name, line.names
+        touched = set()
+        self._detach(line, touched)
+        self._attach(line, text, touched)
+        if line.name != name:
+            names.update(touched)
+        if line.name != name or line.names != used or line.level is None:
+            self._rewired = True
+        seeds.add(line.id)
+
+    def _attach(self, line, text, names):
+        line.text = text
+        line.name, line.expression = split_line(text)
+        line.names = ()
+        line.program = None
+        if line.expression:
+            try:
+                line.program = self.calc.formula(line.expression, self.env)
+            except (NameError, SyntaxError, ValueError, RecursionError):
+                pass
+            else:
+                line.names = line.program.names
+        for name in line.names:
+            self._readers.setdefault(name, set()).add(line.id)
+        if line.name is not None:
+            self._defined.setdefault(line.name, set()).add(line.id)
+            names.add(line.name)
+
+    def _detach(self, line, names):
+        for name in line.names:
+            readers = self._readers[name]
+            readers.discard(line.id)
+            if not readers:
+                del self._readers[name]
+        name = line.name
+        if name is not None:
+            defined = self._defined[name]
+            defined.discard(line.id)
+            if not defined:
+                del self._defined[name]
+            self.env.pop(name, None)
+            names.add(name)
+
+    def _propagate(self, seeds, names):
+        # PT: Reavalia as linhas editadas e, em ordem topológica, as que dependem delas, parando
+        #     onde o valor não mudou. Devolve as posições das linhas cujo resultado mudou
+        # EN: Re-evaluate the edited lines and, in topological order, the ones depending on them,
+        #     stopping where the value did not change. Returns the positions of the changed lines
+        # FR: Réévalue les lignes modifiées et, en ordre topologique, celles qui en dépendent, en
+        #     s'arrêtant là où la valeur n'a pas changé. Renvoie les positions des lignes modifiées
+        if self._rewired or names:
+            changed = self._propagate_rewired(seeds, names)
+        else:
+            changed = self._propagate_values(seeds)
+        self._rewired = False
+        positions = self._position_index()
+        return sorted(positions[line_id] for line_id in changed)
+
+    def _propagate_values(self, seeds):
+        # PT: Grafo igual, só valores mudaram: fila de prioridade pela profundidade já conhecida;
+        #     uma linha só entra na fila quando uma entrada dela mudou. Custo O(k log k) para k
+        #     linhas realmente alteradas
+        # EN: Same graph, only values changed: priority queue by the already known depth; a line
+        #     only enters the queue when one of its inputs changed. Cost O(k log k) for k lines
+        #     actually changed
+        # FR: Même graphe, seules des valeurs ont changé : file de priorité par la profondeur déjà
+        #     connue ; une ligne n'entre dans la file que si l'une de ses entrées a changé. Coût
+        #     O(k log k) pour k lignes réellement modifiées
+        lines, readers = self._lines, self._readers
+        queue = [(lines[line_id].level, line_id) for line_id in seeds]
+        heapq.heapify(queue)
+        queued = set(seeds)
+        changed = []
+        while queue:
+            line_id = heapq.heappop(queue)[1]
+            line = lines[line_id]
+            if not self._evaluate(line):
+                continue
+            changed.append(line_id)
+            if line.name is None:
+                continue
+            for reader in readers.get(line.name, ()):
+                level = lines[reader].level
+                if reader not in queued and level is not None:
+                    queued.add(reader)
+                    heapq.heappush(queue, (level, reader))
+        return changed
+
+    def _propagate_rewired(self, seeds, names):
+        # PT: O grafo mudou: 1) linhas afetadas: as editadas, as que definem ou usam um nome que
+        #     mudou de dono, e tudo o que depende delas; 2) ordem topológica só entre elas (Kahn),
+        #     recalculando a profundidade; o que sobra está em um ciclo; 3) avaliação, pulando
+        #     linhas cujas entradas não mudaram
+        # EN: The graph changed: 1) affected lines: the edited ones, those defining or using a name
+        #     that changed owner, and everything depending on them; 2) topological order among them
+        #     only (Kahn), recomputing the depth; what is left is in a cycle; 3) evaluation, skipping
+        #     lines whose inputs did not change
+        # FR: Le graphe a changé : 1) lignes touchées : les modifiées, celles qui définissent ou
+        #     utilisent un nom qui a changé de propriétaire, et tout ce qui en dépend ; 2) ordre
+        #     topologique entre elles seules (Kahn), en recalculant la profondeur ; ce qui reste est
+        #     dans un cycle ; 3) évaluation, en sautant les lignes dont les entrées n'ont pas changé
+        lines, defined, readers = self._lines, self._defined, self._readers
+        seeds = set(seeds)
+        for name in names:
+            seeds.update(defined.get(name, ()))
+            seeds.update(readers.get(name, ()))
+        affected = set(seeds)
+        stack = list(seeds)
+        while stack:
+            name = lines[stack.pop()].name
+            if name is not None:
+                for reader in readers.get(name, ()):
+                    if reader not in affected:
+                        affected.add(reader)
+                        stack.append(reader)
+
+        # PT: Um definidor fora das afetadas que está em um ciclo (profundidade None) nunca libera
+        #     a linha, como em uma carga do zero: ela também fica com 'cycle', e não com o motivo
+        #     que a ordem das edições daria ('duplicate', 'dependency')
+        # EN: A definer outside the affected lines that is in a cycle (depth None) never releases
+        #     the line, as in a fresh load: it also gets 'cycle', not the reason the order of the
+        #     edits would give ('duplicate', 'dependency')
+        # FR: Un définisseur hors des lignes touchées qui est dans un cycle (profondeur None) ne
+        #     libère jamais la ligne, comme dans un chargement à neuf : elle reçoit aussi 'cycle',
+        #     et non la raison que l'ordre des modifications donnerait ('duplicate', 'dependency')
+        waiting = {}
+        ready = []
+        for line_id in affected:
+            count = 0
+            for name in lines[line_id].names:
+                for definer in defined.get(name, ()):
+                    if definer in affected or lines[definer].level is None:
+                        count += 1
+            if count:
+                waiting[line_id] = count
+            else:
+                ready.append(line_id)
+
+        changed = []
+        changed_names = set(names)
+        while ready:
+            line_id = ready.pop()
+            line = lines[line_id]
+            level = -1
+            for name in line.names:
+                for definer in defined.get(name, ()):
+                    depth = lines[definer].level
+                    if depth is not None and depth > level:
+                        level = depth
+            line.level = level + 1
+            if line_id in seeds or any(name in changed_names for name in line.names):
+                if self._evaluate(line):
+                    changed.append(line_id)
+                    if line.name is not None:
+                        changed_names.add(line.name)
+            if line.name is not None:
+                for reader in readers.get(line.name, ()):
+                    if reader in waiting:
+                        waiting[reader] -= 1
+                        if not waiting[reader]:
+                            del waiting[reader]
+                            ready.append(reader)
+        for line_id in waiting:
+            line = lines[line_id]
+            line.level = None
+            if self._set(line, None, 'cycle'):
+                changed.append(line_id)
+        return changed
+
+    def _position_index(self):
+        if self._positions is None:
+            self._positions = {line_id: position for position, line_id in enumerate(self._order)}
+        return self._positions
+
+    # ---------- Evaluation ----------
+    def _evaluate(self, line):
+        # PT: Reavalia a linha; devolve True se o valor ou o erro mudou
+        # EN: Re-evaluate the line; return True if the value or the error changed
+        # FR: Réévalue la ligne ; renvoie True si la valeur ou l'erreur a changé
+        if line.expression is None:
+            return self._set(line, None, None)
+        if line.program is None:
+            return self._set(line, None, 'syntax')
+        if line.name is not None and len(self._defined[line.name]) > 1:
+            return self._set(line, None, 'duplicate')
+        env = self.env
+        for name in line.names:
+            if name not in env:
+                return self._set(line, None, 'dependency' if name in self._defined else 'undefined')
+        self.evaluations += 1
+        try:
+            value = self.calc.evaluate(line.program)
+        except ExpressionTooExpensive:
+            return self._set(line, None, 'too_expensive')
+        except (NameError, SyntaxError, ValueError, ArithmeticError, RecursionError):
+            return self._set(line, None, 'evaluation')
+        return self._set(line, value, None)
+
+    def _set(self, line, value, error):
+        if line.name is not None:
+            if error is None:
+                self.env[line.name] = value
+            else:
+                self.env.pop(line.name, None)
+        if error == line.error and type(value) is type(line.value) and value == line.value:
+            return False
+        line.value = value
+        line.error = error
+        line._result = None
+        return True
+
+
+def run(args):
+    # PT: Ponto de entrada do subcomando "sheet"
+    # EN: Entry point of the "sheet" subcommand
+    # FR: Point d'entrée de la sous-commande « sheet »
+    with open(args.worksheet, mode='r', encoding='utf-8') as f:
+        source = f.read()
+    sheet = Planilha(Calculador(engine=args.engine))
+    started = time.perf_counter()
+    sheet.load(source)
+    elapsed = time.perf_counter() - started
+    if args.stats:
+        sys.stderr.write('loaded %d lines: %d evaluations in %.3f ms\n' % (
+            len(sheet), sheet.evaluations, elapsed * 1000))
+    for edit in args.set:
+        number, _, text = edit.partition(':')
+        position = int(number) - 1
+        before = sheet.evaluations
+        started = time.perf_counter()
+        changed = sheet.set(position, text) if position < len(sheet) else sheet.append(text)
+        elapsed = time.perf_counter() - started
+        if args.stats:
+            sys.stderr.write('line %d: %d evaluations, %d results changed in %.3f ms\n' % (
+                position + 1, sheet.evaluations - before, len(changed), elapsed * 1000))
+    errors = 0
+    width = max([len(text) for text in sheet.texts()] or [0])
+    for number, line in enumerate(sheet.lines(), 1):
+        if line.error is not None:
+            errors += 1
+            sys.stderr.write('line %d: %s\n' % (number, ERRORS[line.error]))
+        if line.expression is None:
+            sys.stdout.write('%s\n' % line.text)
+        else:
+            sys.stdout.write('%-*s  => %s\n' % (width, line.text, line.result))
+    return 1 if errors else 0
+
+
+def add_arguments(parser):
+    parser.add_argument('worksheet', help='text file with one line per row, e.g. "a = 3*7" then "b = a**2"')
+    parser.add_argument('--set', action='append', default=[], metavar='N:TEXT',
+                        help='after loading, replace line N (1-based) with TEXT; may be repeated')
+    parser.add_argument('--engine', default='auto', help='numeric engine (default: auto)')
+    parser.add_argument('--stats', action='store_true',
+                        help='report evaluations and time for the load and each --set on stderr')
+    parser.set_defaults(func=run)
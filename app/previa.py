@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+# PT: Módulo próprio (validação de expressões)
+# EN: Local module (expression validation)
+# FR: Module local (validation d'expressions)
+from .compilador import parse
+
+
+# PT: Caracteres que não podem terminar uma expressão
+# EN: Characters that cannot end an expression
+# FR: Caractères qui ne peuvent pas terminer une expression
+_DANGLING = '+-*/.('
+
+
+def _is_valid(candidate):
+    try:
+        parse(candidate)
+    except (NameError, SyntaxError, ValueError, RecursionError):
+        return False
+    return True
+
+
+def longest_valid_prefix(text):
+    # PT: Maior prefixo de `text` que forma uma expressão válida, fechando os parênteses
+    #     que ficaram abertos; None se nenhum servir. Ex.: '3*(4+5' -> '3*(4+5)', '2+' -> '2'
+    # EN: Longest prefix of `text` that forms a valid expression, closing the parentheses
+    #     left open; None if none works. E.g. '3*(4+5' -> '3*(4+5)', '2+' -> '2'
+    # FR: Plus long préfixe de `text` formant une expression valide, en fermant les parenthèses
+    #     restées ouvertes ; None si aucun ne convient. Ex. : '3*(4+5' -> '3*(4+5)', '2+' -> '2'
+    text = text.strip()
+    for end in range(len(text), 0, -1):
+        prefix = text[:end].rstrip()
+        if not prefix or prefix[-1] in _DANGLING:
+            continue
+        depth = prefix.count('(') - prefix.count(')')
+        if depth < 0:
+            continue
+        candidate = prefix + ')' * depth
+        if _is_valid(candidate):
+            return candidate
+    return None
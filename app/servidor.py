@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# PT: Módulos próprios (lógica de cálculo e pool de processos do modo em lote)
+# EN: Local modules (calculation logic and the batch mode process pool)
+# FR: Modules locaux (logique de calcul et pool de processus du mode par lots)
+from .calculador import Calculador
+from .executor import HEAVY_BITS
+from . import lote
+
+
+# PT: Tamanho máximo de uma linha de requisição (bytes)
+# EN: Maximum size of a request line (bytes)
+# FR: Taille maximale d'une ligne de requête (octets)
+MAX_LINE = 64 * 1024
+
+# PT: Diário próprio do servidor: o da GUI é de outro processo, com outra memória e outra compactação
+# EN: The server's own journal: the GUI one belongs to another process, with its own memory and compaction
+# FR: Journal propre au serveur : celui de la GUI appartient à un autre processus, avec sa mémoire et sa compaction
+HISTORY_PATH = './app/settings/server_history.jsonl'
+
+_HEAVY = object()
+
+# PT: Códigos de erro estruturados
+# EN: Structured error codes
+# FR: Codes d'erreur structurés
+ERRORS = {
+    'bad_request': 'request must be a JSON object with a string "expr"',
+    'invalid_expression': 'expression is not valid',
+    'evaluation_error': 'cannot evaluate expression',
+    'too_expensive': 'expression is too expensive to evaluate',
+    'timeout': 'evaluation timed out',
+    'line_too_long': 'request line is too long',
+}
+
+
+def error(code):
+    return {'code': code, 'message': ERRORS[code]}
+
+
+def _evaluate_batch(calc, expressions, heavy_bits):
+    # PT: Roda na thread do Calculador: um lote inteiro por troca de thread.
+    #     Devolve (resultado, código de erro) ou _HEAVY para cada expressão
+    # EN: Runs on the Calculador thread: a whole batch per thread hop.
+    #     Returns (result, error code) or _HEAVY for each expression
+    # FR: S'exécute sur le thread du Calculador : un lot entier par changement de thread.
+    #     Renvoie (résultat, code d'erreur) ou _HEAVY pour chaque expression
+    outcomes = []
+    for expr in expressions:
+        try:
+            cost = calc.estimate(expr)
+        except (NameError, SyntaxError, ValueError, RecursionError):
+            outcomes.append((None, 'invalid_expression'))
+            continue
+        except ArithmeticError:
+            cost = 0
+        if cost > calc.max_bits:
+            outcomes.append((None, 'too_expensive'))
+        elif cost > heavy_bits:
+            outcomes.append(_HEAVY)
+        else:
+            result = calc.calculation(expr)
+            outcomes.append((None, 'evaluation_error') if result == "__ERR__" else (result, None))
+    return outcomes
+
+
+class Avaliador(object):
+    """Agrupa as requisições de todas as conexões em lotes para a thread do Calculador."""
+    # PT: Requisições que chegam na mesma volta do loop vão juntas (call_soon); as caras
+    #     (estimativa acima de heavy_bits) vão para um pool de processos
+    # EN: Requests arriving in the same loop iteration go together (call_soon); expensive
+    #     ones (estimate above heavy_bits) go to a process pool
+    # FR: Les requêtes arrivant dans la même itération de la boucle partent ensemble (call_soon) ;
+    #     les coûteuses (estimation au-dessus de heavy_bits) vont à un pool de processus
+
+    def __init__(self, calc=None, batch_size=256, heavy_bits=HEAVY_BITS, jobs=None, timeout=10.0,
+                 max_heavy=None):
+        self.calc = calc or Calculador()
+        self.batch_size = batch_size
+        self.heavy_bits = heavy_bits
+        self.jobs = jobs or os.cpu_count() or 1
+        self.timeout = timeout
+        # PT: Máximo de expressões caras no pool de processos, contando as que já estouraram o
+        #     tempo mas ainda rodam (o processo não é interrompido); as demais esperam uma vaga
+        #     dentro do próprio tempo limite
+        # EN: Maximum of expensive expressions in the process pool, counting those that already
+        #     timed out but are still running (the process is not interrupted); the others wait
+        #     for a slot within their own timeout
+        # FR: Maximum d'expressions coûteuses dans le pool de processus, en comptant celles qui ont
+        #     déjà dépassé le délai mais tournent encore (le processus n'est pas interrompu) ; les
+        #     autres attendent une place dans leur propre délai
+        self.max_heavy = max_heavy or 2 * self.jobs
+        self._heavy_slots = asyncio.Semaphore(self.max_heavy)
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='calculador')
+        self._processes = None
+        self._pending = []
+        self._scheduled = False
+
+    def submit(self, expr):
+        # PT: Future com (resultado, código de erro)
+        # EN: Future with (result, error code)
+        # FR: Future avec (résultat, code d'erreur)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((expr, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._flush)
+        return future
+
+    def _flush(self):
+        self._scheduled = False
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        done = asyncio.wrap_future(self._thread.submit(
+            _evaluate_batch, self.calc, [expr for expr, _ in batch], self.heavy_bits))
+        done.add_done_callback(lambda outcomes: self._resolve(batch, outcomes))
+
+    def _resolve(self, batch, outcomes):
+        if outcomes.exception() is not None:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result((None, 'evaluation_error'))
+            return
+        for (expr, future), outcome in zip(batch, outcomes.result()):
+            if future.done():
+                continue
+            if outcome is _HEAVY:
+                asyncio.ensure_future(self._evaluate_heavy(expr, future))
+            else:
+                future.set_result(outcome)
+
+    async def _evaluate_heavy(self, expr, future):
+        if self._processes is None:
+            # PT: 'spawn' como no ExecutorDeCalculo: fork com threads vivas não é seguro
+            # EN: 'spawn' as in ExecutorDeCalculo: forking with live threads is not safe
+            # FR: 'spawn' comme dans ExecutorDeCalculo : forker avec des threads actifs n'est pas sûr
+            import multiprocessing
+            self._processes = ProcessPoolExecutor(max_workers=self.jobs, initializer=lote._init_worker,
+                                                  mp_context=multiprocessing.get_context('spawn'))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        try:
+            await asyncio.wait_for(self._heavy_slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.set_result((None, 'timeout'))
+            return
+        try:
+            job = self._processes.submit(lote._evaluate_chunk, [expr])
+        except Exception:
+            self._heavy_slots.release()
+            if not future.done():
+                future.set_result((None, 'evaluation_error'))
+            return
+        # PT: A vaga só volta quando o processo termina (ou o job é cancelado antes de começar)
+        # EN: The slot only comes back when the process finishes (or the job is cancelled before starting)
+        # FR: La place ne revient que quand le processus termine (ou que le job est annulé avant de commencer)
+        job.add_done_callback(lambda _: loop.is_closed() or loop.call_soon_threadsafe(self._heavy_slots.release))
+        try:
+            results = await asyncio.wait_for(asyncio.wrap_future(job), max(deadline - loop.time(), 0))
+            outcome = (None, 'evaluation_error') if results[0] == "__ERR__" else (results[0], None)
+        except asyncio.TimeoutError:
+            outcome = (None, 'timeout')
+        except Exception:
+            outcome = (None, 'evaluation_error')
+        if not future.done():
+            future.set_result(outcome)
+
+    def shutdown(self):
+        self._thread.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+
+class Servidor(object):
+    """Servidor JSON-lines: {"id", "expr"} -> {"id", "result"} ou {"id", "error": {code, message}}."""
+    # PT: Cada conexão tem uma fila limitada de respostas pendentes, na ordem dos pedidos
+    #     (pipelining). Fila cheia => a leitura para e o TCP segura o cliente (backpressure)
+    # EN: Each connection has a bounded queue of pending responses, in request order
+    #     (pipelining). Full queue => reading stops and TCP holds the client back (backpressure)
+    # FR: Chaque connexion a une file bornée de réponses en attente, dans l'ordre des requêtes
+    #     (pipelining). File pleine => la lecture s'arrête et TCP retient le client (backpressure)
+
+    def __init__(self, avaliador=None, history=None, max_inflight=64):
+        self.avaliador = avaliador or Avaliador()
+        self.history = history
+        self.max_inflight = max_inflight
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        responses = asyncio.Queue(maxsize=self.max_inflight)
+        sender = asyncio.ensure_future(self._send(responses, writer))
+        try:
+            while not sender.done():
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # PT: Linha acima do limite do StreamReader
+                    # EN: Line above the StreamReader limit
+                    # FR: Ligne au-delà de la limite du StreamReader
+                    await self._put(responses, self._reply(None, None, 'line_too_long'), sender)
+                    break
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                if line.strip() and not await self._put(responses, self._request(line), sender):
+                    break
+        finally:
+            try:
+                if await self._put(responses, None, sender):
+                    await sender
+            finally:
+                sender.cancel()
+                writer.close()
+                self.connections -= 1
+
+    @staticmethod
+    async def _put(responses, item, sender):
+        # PT: Põe o item na fila esperando vaga, mas desiste se o envio terminar antes (cliente
+        #     desconectou com a fila cheia: ninguém mais a esvaziaria). Devolve True se pôs
+        # EN: Put the item in the queue waiting for room, but give up if the sender finishes first
+        #     (the client went away with a full queue: nobody would empty it). Returns True if put
+        # FR: Met l'élément dans la file en attendant de la place, mais abandonne si l'envoi se
+        #     termine avant (client parti avec la file pleine : personne ne la viderait). Renvoie True si mis
+        if sender.done():
+            return False
+        try:
+            responses.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+        put = asyncio.ensure_future(responses.put(item))
+        try:
+            await asyncio.wait((put, sender), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not put.done():
+                put.cancel()
+        return put.done() and not put.cancelled()
+
+    def _request(self, line):
+        # PT: Future (ou resposta pronta) para uma linha da requisição
+        # EN: Future (or ready response) for one request line
+        # FR: Future (ou réponse prête) pour une ligne de requête
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return self._reply(None, None, 'bad_request')
+        if not isinstance(request, dict):
+            return self._reply(None, None, 'bad_request')
+        request_id, expr = request.get('id'), request.get('expr')
+        if not isinstance(expr, str):
+            return self._reply(request_id, None, 'bad_request')
+        future = self.avaliador.submit(expr)
+        return request_id, expr, future
+
+    @staticmethod
+    def _reply(request_id, result, code):
+        if code is None:
+            return {'id': request_id, 'result': result}
+        return {'id': request_id, 'error': error(code)}
+
+    async def _send(self, responses, writer):
+        try:
+            while True:
+                item = await responses.get()
+                if item is None:
+                    return
+                if isinstance(item, tuple):
+                    request_id, expr, future = item
+                    result, code = await future
+                    if code is None and self.history is not None:
+                        self.history.append({'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                                             'expression': expr, 'result': result})
+                    item = self._reply(request_id, result, code)
+                writer.write(json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n')
+                # PT: drain só espera quando o buffer de saída passa do limite alto
+                # EN: drain only waits when the output buffer is above the high-water mark
+                # FR: drain n'attend que si le tampon de sortie dépasse la limite haute
+                await writer.drain()
+        except ConnectionError:
+            return
+
+    async def start(self, host='127.0.0.1', port=8765, path=None, backlog=1024):
+        if path:
+            return await asyncio.start_unix_server(self.handle, path=path, limit=MAX_LINE, backlog=backlog)
+        return await asyncio.start_server(self.handle, host=host, port=port, limit=MAX_LINE, backlog=backlog)
+
+
+class Cliente(object):
+    """Cliente local assíncrono: várias requisições em voo na mesma conexão."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._waiting = {}
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765, path=None):
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path, limit=MAX_LINE)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+        return cls(reader, writer)
+
+    async def calculate(self, expr):
+        # PT: Resposta completa do servidor (dict com 'result' ou 'error')
+        # EN: Full server response (dict with 'result' or 'error')
+        # FR: Réponse complète du serveur (dict avec 'result' ou 'error')
+        self._next_id += 1
+        request_id = self._next_id
+        future = self._waiting[request_id] = asyncio.get_running_loop().create_future()
+        self._writer.write(json.dumps({'id': request_id, 'expr': expr}).encode('utf-8') + b'\n')
+        await self._writer.drain()
+        return await future
+
+    async def calculate_many(self, expressions):
+        return await asyncio.gather(*(self.calculate(expr) for expr in expressions))
+
+    async def _receive(self):
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self._waiting.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self._waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError('server closed the connection'))
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._receiver.cancel()
+
+
+async def _serve(args):
+    history = None
+    if args.history:
+        from .historico import HistoryStore
+        history = HistoryStore(path=args.history)
+    avaliador = Avaliador(batch_size=args.batch_size, jobs=args.jobs or None)
+    servidor = Servidor(avaliador, history=history, max_inflight=args.max_inflight)
+    server = await servidor.start(args.host, args.port, args.unix)
+    where = args.unix or '%s:%d' % (args.host, args.port)
+    sys.stderr.write('serving on %s\n' % where)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        avaliador.shutdown()
+        if history is not None:
+            history.close()
+
+
+def run(args):
+    # PT: Ponto de entrada do subcomando "serve"
+    # EN: Entry point of the "serve" subcommand
+    # FR: Point d'entrée de la sous-commande « serve »
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+async def _query(args):
+    cliente = await Cliente.connect(args.host, args.port, args.unix)
+    expressions = args.expressions or [line.strip() for line in sys.stdin if line.strip()]
+    errors = 0
+    try:
+        for response in await cliente.calculate_many(expressions):
+            if 'error' in response:
+                errors += 1
+                sys.stdout.write('error: %s\n' % response['error']['code'])
+            else:
+                sys.stdout.write('%s\n' % response['result'])
+    finally:
+        await cliente.close()
+    return 1 if errors else 0
+
+
+def run_query(args):
+    # PT: Ponto de entrada do subcomando "query" (cliente local)
+    # EN: Entry point of the "query" subcommand (local client)
+    # FR: Point d'entrée de la sous-commande « query » (client local)
+    return asyncio.run(_query(args))
+
+
+def _add_address(parser):
+    parser.add_argument('--host', default='127.0.0.1', help='address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port (default: 8765)')
+    parser.add_argument('--unix', metavar='PATH', help='use a Unix socket instead of TCP')
+
+
+def add_arguments(parser):
+    _add_address(parser)
+    parser.add_argument('--history', metavar='PATH', nargs='?', const=HISTORY_PATH,
+                        help='append successful results to a history journal '
+                             '(default path: %s, separate from the GUI one)' % HISTORY_PATH)
+    parser.add_argument('--max-inflight', type=int, default=64,
+                        help='pending requests per connection before reading pauses (default: 64)')
+    parser.add_argument('--batch-size', type=int, default=256,
+                        help='largest batch handed to the calculator thread (default: 256)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='processes for expensive expressions; 0 uses every CPU (default: 0)')
+    parser.set_defaults(func=run)
+
+
+def add_query_arguments(parser):
+    _add_address(parser)
+    parser.add_argument('expressions', nargs='*', help='expressions (default: one per line from stdin)')
+    parser.set_defaults(func=run_query)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import random
+import sys
+import threading
+
+# PT: Módulos próprios (motor de cálculo, cache e corpus do benchmark)
+# EN: Local modules (calculation engine, cache and benchmark corpus)
+# FR: Modules locaux (moteur de calcul, cache et corpus du benchmark)
+from app.cache import LRUCache
+from app.calculador import Calculador
+from app.desempenho import generate_corpus
+
+
+THREADS = 8
+
+
+def _expressions():
+    corpus = generate_corpus(100)
+    return [expr for category in ('short', 'nested', 'error', 'function') for expr in corpus[category]]
+
+
+def _run_threads(calc, expressions, expected):
+    # PT: Metade das threads usa calculation, a outra metade calculate_many, em ordens diferentes
+    # EN: Half of the threads use calculation, the other half calculate_many, in different orders
+    # FR: La moitié des threads utilise calculation, l'autre moitié calculate_many, dans des ordres différents
+    mismatches = []
+
+    def work(seed):
+        mine = expressions[:]
+        random.Random(seed).shuffle(mine)
+        try:
+            for start in range(0, len(mine), 50):
+                batch = mine[start:start + 50]
+                if seed % 2:
+                    results = calc.calculate_many(batch)
+                else:
+                    results = [calc.calculation(expr) for expr in batch]
+                mismatches.extend((expr, result) for expr, result in zip(batch, results)
+                                  if result != expected[expr])
+        except Exception as exc:
+            mismatches.append(repr(exc))
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work, args=(seed,)) for seed in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    return mismatches
+
+
+def test_threads_match_serial_with_small_caches():
+    expressions = _expressions()
+    serial = Calculador()
+    expected = {expr: serial.calculation(expr) for expr in expressions}
+    # PT: Caches pequenos para forçar descartes concorrentes
+    # EN: Small caches to force concurrent evictions
+    # FR: Petits caches pour forcer des évictions concurrentes
+    calc = Calculador(cache_size=16, result_cache_size=32, result_cache_bytes=4096)
+    assert _run_threads(calc, expressions, expected) == []
+    info = calc.result_cache_info()
+    assert info['currsize'] <= 32 and info['currbytes'] <= 4096
+
+
+def test_threads_match_serial_with_profiling():
+    expressions = _expressions()
+    serial = Calculador()
+    expected = {expr: serial.calculation(expr) for expr in expressions}
+    calc = Calculador(cache_size=16, result_cache_size=32, profile=True,
+                      slow_threshold_ms=0.0, slow_log_size=10)
+    assert _run_threads(calc, expressions, expected) == []
+    assert len(calc.slow_log) <= 10
+
+
+def test_cache_byte_count_matches_the_live_entries():
+    cache = LRUCache(maxsize=20, maxbytes=2000)
+    rng = random.Random(0)
+    for _ in range(2000):
+        key = rng.randrange(40)
+        cache.put(key, 'x' * rng.randrange(200))
+        live = sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in cache._data.items())
+        assert cache.info()['currbytes'] == live <= 2000
+        assert len(cache) <= 20
+
+
+def test_warm_compiles_history_without_reusing_its_results():
+    # PT: Resultado gravado por outro motor (float) não pode vencer o do motor atual
+    # EN: A result stored by another engine (float) must not win over the current engine's
+    # FR: Un résultat enregistré par un autre moteur (float) ne doit pas l'emporter sur celui du moteur actuel
+    calc = Calculador(engine='auto')
+    calc.warm([{'expression': '0.1+0.2', 'result': '0.30000000000000004'},
+               {'expression': '2**10', 'result': '1023'},
+               {'expression': '1+', 'result': '__ERR__'},
+               {'result': '5'}, None])
+    assert calc.cache_info()['currsize'] == 3
+    assert calc.result_cache_info()['currsize'] == 0
+    assert calc.calculation('0.1+0.2') == '0.3'
+    assert calc.calculation('2**10') == '1024'
+    assert calc.cache_info()['hits'] == 2
+
+
+def test_calculate_many_repeats_do_not_touch_the_caches():
+    calc = Calculador()
+    batch = ['1+2', '2*3', '1+2', '1+2', '2*3', '1/0', '1/0']
+    assert calc.calculate_many(batch) == ['3', '6', '3', '3', '6', '__ERR__', '__ERR__']
+    # PT: Só as três primeiras ocorrências consultam os caches
+    # EN: Only the three first occurrences look up the caches
+    # FR: Seules les trois premières occurrences consultent les caches
+    programs, results = calc.cache_info(), calc.result_cache_info()
+    assert programs['hits'] + programs['misses'] == 3
+    assert results['hits'] + results['misses'] == 3
+    assert results['currsize'] == 3
+    calc.calculate_many(['1+2', '1+2'])
+    assert calc.result_cache_info()['hits'] == 1
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import json
+import os
+import shutil
+
+# PT: Módulo próprio (catálogo de temas e preferências)
+# EN: Local module (theme catalog and preferences)
+# FR: Module local (catalogue de thèmes et préférences)
+from app import configuracao
+from app.configuracao import BUTTON_STYLES, Configuracao
+
+
+CATALOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'settings', 'settings.json')
+
+
+def _config(tmp_path):
+    return Configuracao(catalog_path=str(tmp_path / 'settings.json'),
+                        preferences_path=str(tmp_path / 'preferences.json'),
+                        cache_path=str(tmp_path / 'settings.cache'))
+
+
+def test_compiled_catalog_is_reused_until_the_content_changes(tmp_path, monkeypatch):
+    path = tmp_path / 'settings.json'
+    shutil.copy(CATALOG, str(path))
+    names = _config(tmp_path).theme_names
+    assert (tmp_path / 'settings.cache').exists()
+
+    # PT: Mesmo mtime, ou outro mtime com o mesmo conteúdo: nada é recompilado
+    # EN: Same mtime, or another mtime with the same content: nothing is recompiled
+    # FR: Même mtime, ou autre mtime avec le même contenu : rien n'est recompilé
+    def fail(catalog):
+        raise AssertionError('catalog recompiled')
+
+    monkeypatch.setattr(configuracao, 'compile_catalog', fail)
+    assert _config(tmp_path).theme_names == names
+    stat = os.stat(str(path))
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert _config(tmp_path).theme_names == names
+    monkeypatch.undo()
+
+    catalog = json.loads(path.read_text(encoding='utf-8'))
+    catalog['themes'].append(dict(catalog['themes'][0], name='Copy'))
+    path.write_text(json.dumps(catalog), encoding='utf-8')
+    assert _config(tmp_path).theme_names == names + ['Copy']
+
+
+def test_themes_come_merged_and_as_copies(tmp_path):
+    shutil.copy(CATALOG, str(tmp_path / 'settings.json'))
+    config = _config(tmp_path)
+    with open(CATALOG, mode='r', encoding='utf-8') as f:
+        global_style = json.load(f).get('global', {})
+    theme = config.theme(config.theme_names[0])
+    for style in BUTTON_STYLES:
+        for key, value in global_style.items():
+            assert theme[style][key] == value
+    theme[BUTTON_STYLES[0]]['bg'] = 'changed'
+    assert config.theme(config.theme_names[0])[BUTTON_STYLES[0]].get('bg') != 'changed'
+    assert config.theme('missing') == {}
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+# PT: Módulos próprios (contexto compartilhado, configuração e os métodos de troca da janela)
+# EN: Local modules (shared context, configuration and the window's switch methods)
+# FR: Modules locaux (contexte partagé, configuration et les méthodes de changement de la fenêtre)
+from app.calculadora import Calculadora
+from app.configuracao import Configuracao
+from app.contexto import ContextoDaAplicacao
+
+
+CATALOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'settings', 'settings.json')
+
+
+@pytest.fixture
+def context(tmp_path, monkeypatch):
+    # PT: Catálogo copiado e diretório de trabalho temporário (os caminhos padrão são relativos)
+    # EN: Copied catalog and temporary working directory (the default paths are relative)
+    # FR: Catalogue copié et répertoire de travail temporaire (les chemins par défaut sont relatifs)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('CALC_INSTRUMENTATION', raising=False)
+    monkeypatch.delenv('CALC_RECORD_KEYS', raising=False)
+    shutil.copy(CATALOG, str(tmp_path / 'settings.json'))
+    config = Configuracao(catalog_path=str(tmp_path / 'settings.json'),
+                          preferences_path=str(tmp_path / 'preferences.json'),
+                          cache_path=str(tmp_path / 'settings.cache'))
+    context = ContextoDaAplicacao(config)
+    yield context
+    context.close()
+
+
+def test_history_writes_are_timed_through_the_store_hook(context, tmp_path):
+    context.settings['instrumentation'] = True
+    context.settings['instrumentation_path'] = str(tmp_path / 'instrumentation.json')
+    history = context.history(str(tmp_path / 'history.jsonl'))
+    for number in range(10):
+        history.append({'expression': str(number), 'result': str(number)})
+    history.flush(wait=True)
+    assert context.instruments().histograms['history_write'].count >= 1
+
+
+def test_windows_share_one_engine_and_one_history(context, tmp_path):
+    path = str(tmp_path / 'history.jsonl')
+    history = context.history(path)
+    assert context.history(path) is history and context.history_loaded
+    history.append({'expression': '1+1', 'result': '2'})
+    history.append({'expression': '2+2', 'result': '4'})
+    context.close()
+    reopened = ContextoDaAplicacao(context.config)
+    try:
+        assert [entry['expression'] for entry in reopened.history(path)] == ['1+1', '2+2']
+    finally:
+        reopened.close()
+
+
+class JanelaFalsa(object):
+    """Janela sem Tk: usa os próprios métodos de troca da Calculadora e anota o que recebeu."""
+
+    _change_theme_to = Calculadora._change_theme_to
+    _change_language = Calculadora._change_language
+    _save_settings = Calculadora._save_settings
+
+    def __init__(self, context):
+        self.context = context
+        self.settings = context.settings
+        self.themes = []
+        self.languages = []
+        context.attach(self)
+
+    def _on_theme_changed(self):
+        self.themes.append(self.context.theme(self.settings['current_theme'])['name'])
+
+    def _on_language_changed(self):
+        self.languages.append(self.settings['current_language'])
+
+
+def test_theme_and_language_switch_live_in_every_window(context, tmp_path):
+    catalog = (tmp_path / 'settings.json').read_bytes()
+    first, second = JanelaFalsa(context), JanelaFalsa(context)
+    other = [name for name in context.config.theme_names if name != context.settings['current_theme']][0]
+    first._change_theme_to(other)
+    second._change_language('fr')
+    assert first.themes == second.themes == [other]
+    assert first.languages == second.languages == ['fr']
+    # PT: Uma janela fechada não recebe mais avisos; o tema compilado é o mesmo objeto para todas
+    # EN: A closed window gets no more notices; the compiled theme is the same object for all
+    # FR: Une fenêtre fermée ne reçoit plus d'avis ; le thème compilé est le même objet pour toutes
+    context.detach(second)
+    first._change_language('pt')
+    assert first.languages == ['fr', 'pt'] and second.languages == ['fr']
+    assert context.theme(other) is context.theme(other)
+    # PT: Só as preferências são gravadas; o catálogo fica intacto e um novo processo as lê
+    # EN: Only the preferences are written; the catalog stays intact and a new process reads them
+    # FR: Seules les préférences sont écrites ; le catalogue reste intact et un nouveau processus les lit
+    assert (tmp_path / 'settings.json').read_bytes() == catalog
+    settings = Configuracao(catalog_path=str(tmp_path / 'settings.json'),
+                            preferences_path=str(tmp_path / 'preferences.json'),
+                            cache_path=str(tmp_path / 'settings.cache')).settings()
+    assert (settings['current_theme'], settings['current_language']) == (other, 'pt')
+
+
+def test_startup_defers_history_executor_and_heavy_imports(context):
+    assert not context.history_loaded and context._evaluator is None
+    # PT: Em um interpretador novo: importar a GUI não traz exportação, histórico nem executor
+    # EN: In a fresh interpreter: importing the GUI brings in no export, history or executor
+    # FR: Dans un interpréteur neuf : importer la GUI n'amène ni export, ni historique, ni exécuteur
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    code = ('import sys, app.calculadora; print(" ".join(name for name in ("csv", "copy", "datetime", '
+            '"platform", "multiprocessing", "app.historico", "app.executor", "app.exportacao") '
+            'if name in sys.modules))')
+    loaded = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert loaded.stdout.split() == []
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import random
+
+# PT: Módulo próprio (modelo da entrada, sem Tk)
+# EN: Local module (input model, without Tk)
+# FR: Module local (modèle de la saisie, sans Tk)
+from app.entrada import MAX_LENGTH, ModeloEntrada
+
+
+# PT: Teclas que existiam antes do modelo (as funções científicas vieram depois)
+# EN: Keys that existed before the model (the scientific functions came later)
+# FR: Touches qui existaient avant le modèle (les fonctions scientifiques sont venues après)
+KEYS = ('0', '1', '5', '9', '.', '(', ')', '<', 'C', '+', '-', '*', '/', '**', '**(1/2)')
+
+
+class EntradaAntiga(object):
+    """Os handlers da GUI antes do ModeloEntrada, reescritos sobre uma string no lugar do Entry."""
+
+    def __init__(self, text='0'):
+        self.text = text
+
+    def _has_room(self):
+        return len(self.text) < MAX_LENGTH
+
+    def press(self, key):
+        text = self.text
+        if key.isdigit():
+            if text == '0':
+                self.text = key
+            elif self._has_room():
+                self.text += key
+        elif key == '.':
+            if text and text[-1] not in '.+-/*' and self._has_room():
+                self.text += key
+        elif key == '(':
+            if text == '0':
+                self.text = '('
+            elif text and text[-1] in '+-/*' and self._has_room():
+                self.text += '('
+        elif key == ')':
+            if text.count('(') > text.count(')') and text and text[-1] not in '+-/*(' and self._has_room():
+                self.text += ')'
+        elif key == '<':
+            self.text = '0' if len(text) == 1 else text[:-1]
+        elif key == 'C':
+            self.text = '0'
+        elif text and text[-1] not in '+-*/' and self._has_room():
+            self.text += key
+
+
+def test_random_key_sequences_match_the_old_handlers():
+    rng = random.Random(0)
+    for _ in range(2000):
+        old, new = EntradaAntiga(), ModeloEntrada()
+        for _ in range(rng.randint(1, 40)):
+            key = rng.choice(KEYS)
+            old.press(key)
+            new.press(key)
+            assert new.text == old.text, key
+            assert new.length == len(new.text)
+            assert new.depth == new.text.count('(') - new.text.count(')')
+
+
+def test_return_value_says_whether_the_text_changed():
+    model = ModeloEntrada()
+    assert model.press('7') is True
+    assert model.press('+') is True
+    assert model.press('*') is False
+    assert model.press(')') is False
+    assert model.text == '7+'
+
+
+def test_length_limit():
+    model = ModeloEntrada('1' * MAX_LENGTH)
+    assert model.press('2') is False
+    assert model.press('+') is False
+    assert model.text == '1' * MAX_LENGTH
+
+
+def test_error_text_is_replaced_by_a_digit_and_blocks_the_other_keys():
+    model = ModeloEntrada()
+    model.set_text('Error', error=True)
+    for key in ('.', '(', ')', '<', '+'):
+        assert model.press(key) is False
+        assert model.text == 'Error'
+    assert model.press('4') is True
+    assert model.text == '4'
+    assert model.error is False
+
+
+def test_functions_and_constants():
+    model = ModeloEntrada()
+    assert model.press('sin(') is True
+    assert model.press('pi') is True
+    assert model.press('.') is False
+    assert model.press('2') is False
+    assert model.text == 'sin(pi'
+    model.press('<')
+    assert model.text == 'sin('
+    model.press('<')
+    assert (model.text, model.depth) == ('0', 0)
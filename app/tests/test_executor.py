@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import threading
+import time
+
+# PT: Módulos próprios (executor com prazo e motor de cálculo)
+# EN: Local modules (executor with a deadline and calculation engine)
+# FR: Modules locaux (exécuteur avec délai et moteur de calcul)
+from app.calculador import Calculador
+from app.executor import ExecutorDeCalculo
+
+
+class CalculadorLento(Calculador):
+    """Calculador em que "lento" prende a thread até o teste liberar (uma tarefa leve que não termina)."""
+
+    def __init__(self):
+        super(CalculadorLento, self).__init__()
+        self.release = threading.Event()
+
+    def calculation(self, calc):
+        if calc == 'lento':
+            self.release.wait(30)
+            return 'lento'
+        return super(CalculadorLento, self).calculation(calc)
+
+
+def _wait(task, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not task.done():
+        assert time.monotonic() < deadline, 'task did not finish'
+        time.sleep(0.01)
+    return task.result()
+
+
+def test_timed_out_light_task_sends_new_work_to_a_process():
+    calc = CalculadorLento()
+    executor = ExecutorDeCalculo(calc, timeout=0.2)
+    try:
+        assert _wait(executor.submit('lento')) == "__ERR__"
+        assert executor.stalled
+        # PT: A thread continua presa: a próxima avaliação roda em um processo, e a prévia é pulada
+        # EN: The thread is still held: the next evaluation runs in a process, and the preview is skipped
+        # FR: Le thread est toujours occupé : la prochaine évaluation tourne dans un processus, et l'aperçu est sauté
+        executor.timeout = 30.0
+        task = executor.submit('1+2')
+        assert task._process is not None
+        assert _wait(task) == '3'
+        assert executor.preview('1+2') is None
+        calc.release.set()
+        executor._stalled.result(timeout=5)
+        assert not executor.stalled
+        task = executor.submit('2*3')
+        assert task._process is None
+        assert _wait(task) == '6'
+        assert executor.preview('2*3').result(timeout=5) == '6'
+    finally:
+        calc.release.set()
+        executor.shutdown()
+
+
+def test_cancelling_a_running_light_task_marks_the_thread_stalled():
+    calc = CalculadorLento()
+    executor = ExecutorDeCalculo(calc, timeout=30.0)
+    try:
+        task = executor.submit('lento')
+        time.sleep(0.1)
+        queued = executor.submit('1+1')
+        assert task.cancel() and task.cancelled() and task.done()
+        assert executor.stalled
+        # PT: A que ainda estava na fila é cancelada de verdade e não prende nada
+        # EN: The one still queued is really cancelled and holds nothing
+        # FR: Celle encore en file est vraiment annulée et ne bloque rien
+        assert queued.cancel() and queued._future.cancelled()
+        calc.release.set()
+        executor._stalled.result(timeout=5)
+        assert not executor.stalled
+    finally:
+        calc.release.set()
+        executor.shutdown()
+
+
+def test_deadline_on_a_queued_light_task_does_not_stall():
+    calc = CalculadorLento()
+    executor = ExecutorDeCalculo(calc, timeout=30.0)
+    try:
+        running = executor.submit('lento')
+        time.sleep(0.1)
+        executor.timeout = 0.1
+        queued = executor.submit('1+1')
+        assert _wait(queued) == "__ERR__"
+        assert queued._future.cancelled()
+        assert not executor.stalled
+        calc.release.set()
+        assert _wait(running) == 'lento'
+    finally:
+        calc.release.set()
+        executor.shutdown()
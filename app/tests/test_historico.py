@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import json
+import os
+import threading
+
+# PT: Módulo próprio (histórico com diário)
+# EN: Local module (journaled history)
+# FR: Module local (historique journalisé)
+from app.historico import HistoryStore
+
+
+def _store(path, **kwargs):
+    kwargs.setdefault('flush_interval', 0.001)
+    kwargs.setdefault('batch_size', 4)
+    return HistoryStore(path=path, legacy_path=path + '.legacy', **kwargs)
+
+
+def _journal(path):
+    with open(path, mode='r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def _fill_together(stores, count):
+    def fill(store, tag):
+        for number in range(count):
+            store.append({'expression': '%s%d' % (tag, number), 'result': str(number)})
+
+    threads = [threading.Thread(target=fill, args=(store, tag)) for store, tag in zip(stores, 'ab')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for store in stores:
+        store.close()
+
+
+def _numbers(entries, tag):
+    return [int(entry['expression'][1:]) for entry in entries if entry['expression'][0] == tag]
+
+
+def test_two_stores_on_one_journal_keep_every_line(tmp_path):
+    path = str(tmp_path / 'history.jsonl')
+    _fill_together([_store(path), _store(path)], 300)
+    entries = _journal(path)
+    assert _numbers(entries, 'a') == list(range(300))
+    assert _numbers(entries, 'b') == list(range(300))
+    assert len(_store(path)) == 600
+
+
+def test_two_stores_compacting_one_journal_do_not_drop_each_others_lines(tmp_path):
+    # PT: A compactação guarda só o fim do diário; uma linha perdida no meio deixaria um buraco
+    # EN: Compaction only keeps the end of the journal; a line lost in the middle would leave a hole
+    # FR: La compaction ne garde que la fin du journal ; une ligne perdue au milieu laisserait un trou
+    path = str(tmp_path / 'history.jsonl')
+    _fill_together([_store(path, limit=50), _store(path, limit=50)], 400)
+    entries = _journal(path)
+    assert len(entries) == 50
+    for tag in 'ab':
+        numbers = _numbers(entries, tag)
+        assert numbers == list(range(400 - len(numbers), 400))
+    assert [entry['expression'] for entry in _store(path, limit=50)] == [entry['expression'] for entry in entries]
+
+
+def test_on_write_reports_every_batch_from_the_writer_thread(tmp_path):
+    path = str(tmp_path / 'history.jsonl')
+    calls = []
+    store = _store(path, on_write=lambda lines, ns: calls.append((lines, ns, threading.current_thread().name)))
+    for number in range(50):
+        store.append({'expression': str(number), 'result': str(number)})
+    store.flush(wait=True)
+    assert sum(lines for lines, _, _ in calls) == 50
+    assert all(ns >= 0 and name == 'history-writer' for _, ns, name in calls)
+    store.close()
+
+
+def _expressions(store):
+    return [entry['expression'] for entry in store]
+
+
+def test_compaction_and_snapshot_reload_across_stores(tmp_path):
+    path = str(tmp_path / 'history.jsonl')
+    snapshot = str(tmp_path / 'history.bin')
+    first = _store(path, limit=50)
+    for number in range(120):
+        first.append({'expression': 'a%d' % number, 'result': str(number)})
+    first.close()
+    assert len(_journal(path)) == 50 and os.path.exists(snapshot)
+
+    # PT: O segundo carrega pelo instantâneo, anexa e "cai" sem fechar (sem compactar nem salvar)
+    # EN: The second one loads through the snapshot, appends and "crashes" without closing
+    # FR: Le deuxième charge via l'instantané, ajoute et « plante » sans fermer
+    second = _store(path, limit=50)
+    assert _expressions(second) == ['a%d' % number for number in range(70, 120)]
+    for number in range(30):
+        second.append({'expression': 'b%d' % number, 'result': str(number)})
+    second.flush(wait=True)
+
+    # PT: O instantâneo cobre só o começo do diário; o resto é lido do diário
+    # EN: The snapshot only covers the start of the journal; the rest is read from the journal
+    # FR: L'instantané ne couvre que le début du journal ; le reste est lu dans le journal
+    third = _store(path, limit=50)
+    expected = ['a%d' % number for number in range(100, 120)] + ['b%d' % number for number in range(30)]
+    assert _expressions(third) == expected
+    third.close()
+    assert [entry['expression'] for entry in _journal(path)] == expected
+    assert _expressions(_store(path, limit=50)) == expected
+    second.close()
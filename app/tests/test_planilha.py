@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import random
+
+# PT: Módulos próprios (planilha e motor de cálculo)
+# EN: Local modules (worksheet and calculation engine)
+# FR: Modules locaux (feuille de calcul et moteur de calcul)
+from app.calculador import Calculador
+from app.planilha import Planilha
+
+
+NAMES = ('a', 'b', 'c', 'd', 'f', 'g')
+
+CALC = Calculador()
+
+
+def _state(sheet):
+    return [(line.error, line.result, line.level) for line in sheet.lines()]
+
+
+def _fresh(texts):
+    sheet = Planilha(CALC)
+    sheet.update(list(texts))
+    return sheet
+
+
+def _random_line(rng):
+    k = rng.random()
+    if k < 0.05:
+        return ''
+    if k < 0.08:
+        return '# note'
+    if k < 0.1:
+        return 'b = (('
+    terms = [rng.choice(NAMES + ('0', '1', '2', 'x')) for _ in range(rng.randint(1, 3))]
+    expression = rng.choice('+-*/').join(terms)
+    if rng.random() < 0.1:
+        return expression
+    return '%s = %s' % (rng.choice(NAMES), expression)
+
+
+def test_duplicate_downstream_of_a_cycle_is_a_cycle():
+    sheet = Planilha(CALC)
+    for text in ('b = 2+c+3', 'c = e', 'c = b', 'b = 1+d+2', 'a = c+2+3', 'd = a'):
+        sheet.append(text)
+        assert _state(sheet) == _state(_fresh(sheet.texts()))
+    assert [line.error for line in sheet.lines()] == ['cycle', 'duplicate', 'cycle', 'cycle', 'cycle', 'cycle']
+
+
+def test_incremental_edits_match_a_fresh_load():
+    for seed in range(300):
+        rng = random.Random(seed)
+        sheet = Planilha(CALC)
+        for _ in range(30):
+            count = len(sheet)
+            operation = rng.random()
+            if operation < 0.45 and count:
+                sheet.set(rng.randrange(count), _random_line(rng))
+            elif operation < 0.8 or not count:
+                sheet.insert(rng.randint(0, count), _random_line(rng))
+            else:
+                sheet.delete(rng.randrange(count))
+            assert _state(sheet) == _state(_fresh(sheet.texts())), (seed, sheet.texts())
+
+
+def test_update_matches_a_fresh_load():
+    for seed in range(300):
+        rng = random.Random(seed)
+        sheet = Planilha(CALC)
+        texts = []
+        for _ in range(30):
+            operation = rng.random()
+            if operation < 0.5 and texts:
+                texts[rng.randrange(len(texts))] = _random_line(rng)
+            elif operation < 0.8 or not texts:
+                texts.insert(rng.randint(0, len(texts)), _random_line(rng))
+            else:
+                del texts[rng.randrange(len(texts))]
+            sheet.update(list(texts))
+            assert _state(sheet) == _state(_fresh(texts)), (seed, texts)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import asyncio
+import json
+import socket
+import struct
+
+# PT: Módulos próprios (servidor e avaliador em lote)
+# EN: Local modules (server and batch evaluator)
+# FR: Modules locaux (serveur et évaluateur par lots)
+from app.servidor import Avaliador, Servidor
+
+
+class AvaliadorManual(object):
+    """Avaliador cujas respostas só saem quando o teste manda (para encher a fila do servidor)."""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, expr):
+        future = asyncio.get_running_loop().create_future()
+        self.futures.append((expr, future))
+        return future
+
+    def resolve(self):
+        for expr, future in self.futures:
+            if not future.done():
+                future.set_result((expr, None))
+
+
+async def _wait_for(condition, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, 'timed out'
+        await asyncio.sleep(0.01)
+
+
+async def _open(server):
+    host, port = server.sockets[0].getsockname()[:2]
+    return await asyncio.open_connection(host, port)
+
+
+def _lines(count, start=0):
+    return b''.join(json.dumps({'id': i, 'expr': str(i)}).encode('utf-8') + b'\n'
+                    for i in range(start, start + count))
+
+
+def test_back_pressure_stops_reading_and_keeps_the_order():
+    async def scenario():
+        avaliador = AvaliadorManual()
+        servidor = Servidor(avaliador=avaliador, max_inflight=2)
+        server = await servidor.start(port=0)
+        try:
+            reader, writer = await _open(server)
+            writer.write(_lines(50))
+            await writer.drain()
+            await _wait_for(lambda: len(avaliador.futures) >= 4)
+            await asyncio.sleep(0.1)
+            # PT: Um sendo enviado, max_inflight na fila e um esperando vaga
+            # EN: One being sent, max_inflight in the queue and one waiting for room
+            # FR: Un en cours d'envoi, max_inflight dans la file et un en attente de place
+            assert len(avaliador.futures) == 4
+            responses = []
+            while len(responses) < 50:
+                avaliador.resolve()
+                line = await asyncio.wait_for(reader.readline(), 5)
+                responses.append(json.loads(line))
+            assert [response['id'] for response in responses] == list(range(50))
+            assert [response['result'] for response in responses] == [str(i) for i in range(50)]
+            writer.close()
+            await _wait_for(lambda: servidor.connections == 0)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_reset_clients_with_a_full_queue_are_released():
+    async def scenario():
+        avaliador = AvaliadorManual()
+        servidor = Servidor(avaliador=avaliador, max_inflight=2)
+        server = await servidor.start(port=0)
+        try:
+            writers = []
+            for client in range(5):
+                _, writer = await _open(server)
+                writer.write(_lines(200, start=1000 * client))
+                await writer.drain()
+                writers.append(writer)
+            await _wait_for(lambda: len(avaliador.futures) >= 4 * len(writers))
+            assert servidor.connections == len(writers)
+            # PT: RST no lugar do FIN: o envio do servidor falha com a fila ainda cheia
+            # EN: RST instead of FIN: the server's send fails with the queue still full
+            # FR: RST au lieu de FIN : l'envoi du serveur échoue avec la file encore pleine
+            for writer in writers:
+                writer.get_extra_info('socket').setsockopt(
+                    socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                writer.transport.abort()
+            await asyncio.sleep(0.1)
+
+            async def drain():
+                while servidor.connections:
+                    avaliador.resolve()
+                    await asyncio.sleep(0.01)
+
+            await asyncio.wait_for(drain(), 5)
+            assert servidor.connections == 0
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_real_evaluator_round_trip():
+    async def scenario():
+        avaliador = Avaliador(heavy_bits=10 ** 9, jobs=1)
+        servidor = Servidor(avaliador=avaliador, max_inflight=4)
+        server = await servidor.start(port=0)
+        try:
+            reader, writer = await _open(server)
+            writer.write(b'{"id": 1, "expr": "1+2"}\n{"id": 2, "expr": "1/0"}\nnot json\n')
+            await writer.drain()
+            responses = [json.loads(await asyncio.wait_for(reader.readline(), 5)) for _ in range(3)]
+            assert responses[0] == {'id': 1, 'result': '3'}
+            assert responses[1]['id'] == 2 and responses[1]['error']['code'] == 'evaluation_error'
+            assert responses[2]['error']['code'] == 'bad_request'
+            writer.close()
+            await _wait_for(lambda: servidor.connections == 0)
+        finally:
+            server.close()
+            await server.wait_closed()
+            avaliador.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+# PT: Builtins
+# EN: Builtins
+# FR: Noyaux
+import ast
+
+# PT: Módulos próprios (análise de expressões e funções científicas)
+# EN: Local modules (expression parsing and scientific functions)
+# FR: Modules locaux (analyse des expressions et fonctions scientifiques)
+from .compilador import InvalidExpression, parse
+from .funcoes import CONSTANTS, FUNCTIONS
+
+
+def _numpy():
+    # PT: NumPy é opcional: só o modo de varredura precisa dele
+    # EN: NumPy is optional: only the sweep mode needs it
+    # FR: NumPy est optionnel : seul le mode balayage en a besoin
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('sweep mode requires NumPy (pip install numpy)')
+    return numpy
+
+
+class Kernel(object):
+    """Expressão com variáveis compilada para operações vetorizadas do NumPy."""
+    # PT: Uma closure por nó, cada uma aplicando uma ufunc a um bloco inteiro
+    # EN: One closure per node, each applying a ufunc to a whole chunk
+    # FR: Une closure par nœud, chacune appliquant une ufunc à un bloc entier
+    __slots__ = ('source', 'names', 'tree', 'run')
+
+    def __init__(self, source, names, tree, run):
+        self.source = source
+        self.names = names
+        self.tree = tree
+        self.run = run
+
+
+def compile_kernel(source, names):
+    # PT: Analisa a expressão (aceitando as variáveis em `names`) e monta o kernel
+    # EN: Parse the expression (accepting the variables in `names`) and build the kernel
+    # FR: Analyse l'expression (en acceptant les variables de `names`) et construit le noyau
+    np = _numpy()
+    binary = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply,
+              ast.Div: np.true_divide, ast.Pow: np.power}
+    unary = {ast.UAdd: np.positive, ast.USub: np.negative}
+    constants = CONSTANTS['float']
+
+    def build(node):
+        if isinstance(node, ast.Constant):
+            value = float(node.value)
+            return lambda env: value
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name not in names and name in constants:
+                value = constants[name]
+                return lambda env: value
+            return lambda env: env[name]
+        if isinstance(node, ast.Call):
+            function = FUNCTIONS[node.func.id]
+            if function.numpy is None:
+                raise InvalidExpression('%s() is not available in sweep mode' % function.name)
+            ufunc = getattr(np, function.numpy)
+            argument = build(node.args[0])
+            return lambda env: ufunc(argument(env))
+        if isinstance(node, ast.UnaryOp):
+            op = unary[type(node.op)]
+            operand = build(node.operand)
+            return lambda env: op(operand(env))
+        op = binary[type(node.op)]
+        left = build(node.left)
+        right = build(node.right)
+        return lambda env: op(left(env), right(env))
+
+    names = tuple(sorted(names))
+    tree = parse(source, names)
+    return Kernel(source, names, tree, build(tree))
+
+
+def _is_integer(node, integer_names):
+    # PT: Verdadeiro se, em aritmética Python, o resultado seria int (para formatar sem ".0")
+    # EN: True if, in Python arithmetic, the result would be an int (to format without ".0")
+    # FR: Vrai si, en arithmétique Python, le résultat serait un int (pour formater sans « .0 »)
+    if isinstance(node, ast.Constant):
+        return type(node.value) is int
+    if isinstance(node, ast.Name):
+        return node.id in integer_names
+    if isinstance(node, ast.UnaryOp):
+        return _is_integer(node.operand, integer_names)
+    if isinstance(node, ast.Call):
+        kind = FUNCTIONS[node.func.id].kind
+        return kind == 'integer' or (kind == 'same' and _is_integer(node.args[0], integer_names))
+    if isinstance(node.op, ast.Pow):
+        exponent = node.right
+        return (_is_integer(node.left, integer_names) and isinstance(exponent, ast.Constant)
+                and type(exponent.value) is int and exponent.value >= 0)
+    if isinstance(node.op, (ast.Add, ast.Sub, ast.Mult)):
+        return _is_integer(node.left, integer_names) and _is_integer(node.right, integer_names)
+    return False
+
+
+def _columns(np, variables):
+    # PT: Normaliza cada variável (range, array ou escalar) e descobre o tamanho comum
+    # EN: Normalize each variable (range, array or scalar) and find the common length
+    # FR: Normalise chaque variable (range, tableau ou scalaire) et trouve la taille commune
+    columns = {}
+    integer_names = set()
+    length = None
+    for name, value in variables.items():
+        if isinstance(value, range):
+            integer_names.add(name)
+        elif isinstance(value, (int, float)):
+            if isinstance(value, int):
+                integer_names.add(name)
+            columns[name] = float(value)
+            continue
+        else:
+            value = np.asarray(value).ravel()
+            if value.dtype.kind in 'iub':
+                integer_names.add(name)
+            elif value.dtype.kind != 'f':
+                raise TypeError("variable '%s' must be numeric" % name)
+        if length is not None and len(value) != length:
+            raise ValueError("variable '%s' has %d values, expected %d" % (name, len(value), length))
+        length = len(value)
+        columns[name] = value
+    return columns, integer_names, 1 if length is None else length
+
+
+def _slice(np, value, start, stop):
+    # PT: Bloco [start:stop] em float64; ranges nunca são materializados por inteiro
+    # EN: Chunk [start:stop] as float64; ranges are never materialized in full
+    # FR: Bloc [start:stop] en float64 ; les ranges ne sont jamais matérialisés en entier
+    if isinstance(value, float):
+        return value
+    if isinstance(value, range):
+        part = value[start:stop]
+        return np.arange(part.start, part.stop, part.step).astype(np.float64)
+    return value[start:stop].astype(np.float64, copy=False)
+
+
+def format_results(values, mask, integer=False):
+    # PT: Contraparte vetorizada de Calculador.__format_result: mesmo texto que str(),
+    #     notação científica acima de 15 caracteres e "__ERR__" nos elementos mascarados
+    # EN: Vectorized counterpart of Calculador.__format_result: same text as str(),
+    #     scientific notation above 15 characters and "__ERR__" on masked elements
+    # FR: Équivalent vectorisé de Calculador.__format_result : même texte que str(),
+    #     notation scientifique au-delà de 15 caractères et « __ERR__ » sur les éléments masqués
+    np = _numpy()
+    text = values.astype('U32')
+    if integer:
+        exact = ~mask & (np.abs(values) < 2.0 ** 53)
+        text[exact] = values[exact].astype(np.int64).astype('U32')
+        # PT: Acima de 2**53 o int exato teria 16+ dígitos: sempre notação científica, como no
+        #     caminho escalar (o texto do float, ex. '1e+16', seria curto demais para isso)
+        # EN: Above 2**53 the exact int would have 16+ digits: always scientific notation, as on
+        #     the scalar path (the float text, e.g. '1e+16', would be too short for that)
+        # FR: Au-delà de 2**53 l'int exact aurait 16+ chiffres : toujours notation scientifique,
+        #     comme sur le chemin scalaire (le texte du float, ex. '1e+16', serait trop court pour ça)
+        long_ = ~mask & ((np.char.str_len(text) > 15) | ~exact)
+    else:
+        long_ = ~mask & (np.char.str_len(text) > 15)
+    text[long_] = np.char.mod('%.5E', values[long_])
+    text[mask] = '__ERR__'
+    return text
+
+
+def sweep(kernel, variables, chunk_size=65536, formatted=True):
+    # PT: Avalia o kernel em blocos de tamanho fixo; divisão por zero e erros de domínio
+    #     viram máscara por elemento. Gera arrays de texto (ou pares valores/máscara)
+    # EN: Evaluate the kernel in fixed-size chunks; division by zero and domain errors
+    #     become a per-element mask. Yields text arrays (or values/mask pairs)
+    # FR: Évalue le noyau par blocs de taille fixe ; la division par zéro et les erreurs de domaine
+    #     deviennent un masque par élément. Génère des tableaux de texte (ou des paires valeurs/masque)
+    np = _numpy()
+    missing = set(kernel.names) - set(variables)
+    if missing:
+        raise NameError("no values for: %s" % ', '.join(sorted(missing)))
+    columns, integer_names, length = _columns(np, variables)
+    integer = _is_integer(kernel.tree, integer_names)
+    for start in range(0, length, chunk_size):
+        stop = min(start + chunk_size, length)
+        env = {name: _slice(np, value, start, stop) for name, value in columns.items()}
+        with np.errstate(all='ignore'):
+            values = np.broadcast_to(np.asarray(kernel.run(env), dtype=np.float64), (stop - start,))
+        mask = ~np.isfinite(values)
+        if formatted:
+            yield format_results(values, mask, integer=integer)
+        else:
+            yield values, mask
@@ -6,6 +6,12 @@
 # PT: Builtins
 # EN: Builtins
 # FR: Noyaux
+import time
+# PT: Marco zero para medir o tempo até o primeiro quadro
+# EN: Time zero for measuring time to first frame
+# FR: Instant zéro pour mesurer le temps jusqu'à la première image
+STARTED = time.perf_counter()
+
 import tkinter as tk
 
 # PT: Módulo próprio (interface principal)
@@ -18,5 +24,5 @@ if __name__ == '__main__':
     # EN: Create the main window and start the calculator
     # FR: Crée la fenêtre principale et lance la calculatrice
     master = tk.Tk()
-    main = Calculadora(master)
+    main = Calculadora(master, started=STARTED)
     main.start()